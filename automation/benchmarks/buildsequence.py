@@ -0,0 +1,95 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Benchmark Context.buildSequence.
+
+Builds the sequence of synthetic plugin sets and prints the time it
+took for each size.
+
+Usage (from a configured source tree):
+    PYTHONPATH=src python3 automation/benchmarks/buildsequence.py [N...]
+
+"""
+
+
+import random
+import sys
+import time
+
+
+from otopi import context
+from otopi import plugin
+
+
+EVENTS_PER_PLUGIN = 10
+PRIORITIES = (
+    plugin.Stages.PRIORITY_FIRST,
+    plugin.Stages.PRIORITY_HIGH,
+    plugin.Stages.PRIORITY_MEDIUM,
+    plugin.Stages.PRIORITY_DEFAULT,
+    plugin.Stages.PRIORITY_POST,
+    plugin.Stages.PRIORITY_LOW,
+    plugin.Stages.PRIORITY_LAST,
+)
+
+
+def _createPlugins(ctx, events, seed=0):
+    """Register plugins with events spread over all stages.
+
+    Every fifth event is named, and some events are placed after
+    a named event of an earlier or the same stage and priority.
+
+    """
+    rnd = random.Random(seed)
+    named = []
+    for p in range(0, events, EVENTS_PER_PLUGIN):
+        attrs = {}
+        for i in range(p, min(events, p + EVENTS_PER_PLUGIN)):
+            stage = (len(plugin.Stages.DATABASE) * i) // events
+            priority = rnd.choice(PRIORITIES)
+            after = ()
+            candidates = [
+                n for n, s, pr in named[-50:]
+                if s < stage or (s == stage and pr <= priority)
+            ]
+            if candidates and rnd.random() < 0.3:
+                after = (rnd.choice(candidates),)
+            name = None
+            if i % 5 == 0:
+                name = 'bench.event.%d' % i
+                named.append((name, stage, priority))
+
+            def _event(self):
+                pass
+
+            _event.__name__ = '_event%d' % i
+            attrs[_event.__name__] = plugin.event(
+                name=name,
+                stage=stage,
+                priority=priority,
+                after=after,
+            )(_event)
+        type('Plugin%d' % p, (plugin.PluginBase,), attrs)(context=ctx)
+
+
+def main(sizes):
+    for events in sizes:
+        ctx = context.Context()
+        _createPlugins(ctx, events)
+        start = time.monotonic()
+        ctx.buildSequence()
+        print(
+            '%6d events: %8.3f seconds' % (
+                events,
+                time.monotonic() - start,
+            )
+        )
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or (100, 1000, 10000))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,108 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Benchmark file transaction backups.
+
+Runs repeated transactions over many files, each run switching the
+files between a few contents, as repeated deployments do. Prints the
+time it took and the space used by backups, once with the backups
+next to the files and once with a backup store.
+
+Usage (from a configured source tree):
+    PYTHONPATH=src python3 automation/benchmarks/filebackup.py \\
+        [FILES [RUNS [KILOBYTES]]]
+
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+from otopi import backupstore
+from otopi import filetransaction
+from otopi import transaction
+
+
+def _contents(kilobytes):
+    return [
+        [
+            'version %d line %d %s' % (version, i, 'x' * 40)
+            for i in range(kilobytes * 1024 // 60)
+        ]
+        for version in range(3)
+    ]
+
+
+def _usage(directory, exclude):
+    """Return bytes allocated for files under directory."""
+    inodes = set()
+    total = 0
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if path in exclude:
+                continue
+            st = os.lstat(path)
+            if (st.st_dev, st.st_ino) not in inodes:
+                inodes.add((st.st_dev, st.st_ino))
+                total += st.st_blocks * 512
+    return total
+
+
+def _run(name, store, count, runs, contents):
+    base = tempfile.mkdtemp(prefix='otopi-bench-')
+    try:
+        files = [
+            os.path.join(base, 'etc', 'dir%d' % (i % 10), 'file%d' % i)
+            for i in range(count)
+        ]
+        for path in files:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write('\n'.join(contents[0]) + '\n')
+        if store is not None:
+            store = backupstore.BackupStore(
+                directory=os.path.join(base, 'backup'),
+            )
+        start = time.monotonic()
+        for run in range(runs):
+            with transaction.Transaction() as t:
+                for path in files:
+                    t.append(
+                        filetransaction.FileTransaction(
+                            name=path,
+                            content=contents[(run + 1) % len(contents)],
+                            backupStore=store,
+                        )
+                    )
+        elapsed = time.monotonic() - start
+        print(
+            '%s: %d files, %d runs, %.3f seconds, backups use %d KB' % (
+                name,
+                count,
+                runs,
+                elapsed,
+                _usage(base, set(files)) // 1024,
+            )
+        )
+    finally:
+        shutil.rmtree(base)
+
+
+def main(count=300, runs=10, kilobytes=16):
+    contents = _contents(kilobytes)
+    _run('legacy', None, count, runs, contents)
+    _run('store', True, count, runs, contents)
+
+
+if __name__ == '__main__':
+    main(*[int(n) for n in sys.argv[1:]])
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
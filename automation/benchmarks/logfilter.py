@@ -0,0 +1,203 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Benchmark the secret filter of the core log formatter.
+
+Registers many secrets, then formats many short records and a few
+records of multi megabyte command output, some of them containing
+secrets. Prints the time it took using the formatter and using the
+previous implementation, which built the token list and searched each
+token on every record, and verifies both produce the same output.
+
+Usage (from a configured source tree):
+    PYTHONPATH=src python3 automation/benchmarks/logfilter.py \\
+        [SECRETS [RECORDS [MEGABYTES]]]
+
+"""
+
+
+import importlib.util
+import logging
+import os
+import random
+import string
+import sys
+import time
+
+
+from otopi import constants
+from otopi import context
+
+
+def _loadLogPlugin():
+    spec = importlib.util.spec_from_file_location(
+        'otopi_bench_log',
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            '..',
+            '..',
+            'src',
+            'plugins',
+            'otopi',
+            'core',
+            'log.py',
+        ),
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _previousFormat(formatter, environment, record):
+    """Filter the way it was done before the filter was cached."""
+    content = logging.Formatter.format(formatter, record)
+    tokens = (
+        environment[constants.CoreEnv.LOG_FILTER]._list +
+        [
+            environment.get(k, None) for k in
+            environment[constants.CoreEnv.LOG_FILTER_KEYS] +
+            list(environment[constants.CoreEnv.LOG_FILTER_QUESTIONS_KEYS])
+        ]
+    )
+    tofilter = []
+    for token in tokens:
+        if token not in (None, ''):
+            index = -1
+            while True:
+                index = content.find(token, index + 1)
+                if index == -1:
+                    break
+                tofilter.append((index, index + len(token)))
+    for reobj in environment[constants.CoreEnv.LOG_FILTER_RE]:
+        index = -1
+        while True:
+            matchobj = reobj.search(content, index)
+            if matchobj is None:
+                break
+            index = matchobj.start('filter')
+            tofilter.append((index, matchobj.end('filter')))
+
+    def _insertFilter(content, begin, end):
+        return content[:begin] + '**FILTERED**' + content[end:]
+
+    tofilter = sorted(tofilter, key=lambda e: e[1], reverse=True)
+    begin = None
+    end = None
+    for entry in tofilter:
+        if begin is None or entry[1] < begin:
+            if begin is not None:
+                content = _insertFilter(content, begin, end)
+            begin = entry[0]
+            end = entry[1]
+        elif entry[0] < begin:
+            begin = entry[0]
+    else:
+        if begin is not None:
+            content = _insertFilter(content, begin, end)
+    return content
+
+
+def _environment(log, rnd, secrets):
+    environment = context.Context().environment
+    environment[constants.CoreEnv.LOG_FILTER] = log.Plugin._MyLoggerFilter()
+    environment[constants.CoreEnv.LOG_FILTER_KEYS] = []
+    environment[constants.CoreEnv.LOG_FILTER_QUESTIONS_KEYS] = set()
+    environment[constants.CoreEnv.LOG_FILTER_RE] = []
+    values = []
+    for i in range(secrets):
+        value = ''.join(
+            rnd.choice(string.ascii_letters + string.digits)
+            for j in range(rnd.randint(8, 24))
+        )
+        values.append(value)
+        if i % 2:
+            environment[constants.CoreEnv.LOG_FILTER].append(value)
+        else:
+            environment['BENCH/secret%d' % i] = value
+            environment[constants.CoreEnv.LOG_FILTER_KEYS].append(
+                'BENCH/secret%d' % i
+            )
+    return environment, values
+
+
+def _records(rnd, values, count, megabytes):
+    words = [
+        ''.join(
+            rnd.choice(string.ascii_lowercase)
+            for j in range(rnd.randint(2, 9))
+        )
+        for i in range(2000)
+    ]
+
+    def _text(length):
+        text = []
+        size = 0
+        while size < length:
+            text.append(rnd.choice(words))
+            size += len(text[-1]) + 1
+        return ' '.join(text)
+
+    short = [_text(100) for i in range(count)]
+    for i in range(0, count, 50):
+        short[i] += ' password=%s' % rnd.choice(values)
+    big = []
+    for i in range(3):
+        text = _text(megabytes * 1024 * 1024)
+        if i:
+            position = rnd.randint(0, len(text))
+            text = text[:position] + rnd.choice(values) + text[position:]
+        big.append(text)
+
+    def _record(msg):
+        return logging.LogRecord(
+            'otopi.bench', logging.DEBUG, __file__, 1, msg, None, None,
+        )
+
+    return [_record(m) for m in short], [_record(m) for m in big]
+
+
+def _time(function, records):
+    start = time.monotonic()
+    result = [function(record) for record in records]
+    return time.monotonic() - start, result
+
+
+def main(secrets=150, count=20000, megabytes=4):
+    rnd = random.Random(0)
+    log = _loadLogPlugin()
+    environment, values = _environment(log, rnd, secrets)
+    short, big = _records(rnd, values, count, megabytes)
+    formatter = log.Plugin._MyFormatter(
+        fmt='%(message)s',
+        environment=environment,
+    )
+    for name, records in (
+        ('%d short records' % count, short),
+        ('%d records of %dMB' % (len(big), megabytes), big),
+    ):
+        previous, expected = _time(
+            lambda r: _previousFormat(formatter, environment, r),
+            records,
+        )
+        current, result = _time(formatter.format, records)
+        if result != expected:
+            raise RuntimeError('Filter output differs for %s' % name)
+        print(
+            '%s, %d secrets: previous %.3f seconds, current %.3f '
+            'seconds' % (
+                name,
+                secrets,
+                previous,
+                current,
+            )
+        )
+
+
+if __name__ == '__main__':
+    main(*[int(n) for n in sys.argv[1:]])
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,120 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Benchmark the log file writer of the core log plugin.
+
+Logs many records into a log file opened the way the log plugin opens
+it, once using the synchronous stream handler and once using the queued
+handler that writes from a background thread. Prints lines per second
+as seen by the logging thread, and until all lines are in the file.
+
+Usage (from a configured source tree):
+    PYTHONPATH=src python3 automation/benchmarks/logwriter.py [RECORDS]
+
+"""
+
+
+import importlib.util
+import logging
+import os
+import sys
+import tempfile
+import time
+
+
+from otopi import constants
+from otopi import context
+
+
+def _loadLogPlugin():
+    spec = importlib.util.spec_from_file_location(
+        'otopi_bench_log',
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            '..',
+            '..',
+            'src',
+            'plugins',
+            'otopi',
+            'core',
+            'log.py',
+        ),
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _environment(log):
+    environment = context.Context().environment
+    environment[constants.CoreEnv.LOG_FILTER] = log.Plugin._MyLoggerFilter()
+    environment[constants.CoreEnv.LOG_FILTER_KEYS] = []
+    environment[constants.CoreEnv.LOG_FILTER_QUESTIONS_KEYS] = set()
+    environment[constants.CoreEnv.LOG_FILTER_RE] = []
+    return environment
+
+
+def _run(name, factory, environment, log, count):
+    fd, path = tempfile.mkstemp(prefix='otopi-bench-', suffix='.log')
+    os.close(fd)
+    try:
+        stream = open(path, mode='a', buffering=1)
+        handler = factory(stream)
+        handler.setFormatter(
+            log.Plugin._MyFormatter(
+                fmt=(
+                    '%(asctime)s %(levelname)s %(name)s '
+                    '%(module)s.%(funcName)s:%(lineno)d '
+                    '%(message)s'
+                ),
+                environment=environment,
+            )
+        )
+        logger = logging.getLogger('otopi.bench.%s' % name)
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        start = time.monotonic()
+        for i in range(count):
+            logger.debug('record %d of the benchmark, some payload', i)
+        logged = time.monotonic() - start
+        logger.removeHandler(handler)
+        handler.close()
+        stream.close()
+        written = time.monotonic() - start
+        with open(path) as f:
+            lines = sum(1 for line in f)
+        if lines != count:
+            raise RuntimeError(
+                '%s wrote %d lines instead of %d' % (name, lines, count)
+            )
+        print(
+            '%s: %d lines, logging %.0f lines/s, written %.0f lines/s' % (
+                name,
+                count,
+                count / logged,
+                count / written,
+            )
+        )
+    finally:
+        os.unlink(path)
+
+
+def main(count=200000):
+    log = _loadLogPlugin()
+    environment = _environment(log)
+    for name, factory in (
+        ('sync', logging.StreamHandler),
+        ('async', log.Plugin._QueuedHandler),
+    ):
+        _run(name, factory, environment, log, count)
+
+
+if __name__ == '__main__':
+    main(*[int(n) for n in sys.argv[1:]])
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
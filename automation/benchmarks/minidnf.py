@@ -0,0 +1,83 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Benchmark MiniDNF query bases.
+
+Runs a typical flow of queries around a transaction that is built and
+rolled back, as plugins do during validation and packages stages.
+Prints the time it took and the count of fill_sack() calls, once
+without and once with the query base cache.
+
+Requires dnf and configured repositories, the transaction is never
+processed.
+
+Usage (from a configured source tree):
+    PYTHONPATH=src python3 automation/benchmarks/minidnf.py \\
+        [QUERIES [PACKAGE]]
+
+"""
+
+
+import sys
+import time
+
+
+import dnf
+
+
+from otopi import minidnf
+
+
+def _flow(mini, queries, package):
+    mini.getConf()
+    for i in range(queries):
+        mini.queryPackages(patterns=(package,))
+    mini.queryGroups()
+    with mini.transaction():
+        mini.installUpdate(packages=(package,))
+        mini.buildTransaction()
+        mini.queryPackages(patterns=(package,), showdups=True)
+    for i in range(queries):
+        mini.queryPackages(patterns=(package,), showdups=True)
+    mini.queryGroups()
+
+
+def _run(name, baseCache, queries, package):
+    calls = [0]
+    fill_sack = dnf.Base.fill_sack
+
+    def _counting(self, *args, **kwargs):
+        calls[0] += 1
+        return fill_sack(self, *args, **kwargs)
+
+    dnf.Base.fill_sack = _counting
+    try:
+        mini = minidnf.MiniDNF(baseCache=baseCache)
+        start = time.monotonic()
+        _flow(mini, queries, package)
+        elapsed = time.monotonic() - start
+        del mini
+    finally:
+        dnf.Base.fill_sack = fill_sack
+    print(
+        '%s: %d queries, %d fill_sack calls, %.3f seconds' % (
+            name,
+            2 * queries + 3,
+            calls[0],
+            elapsed,
+        )
+    )
+
+
+def main(queries=5, package='bash'):
+    _run('no cache', False, int(queries), package)
+    _run('cache', True, int(queries), package)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
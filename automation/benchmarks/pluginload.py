@@ -0,0 +1,90 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Benchmark Context.loadPlugins with and without plugin cache.
+
+Creates a plugin tree of many groups in a temporary directory and
+prints the time it took to load it without cache, with an empty cache
+(cold) and with a cache written by a previous run (warm).
+
+Usage (from a configured source tree):
+    PYTHONPATH=src python3 automation/benchmarks/pluginload.py \\
+        [GROUPS [PLUGINS [DEPTH]]]
+
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+from otopi import constants
+from otopi import context
+
+
+PLUGIN = '''
+from otopi import util
+
+
+@util.export
+def createPlugins(context):
+    pass
+'''
+
+
+def _createTree(top, groups, plugins, depth):
+    for g in range(groups):
+        for p in range(plugins):
+            path = os.path.join(
+                top,
+                'group%d' % g,
+                *(['sub%d' % (p % 3)] * depth + ['plugin%d' % p])
+            )
+            os.makedirs(path)
+            with open(os.path.join(path, '__init__.py'), 'w') as f:
+                f.write(PLUGIN)
+
+
+def _load(top, groups, cache):
+    ctx = context.Context()
+    ctx.environment[constants.BaseEnv.PLUGIN_PATH] = top
+    ctx.environment[constants.BaseEnv.PLUGIN_GROUPS] = ':'.join(
+        ['otopi'] + ['group%d' % g for g in range(groups)]
+    )
+    ctx.environment[constants.BaseEnv.PLUGIN_CACHE] = cache
+    start = time.monotonic()
+    ctx.loadPlugins()
+    return time.monotonic() - start
+
+
+def main(groups=50, plugins=20, depth=2):
+    top = tempfile.mkdtemp()
+    try:
+        _createTree(top, groups, plugins, depth)
+        # otopi group is always loaded
+        os.mkdir(os.path.join(top, 'otopi'))
+        cache = os.path.join(top, 'cache.json')
+
+        # compile modules, so all runs are the same
+        _load(top, groups, None)
+
+        print(
+            '%d groups of %d plugins, depth %d' % (groups, plugins, depth)
+        )
+        print('no cache: %8.3f seconds' % _load(top, groups, None))
+        print('cold:     %8.3f seconds' % _load(top, groups, cache))
+        print('warm:     %8.3f seconds' % _load(top, groups, cache))
+    finally:
+        shutil.rmtree(top)
+
+
+if __name__ == '__main__':
+    main(*[int(n) for n in sys.argv[1:]])
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
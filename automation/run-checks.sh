@@ -170,8 +170,22 @@ PATH="${PWD}/automation/testbin:$PATH" OTOPI_TEST_COMMAND=1 test_otopi 0 command
 
 # Test machine dialog
 test_otopi 0 machine DIALOG/dialect=str:machine
+test_otopi 0 json DIALOG/dialect=str:json
+
+# Answers sent ahead of hidden queries must not be logged
+secret="s3cr3t-answer-$$"
+test_otopi 0 check_filter_answer DIALOG/dialect=str:machine "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:check_filter_answer" << __EOF__
+ANSWER QUESTION/1/CHECK_FILTER_ANSWER_FIRST=str:plain
+ANSWER QUESTION/1/CHECK_FILTER_ANSWER=str:${secret}
+__EOF__
+if grep -r "${secret}" "${LOG_DIR}"; then
+	err "Answer to hidden question found in log"
+	exit 1
+fi
 
 test_otopi 0 change_env_type "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:change_env_type"
+test_otopi 0 lazy_plugin "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:lazy_plugin" LAZY/enable=bool:True
+test_otopi 0 parallel_events "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:parallel_events"
 
 # Test failures
 
@@ -181,6 +195,20 @@ test_otopi 1 cyclic_dep "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugin
 test_otopi 1 non_existent_before_after "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:non_existent_before_after CORE/ignoreMissingBeforeAfter=bool:False"
 test_otopi 1 duplicate_method_names "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:duplicate_method_names"
 
+# A file that failed to be restored on abort is restored by recovery
+abort_restore_dir="$(mktemp -d)"
+echo old > "${abort_restore_dir}/file"
+OTOPI_FORCE_FAIL_STAGE=STAGE_MISC test_otopi 1 abort_restore "APPEND:BASE/pluginPath=str:${PWD}/automation/testplugins" "APPEND:BASE/pluginGroups=str:abort_restore" CORE/fileBackupDir=str:"${abort_restore_dir}/backup" CORE/transactionJournalDir=str:"${abort_restore_dir}/journal" ABORT_RESTORE/file=str:"${abort_restore_dir}/file"
+if ! grep -qx new "${abort_restore_dir}/file"; then
+	err "abort_restore: restore on abort was supposed to fail"
+	exit 1
+fi
+test_otopi 0 abort_restore-recover --recover CORE/transactionJournalDir=str:"${abort_restore_dir}/journal"
+if ! grep -qx old "${abort_restore_dir}/file"; then
+	err "abort_restore: file was not restored by recovery"
+	exit 1
+fi
+
 # Test packager rollback. testpackage1 should not be installed at this point, because we remove it earlier
 if rpm -q testpackage1 2>&1; then
 	err "Packager rollback: testpackage1 found before testing, failing"
@@ -192,6 +220,11 @@ if rpm -q testpackage1 2>&1; then
 	err "Packager rollback: testpackage1 found after testing, failing"
 	exit 1
 fi
+OTOPI_FORCE_FAIL_STAGE=STAGE_MISC test_otopi 1 packager-install-testpackage1-background-download-undo PACKAGER/dnfDownloadWorkers=int:4 ODEBUG/packagesAction=str:install ODEBUG/packages=str:testpackage1
+if rpm -q testpackage1 2>&1; then
+	err "Packager rollback with background download: testpackage1 found after testing, failing"
+	exit 1
+fi
 
 test_otopi 0 packager-install-testpackage1 ODEBUG/packagesAction=str:install ODEBUG/packages=str:testpackage1
 prepare_test_updates_repo
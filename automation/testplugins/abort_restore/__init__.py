@@ -0,0 +1,20 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""abort_restore."""
+
+
+from otopi import util
+
+
+from . import abort_restore
+
+
+@util.export
+def createPlugins(context):
+    abort_restore.Plugin(context=context)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
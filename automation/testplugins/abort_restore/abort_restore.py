@@ -0,0 +1,48 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""abort_restore."""
+
+
+from otopi import backupstore
+from otopi import constants
+from otopi import filetransaction
+from otopi import plugin
+from otopi import util
+
+FILE = 'ABORT_RESTORE/file'
+
+
+@util.export
+class Plugin(plugin.PluginBase):
+    """abort_restore.
+
+    Modifies FILE visibly, and makes its restore fail on abort, so that
+    the file must be restored by recovery of the transaction journal.
+
+    """
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_EARLY_MISC,
+    )
+    def _early_misc(self):
+        self.environment[constants.CoreEnv.MAIN_TRANSACTION].append(
+            filetransaction.FileTransaction(
+                name=self.environment[FILE],
+                content='new',
+                visibleButUnsafe=True,
+            )
+        )
+
+        def _restore(store, entry, destination=None):
+            raise OSError('Restore failed by abort_restore')
+
+        backupstore.BackupStore.restore = _restore
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,20 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""check_filter_answer."""
+
+
+from otopi import util
+
+
+from . import check_filter_answer
+
+
+@util.export
+def createPlugins(context):
+    check_filter_answer.Plugin(context=context)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
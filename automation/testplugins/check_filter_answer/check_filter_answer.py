@@ -0,0 +1,62 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""check_filter_answer."""
+
+
+from otopi import constants
+from otopi import plugin
+from otopi import util
+
+KEY = 'myTestKey'
+QUESTION = 'CHECK_FILTER_ANSWER'
+
+
+@util.export
+class Plugin(plugin.PluginBase):
+    """check_filter_answer.
+
+    Both answers are sent by manager ahead of the first query, the hidden
+    one is received one event before it is queried, and must not appear
+    in the log.
+
+    """
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_INIT,
+    )
+    def _init(self):
+        self.environment[
+            constants.CoreEnv.LOG_FILTER_QUESTIONS
+        ].append(QUESTION)
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CUSTOMIZATION,
+        priority=plugin.Stages.PRIORITY_HIGH,
+    )
+    def _customization_first(self):
+        self.dialog.queryString(
+            name='CHECK_FILTER_ANSWER_FIRST',
+            note='Input some value:',
+            prompt=True,
+        )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CUSTOMIZATION,
+    )
+    def _customization(self):
+        self.environment[
+            KEY
+        ] = self.dialog.queryString(
+            name=QUESTION,
+            note='Input some value(hidden):',
+            prompt=True,
+            hidden=True,
+        )
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,20 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Lazy plugin."""
+
+
+from otopi import util
+
+
+from . import lazy_plugin
+
+
+@util.export
+def createPlugins(context):
+    lazy_plugin.Plugin(context=context)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
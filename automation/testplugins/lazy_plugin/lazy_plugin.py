@@ -0,0 +1,45 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Lazy plugin, imported when its first event is executed."""
+
+
+from otopi import plugin
+from otopi import util
+
+
+@util.export
+class Plugin(plugin.PluginBase):
+    """Lazy plugin."""
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+        name='lazy.plugin.setup',
+    )
+    def _setup(self):
+        self.dialog.note('Lazy plugin loaded')
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_MISC,
+        after=(
+            'lazy.plugin.setup',
+        ),
+        priority=plugin.Stages.PRIORITY_LOW,
+    )
+    def _misc(self):
+        self.environment['LAZY/miscExecuted'] = True
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CLOSEUP,
+        condition=lambda self: False,
+    )
+    def _closeup(self):
+        raise RuntimeError('Should not be executed')
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,20 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Parallel events plugin."""
+
+
+from otopi import util
+
+
+from . import parallel_events
+
+
+@util.export
+def createPlugins(context):
+    parallel_events.Plugin(context=context)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
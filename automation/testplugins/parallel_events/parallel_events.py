@@ -0,0 +1,66 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Parallel events plugin, fails unless its events run concurrently."""
+
+
+import threading
+
+
+from otopi import plugin
+from otopi import util
+
+
+@util.export
+class Plugin(plugin.PluginBase):
+    """Parallel events plugin."""
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+        self._barrier = threading.Barrier(3, timeout=60)
+
+    def _probe(self, name):
+        self.logger.debug('probe %s waiting', name)
+        self._barrier.wait()
+        self.execute(('true',))
+        with self.environment.lock:
+            self.environment['PARALLEL/probes'] = sorted(
+                self.environment.get('PARALLEL/probes', []) + [name]
+            )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+        parallel_safe=True,
+    )
+    def _probe1(self):
+        self._probe('probe1')
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+        parallel_safe=True,
+    )
+    def _probe2(self):
+        self._probe('probe2')
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+        parallel_safe=True,
+    )
+    def _probe3(self):
+        self._probe('probe3')
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_VALIDATION,
+    )
+    def _validation(self):
+        if self.environment['PARALLEL/probes'] != [
+            'probe1',
+            'probe2',
+            'probe3',
+        ]:
+            raise RuntimeError('Probes were not executed')
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
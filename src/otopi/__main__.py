@@ -15,6 +15,7 @@ import traceback
 
 from otopi import common
 from otopi import constants
+from otopi import journal
 from otopi import main
 
 
@@ -28,14 +29,13 @@ class Installer(object):
     Parameters are in name=type:value format, to be added into
     environment.
 
-    """
-    def _setupEnvironment(self, environment):
-        """Setup environment based on command-line parameters."""
+    If --recover is specified, only recover the interrupted transactions
+    of CORE/transactionJournalDir.
 
-        environment[constants.BaseEnv.EXECUTION_DIRECTORY] = os.environ[
-            constants.SystemEnvironment.EXEC_DIR
-        ]
+    """
+    RECOVER = '--recover'
 
+    def _statements(self):
         for arg in sys.argv[1:]:
             for statement in shlex.split(arg):
                 if sys.version_info[0] <= 2:
@@ -43,29 +43,39 @@ class Installer(object):
                         statement = statement.decode('utf-8')
                     except UnicodeDecodeError:
                         pass
-                entry = statement.split('=', 1)
-                if len(entry) == 2:
-                    key, value = entry[0], common.parseTypedValue(entry[1])
-                    if key.startswith(
-                        constants.Const.ENVIRONMENT_APPEND_PREFIX
-                    ):
-                        key = key.replace(
-                            constants.Const.ENVIRONMENT_APPEND_PREFIX,
-                            ''
-                        )
-                        environment.setdefault(key, '')
-                        environment[key] += ':%s' % value
-                    elif key.startswith(
-                        constants.Const.ENVIRONMENT_PREPEND_PREFIX
-                    ):
-                        key = key.replace(
-                            constants.Const.ENVIRONMENT_PREPEND_PREFIX,
-                            ''
-                        )
-                        environment.setdefault(key, '')
-                        environment[key] = '%s:%s' % (value, environment[key])
-                    else:
-                        environment[key] = value
+                yield statement
+
+    def _setupEnvironment(self, environment):
+        """Setup environment based on command-line parameters."""
+
+        environment[constants.BaseEnv.EXECUTION_DIRECTORY] = os.environ[
+            constants.SystemEnvironment.EXEC_DIR
+        ]
+
+        for statement in self._statements():
+            entry = statement.split('=', 1)
+            if len(entry) == 2:
+                key, value = entry[0], common.parseTypedValue(entry[1])
+                if key.startswith(
+                    constants.Const.ENVIRONMENT_APPEND_PREFIX
+                ):
+                    key = key.replace(
+                        constants.Const.ENVIRONMENT_APPEND_PREFIX,
+                        ''
+                    )
+                    environment.setdefault(key, '')
+                    environment[key] += ':%s' % value
+                elif key.startswith(
+                    constants.Const.ENVIRONMENT_PREPEND_PREFIX
+                ):
+                    key = key.replace(
+                        constants.Const.ENVIRONMENT_PREPEND_PREFIX,
+                        ''
+                    )
+                    environment.setdefault(key, '')
+                    environment[key] = '%s:%s' % (value, environment[key])
+                else:
+                    environment[key] = value
 
     def _getExitCode(self, environment):
         return sorted(
@@ -76,7 +86,43 @@ class Installer(object):
     def __init__(self):
         pass
 
+    def _recover(self):
+        environment = {}
+        self._setupEnvironment(environment)
+        directory = environment.get(
+            constants.CoreEnv.TRANSACTION_JOURNAL_DIR
+        )
+        if not directory:
+            print(
+                _('{key} must be specified for recovery').format(
+                    key=constants.CoreEnv.TRANSACTION_JOURNAL_DIR,
+                )
+            )
+            return constants.Const.EXIT_CODE_GENERAL_ERROR
+        recovered, failed = journal.recover(directory=directory)
+        for name, committed in recovered:
+            print(
+                _("Interrupted transaction '{journal}' was {action}").format(
+                    journal=name,
+                    action=_('committed') if committed else _('aborted'),
+                )
+            )
+        if failed:
+            print(
+                _('Cannot recover transactions: {journals}').format(
+                    journals=', '.join(failed),
+                )
+            )
+            return constants.Const.EXIT_CODE_GENERAL_ERROR
+        return constants.Const.EXIT_CODE_SUCCESS
+
     def main(self):
+        if self.RECOVER in self._statements():
+            os.environ.setdefault(
+                constants.SystemEnvironment.EXEC_DIR,
+                os.getcwd()
+            )
+            return self._recover()
         try:
             installer = main.Otopi()
             os.environ.setdefault(
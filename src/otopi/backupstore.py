@@ -0,0 +1,251 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Content addressed backup store."""
+
+
+import fcntl
+import gettext
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+
+from . import base
+from . import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+# linux/fs.h _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+_CHUNK_SIZE = 65536
+
+
+@util.export
+class BackupStore(base.Base):
+    """Content addressed backup store.
+
+    Backups are kept once per content, as blobs named by their sha256
+    digest, within directory. The index, a JSON object per line, maps
+    original path and timestamp to a blob and the file attributes.
+
+    Blobs are created by reflink if the filesystem supports it, else by
+    copy. If hardlink is set, the original file is linked to the blob
+    instead of copied when reflink is not supported. This is only safe
+    if the original file is always replaced, never modified in place,
+    as FileTransaction does.
+
+    If names is set, the backup is also made available at the legacy
+    name, next to the original file.
+
+    """
+
+    INDEX = 'index'
+    BLOBS = 'blobs'
+
+    @staticmethod
+    def _reflink(source, destination):
+        """Clone source into new destination, return False if cannot."""
+        with open(source, 'rb') as src:
+            fd = os.open(
+                destination,
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                0o600,
+            )
+            try:
+                fcntl.ioctl(fd, _FICLONE, src.fileno())
+                return True
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+        os.unlink(destination)
+        return False
+
+    @staticmethod
+    def _link(source, destination):
+        try:
+            os.link(source, destination)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def digest(name):
+        """Return sha256 digest of the content of file name."""
+        digest = hashlib.sha256()
+        with open(name, 'rb') as f:
+            while True:
+                chunk = f.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __init__(self, directory, hardlink=False, names=False):
+        """Constructor.
+
+        Keyword arguments:
+        directory -- store directory, created if missing.
+        hardlink -- link original files to blobs if cannot reflink.
+        names -- also create legacy backup names.
+
+        """
+        super(BackupStore, self).__init__()
+        self._directory = directory
+        self._hardlink = hardlink
+        self._names = names
+        self._lock = threading.Lock()
+        os.makedirs(
+            os.path.join(directory, self.BLOBS),
+            mode=0o700,
+            exist_ok=True,
+        )
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def _blob(self, digest):
+        return os.path.join(
+            self._directory,
+            self.BLOBS,
+            digest[:2],
+            digest,
+        )
+
+    def _createBlob(self, name, blob):
+        """Create blob out of file name, return how."""
+        os.makedirs(os.path.dirname(blob), mode=0o700, exist_ok=True)
+        # unique among running processes, any existing one was left
+        # by a crash
+        tmp = '%s.%s.%s.tmp' % (blob, os.getpid(), threading.get_ident())
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        if self._reflink(name, tmp):
+            how = 'reflink'
+        elif self._hardlink and self._link(name, tmp):
+            how = 'hardlink'
+        else:
+            how = 'copy'
+            shutil.copyfile(name, tmp)
+        if how != 'hardlink':
+            os.chmod(tmp, 0o400)
+        os.rename(tmp, blob)
+        return how
+
+    def _place(self, blob, destination):
+        """Create new destination with the content of blob."""
+        if not self._reflink(blob, destination):
+            shutil.copyfile(blob, destination)
+
+    def backup(self, name, timestamp):
+        """Backup file name, return index entry.
+
+        Keyword arguments:
+        name -- file to backup.
+        timestamp -- backup timestamp, as used in legacy names.
+
+        """
+        currentStat = os.stat(name)
+        digest = self.digest(name)
+        blob = self._blob(digest)
+        if os.path.exists(blob):
+            how = 'existing'
+        else:
+            how = self._createBlob(name, blob)
+        entry = {
+            'path': os.path.abspath(name),
+            'timestamp': timestamp,
+            'digest': digest,
+            'mode': currentStat.st_mode & 0o7777,
+            'uid': currentStat.st_uid,
+            'gid': currentStat.st_gid,
+            'atime_ns': currentStat.st_atime_ns,
+            'mtime_ns': currentStat.st_mtime_ns,
+        }
+        if self._names:
+            entry['name'] = '%s.%s' % (name, timestamp)
+            if os.path.lexists(entry['name']):
+                os.unlink(entry['name'])
+            self._place(blob, entry['name'])
+            shutil.copystat(name, entry['name'])
+            os.chown(entry['name'], currentStat.st_uid, currentStat.st_gid)
+        with self._lock:
+            with open(os.path.join(self._directory, self.INDEX), 'a') as f:
+                f.write('%s\n' % json.dumps(entry, sort_keys=True))
+        self.logger.debug(
+            "backup '%s'->'%s' (%s)",
+            name,
+            blob,
+            how,
+        )
+        return entry
+
+    def restore(self, entry, destination=None):
+        """Restore entry, atomically replacing destination.
+
+        Keyword arguments:
+        entry -- index entry.
+        destination -- file to restore, default is original path.
+
+        """
+        if destination is None:
+            destination = entry['path']
+        blob = self._blob(entry['digest'])
+        if self.digest(blob) != entry['digest']:
+            raise RuntimeError(
+                _("Backup of '{file}' is corrupted").format(
+                    file=entry['path'],
+                )
+            )
+        tmp = os.path.join(
+            os.path.dirname(destination),
+            '.%s.%s.restore' % (
+                os.path.basename(destination),
+                threading.get_ident(),
+            ),
+        )
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        try:
+            self._place(blob, tmp)
+            os.chown(tmp, entry['uid'], entry['gid'])
+            os.chmod(tmp, entry['mode'])
+            if 'mtime_ns' in entry:
+                os.utime(
+                    tmp,
+                    ns=(entry['atime_ns'], entry['mtime_ns']),
+                )
+            os.rename(tmp, destination)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.logger.debug("restored '%s' from '%s'", destination, blob)
+
+    def entries(self, name=None):
+        """Return index entries, oldest first, optionally of name only."""
+        path = None if name is None else os.path.abspath(name)
+        ret = []
+        with self._lock:
+            try:
+                with open(os.path.join(self._directory, self.INDEX)) as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        if path is None or entry['path'] == path:
+                            ret.append(entry)
+            except FileNotFoundError:
+                pass
+        return ret
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -69,6 +69,7 @@ class Const(object):
     CONFIG_SECTION_ENFORCE = 'environment:enforce'
     DIALOG_DIALECT_MACHINE = 'machine'
     DIALOG_DIALECT_HUMAN = 'human'
+    DIALOG_DIALECT_JSON = 'json'
     EXIT_CODE_SUCCESS = 0
     EXIT_CODE_GENERAL_ERROR = 1
     EXIT_CODE_INITIALIZATION_ERROR = 2
@@ -91,6 +92,7 @@ class SystemEnvironment(object):
     COVERAGE = 'OTOPI_COVERAGE'
     SYS_PATH = 'PATH'
     DNF_ENABLE = 'OTOPI_DNF_ENABLE'
+    PLUGIN_CACHE = 'OTOPI_PLUGIN_CACHE'
 
 
 @util.export
@@ -102,11 +104,14 @@ class BaseEnv(object):
     LOG = 'BASE/log'
     PLUGIN_PATH = 'BASE/pluginPath'
     PLUGIN_GROUPS = 'BASE/pluginGroups'
+    PLUGIN_CACHE = 'BASE/pluginCache'
+    PARALLEL_EVENTS = 'BASE/parallelEvents'
     DEBUG = 'BASE/debug'
     EXECUTION_DIRECTORY = 'BASE/executionDirectory'
     SUPPRESS_ENVIRONMENT_KEYS = 'BASE/suppressEnvironmentKeys'
     COMMAND_PREFIX = 'COMMAND/'
     RANDOMIZE_EVENTS = 'CORE/randomizeEvents'
+    PROFILE = 'CORE/profile'
     FAIL_ON_PRIO_OVERRIDE = 'CORE/failOnPrioOverride'
     IGNORE_MISSING_BEFORE_AFTER = 'CORE/ignoreMissingBeforeAfter'
 
@@ -118,6 +123,11 @@ class CoreEnv(object):
     INTERNAL_PACKAGES_TRANSACTION = 'CORE/internalPackageTransaction'
     MAIN_TRANSACTION = 'CORE/mainTransaction'
     MODIFIED_FILES = 'CORE/modifiedFiles'
+    FILE_BACKUP_DIR = 'CORE/fileBackupDir'
+    FILE_BACKUP_HARDLINK = 'CORE/fileBackupHardlink'
+    FILE_BACKUP_NAMES = 'CORE/fileBackupNames'
+    TRANSACTION_JOURNAL_DIR = 'CORE/transactionJournalDir'
+    TRANSACTION_COMMIT_WORKERS = 'CORE/transactionCommitWorkers'
     LOG_FILE_NAME_PREFIX = 'CORE/logFileNamePrefix'
     LOG_DIR = 'CORE/logDir'
     LOG_FILE_NAME = 'CORE/logFileName'
@@ -126,7 +136,10 @@ class CoreEnv(object):
     LOG_FILTER_KEYS = 'CORE/logFilterKeys'
     LOG_FILTER_QUESTIONS = 'CORE/logFilterQuestions'
     LOG_FILTER_QUESTIONS_KEYS = 'CORE/logFilterQuestionsKeys'
+    PROFILE_FILE_NAME = 'CORE/profileFileName'
+    PROFILE_TOP = 'CORE/profileTop'
     LOG_FILE_HANDLE = 'CORE/logFileHandle'
+    LOG_ASYNC = 'CORE/logAsync'
     LOG_REMOVE_AT_EXIT = 'CORE/logRemoveAtExit'
     CONFIG_FILE_NAME = 'CORE/configFileName'
     CONFIG_FILE_APPEND = 'CORE/configFileAppend'
@@ -180,6 +193,12 @@ class PackEnv(object):
     DNFPACKAGER_EXPIRE_CACHE = 'PACKAGER/dnfExpireCache'
     DNF_DISABLED_PLUGINS = 'PACKAGER/dnfDisabledPlugins'
     DNF_ROLLBACK = 'PACKAGER/dnfRollback'
+    DNF_BASE_CACHE = 'PACKAGER/dnfBaseCache'
+    DNF_BASE_CACHE_REFRESH = 'PACKAGER/dnfBaseCacheRefresh'
+    DNF_CACHE_DIR = 'PACKAGER/dnfCacheDir'
+    DNF_OFFLINE = 'PACKAGER/dnfOffline'
+    DNF_PREFETCH = 'PACKAGER/dnfPrefetch'
+    DNF_DOWNLOAD_WORKERS = 'PACKAGER/dnfDownloadWorkers'
 
 
 @util.export
@@ -6,11 +6,17 @@
 """Context management."""
 
 
+import concurrent.futures
+import contextlib
 import gettext
 import glob
+import json
+import logging
 import os
 import random
 import sys
+import tempfile
+import threading
 import traceback
 
 
@@ -22,6 +28,7 @@ from . import constants
 from . import dialog
 from . import packager
 from . import plugin
+from . import profiler
 from . import services
 from . import util
 
@@ -37,6 +44,278 @@ class Abort(Exception):
         super(Abort, self).__init__(self, message)
 
 
+class _Environment(dict):
+    """Environment dictionary.
+
+    Records the keys modified since resetModified() was called, with
+    the value each key had before it was first modified.
+
+    Modifications are serialized by lock, which parallel safe events
+    should also hold for read-modify-write sequences.
+
+    generation is incremented on each modification, so that values
+    derived from the environment can be cached.
+
+    """
+
+    MISSING = object()
+
+    def __init__(self, *args, **kwargs):
+        super(_Environment, self).__init__(*args, **kwargs)
+        self._modified = {}
+        self.lock = threading.RLock()
+        self.generation = 0
+
+    def _modifying(self, key):
+        self.generation += 1
+        if key not in self._modified:
+            self._modified[key] = self.get(key, self.MISSING)
+
+    def resetModified(self):
+        """Forget modified keys."""
+        with self.lock:
+            self._modified = {}
+
+    def modified(self):
+        """Return dict of modified key to its previous value.
+
+        Keys that did not exist have previous value MISSING.
+
+        """
+        with self.lock:
+            return dict(self._modified)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self._modifying(key)
+            super(_Environment, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self.lock:
+            self._modifying(key)
+            super(_Environment, self).__delitem__(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        with self.lock:
+            if key not in self:
+                self[key] = default
+            return self[key]
+
+    def pop(self, key, *args):
+        with self.lock:
+            if key in self:
+                self._modifying(key)
+            return super(_Environment, self).pop(key, *args)
+
+    def popitem(self):
+        with self.lock:
+            key, value = super(_Environment, self).popitem()
+            if key not in self._modified:
+                self._modified[key] = value
+            return key, value
+
+    def clear(self):
+        with self.lock:
+            for key in self.keys():
+                self._modifying(key)
+            super(_Environment, self).clear()
+
+    def update(self, *args, **kwargs):
+        with self.lock:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+
+class _EventLogBuffer(logging.Filter):
+    """Hold back log records of events running in worker threads.
+
+    Installed as a filter of the handlers, records emitted by a thread
+    within capture() are collected instead of handled, so that they can
+    be replayed in sequence order.
+
+    """
+
+    def __init__(self):
+        super(_EventLogBuffer, self).__init__()
+        self._local = threading.local()
+
+    def filter(self, record):
+        records = getattr(self._local, 'records', None)
+        if records is None:
+            return True
+        # same record is filtered once per handler
+        if not records or records[-1] is not record:
+            records.append(record)
+        return False
+
+    @contextlib.contextmanager
+    def capture(self):
+        self._local.records = []
+        try:
+            yield self._local.records
+        finally:
+            self._local.records = None
+
+
+class _LazyPlugin(object):
+    """Plugin package imported when its first event is executed.
+
+    The events of the package are read from its MANIFEST, which is a
+    JSON file next to its __init__.py:
+
+        {
+            "events": [
+                {
+                    "module": "myplugin",
+                    "class": "Plugin",
+                    "method": "_setup",
+                    "stage": "STAGE_SETUP",
+                    "priority": "PRIORITY_DEFAULT",
+                    "name": "my.plugin.setup",
+                    "before": [],
+                    "after": [],
+                    "parallel_safe": false,
+                    "environment": {"MY/enable": true}
+                }
+            ]
+        }
+
+    module is relative to the package. stage and priority are names of
+    Stages constants or numbers. All but module, class, method and
+    stage are optional. If environment is set, the event is executed
+    only if all its keys have these values, and this is checked before
+    importing the package. The condition of the event, if any, is
+    checked after.
+
+    The manifest must list exactly the events of the package, this is
+    verified when it is imported.
+
+    """
+
+    MANIFEST = 'otopi-manifest.json'
+
+    @staticmethod
+    def hasManifest(path):
+        return os.path.exists(os.path.join(path, _LazyPlugin.MANIFEST))
+
+    def _stagesValue(self, value):
+        if isinstance(value, str):
+            value = getattr(plugin.Stages, value)
+        return value
+
+    def _createMethodinfo(self, event):
+        key = (
+            '%s.%s' % (self._name, event['module']),
+            event['class'],
+            event['method'],
+        )
+        environment = event.get('environment', {})
+
+        def _method():
+            self._resolve(key)['method']()
+
+        def _condition():
+            return all(
+                self._context.environment.get(k) == v
+                for k, v in environment.items()
+            ) and self._resolve(key)['condition']()
+
+        return {
+            'method': _method,
+            'condition': _condition,
+            'name': event.get('name'),
+            'stage': self._stagesValue(event['stage']),
+            'before': tuple(event.get('before', ())),
+            'after': tuple(event.get('after', ())),
+            'priority': self._stagesValue(
+                event.get('priority', plugin.Stages.PRIORITY_DEFAULT)
+            ),
+            'parallel_safe': event.get('parallel_safe', False),
+            'lazy': key,
+        }
+
+    def __init__(self, context, path, name):
+        self._context = context
+        self._path = path
+        self._name = name
+        self._events = None
+        manifest = os.path.join(path, self.MANIFEST)
+        try:
+            with open(manifest, 'r') as f:
+                self.methods = [
+                    self._createMethodinfo(event)
+                    for event in json.load(f)['events']
+                ]
+        except Exception as e:
+            raise RuntimeError(
+                _("Cannot read plugin manifest '{manifest}': {error}").format(
+                    manifest=manifest,
+                    error=e,
+                )
+            )
+
+    def _resolve(self, key):
+        if self._events is None:
+            self._context.logger.debug(
+                'Loading plugin %s (%s)',
+                self._name,
+                self._path,
+            )
+            # do not retry if failed
+            self._events = {}
+            events = {}
+            for p in self._context._loadPluginModule(self._path, self._name):
+                for methodinfo in self._context._pluginEvents(p):
+                    events[
+                        (
+                            p.__class__.__module__,
+                            p.__class__.__name__,
+                            methodinfo['method'].__name__,
+                        )
+                    ] = methodinfo
+            mismatch = set(events.keys()) ^ set(
+                m['lazy'] for m in self.methods
+            )
+            for m in self.methods:
+                if m['lazy'] in events:
+                    for attr in (
+                        'name',
+                        'stage',
+                        'priority',
+                        'parallel_safe',
+                    ):
+                        if events[m['lazy']][attr] != m[attr]:
+                            mismatch.add(m['lazy'])
+                    for attr in ('before', 'after'):
+                        if tuple(events[m['lazy']][attr]) != m[attr]:
+                            mismatch.add(m['lazy'])
+            if mismatch:
+                self._context.logger.debug(
+                    'Events not matching manifest: %s',
+                    sorted(mismatch),
+                )
+                raise RuntimeError(
+                    _(
+                        "Events of plugin '{name}' do not match "
+                        "its manifest"
+                    ).format(
+                        name=self._name,
+                    )
+                )
+            self._events = events
+        if key not in self._events:
+            raise RuntimeError(
+                _("Plugin '{name}' failed to load").format(
+                    name=self._name,
+                )
+            )
+        return self._events[key]
+
+
 @util.export
 class Context(base.Base):
     """Context.
@@ -52,6 +331,9 @@ class Context(base.Base):
         BaseEnv.EXCEPTION_INFO -- exception information
         BaseEnv.PLUGIN_PATH -- plugin search path
         BaseEnv.PLUGIN_GROUPS -- plugin groups to load
+        BaseEnv.PLUGIN_CACHE -- plugin discovery cache file
+        BaseEnv.PARALLEL_EVENTS -- max parallel safe events to run at once
+        BaseEnv.PROFILE -- profile events
 
     """
     def _earlyDebug(self, msg):
@@ -59,23 +341,16 @@ class Context(base.Base):
             print(msg, file=sys.stderr)
             sys.stderr.flush()
 
-    def _loadPlugins(self, base, path, groupname):
+    def _findPlugins(self, base, path, groupname, plugins, dirs):
         if (
             os.path.isdir(path) and
             os.path.basename(path)[0] not in ('_', '.')
         ):
+            dirs[path] = self._mtime(path)
             if not glob.glob(os.path.join(path, '__init__.py*')):
                 for d in glob.glob(os.path.join(path, '*')):
-                    self._loadPlugins(base, d, groupname)
+                    self._findPlugins(base, d, groupname, plugins, dirs)
             else:
-                self._earlyDebug(
-                    'Loading plugin %s:%s (%s)' % (
-                        groupname,
-                        os.path.basename(path),
-                        path,
-                    )
-                )
-
                 def _synth(s):
                     r = ''
                     for c in s:
@@ -92,26 +367,182 @@ class Context(base.Base):
                     ).replace('/', '.')
                 ).lstrip('.')
 
-                util.loadModule(
-                    os.path.dirname(path),
-                    'otopi.plugins.%s.%s%s' % (
+                plugins.append({
+                    'path': path,
+                    'name': 'otopi.plugins.%s.%s%s' % (
                         _synth(groupname),
                         '%s.' % prefix if prefix else '',
                         os.path.basename(path),
                     ),
-                ).createPlugins(self)
+                })
+
+    def _loadPlugins(self, base, path, groupname):
+        def _scan():
+            entry = {
+                'dirs': {},
+                'plugins': [],
+            }
+            self._findPlugins(
+                base,
+                path,
+                groupname,
+                entry['plugins'],
+                entry['dirs'],
+            )
+            return entry
+
+        for p in self._pluginCacheEntry('group:%s' % path, _scan)['plugins']:
+            if _LazyPlugin.hasManifest(p['path']):
+                self._earlyDebug(
+                    'Deferring plugin %s:%s (%s)' % (
+                        groupname,
+                        os.path.basename(p['path']),
+                        p['path'],
+                    )
+                )
+                self._lazyPlugins.append(
+                    _LazyPlugin(
+                        context=self,
+                        path=p['path'],
+                        name=p['name'],
+                    )
+                )
+            else:
+                self._earlyDebug(
+                    'Loading plugin %s:%s (%s)' % (
+                        groupname,
+                        os.path.basename(p['path']),
+                        p['path'],
+                    )
+                )
+                self._loadPluginModule(p['path'], p['name'])
+
+    def _loadPluginModule(self, path, name):
+        """Load plugin package, return the plugins it registered."""
+        first = len(self._plugins)
+        util.loadModule(os.path.dirname(path), name).createPlugins(self)
+        return self._plugins[first:]
+
+    def _pluginEvents(self, p):
+        """Return the events of plugin, bound to it."""
+        methods = []
+        for metadata in util.methodsByAttribute(
+            p.__class__, 'decoration_event'
+        ):
+            metadata = metadata.copy()
+            metadata['method'] = metadata['method'].__get__(p)
+            metadata['condition'] = metadata['condition'].__get__(p)
+            methods.append(metadata)
+        return methods
 
     def _loadPluginGroups(self, plugindir, needgroups, loadedgroups):
+        plugindir = self.resolveFile(plugindir)
+
+        def _scan():
+            return {
+                'dirs': {plugindir: self._mtime(plugindir)},
+                'groups': [
+                    path
+                    for path in glob.glob(os.path.join(plugindir, '*'))
+                    if os.path.isdir(path)
+                ],
+            }
+
+        for path in self._pluginCacheEntry(
+            'plugindir:%s' % plugindir,
+            _scan,
+        )['groups']:
+            groupname = os.path.basename(path)
+            if groupname in needgroups:
+                self._earlyDebug('Loading plugin group %s' % groupname)
+                loadedgroups.append(groupname)
+                self._loadPlugins(path, path, groupname)
+
+    _PLUGIN_CACHE_VERSION = 1
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
 
-        for path in glob.glob(os.path.join(self.resolveFile(plugindir), '*')):
-            if os.path.isdir(path):
-                groupname = os.path.basename(path)
-                if groupname in needgroups:
-                    self._earlyDebug('Loading plugin group %s' % groupname)
-                    loadedgroups.append(groupname)
-                    self._loadPlugins(path, path, groupname)
+    def _pluginCacheEntry(self, key, scan):
+        """Get plugin cache entry, scan if missing or stale.
+
+        An entry is stale if the mtime of any of its directories changed,
+        or if any of them was created or removed.
+
+        """
+        entry = self._pluginCache.get(key)
+        if entry is not None and any(
+            self._mtime(d) != mtime
+            for d, mtime in entry['dirs'].items()
+        ):
+            entry = None
+        if entry is None:
+            self._earlyDebug('Scanning plugins %s' % key)
+            entry = scan()
+        self._newPluginCache[key] = entry
+        return entry
+
+    def _readPluginCache(self):
+        self._pluginCache = {}
+        self._newPluginCache = {}
+        cachefile = self.resolveFile(
+            self.environment[constants.BaseEnv.PLUGIN_CACHE]
+        )
+        if cachefile is not None and os.path.exists(cachefile):
+            try:
+                with open(cachefile, 'r') as f:
+                    cache = json.load(f)
+                if cache.get('version') == self._PLUGIN_CACHE_VERSION:
+                    self._pluginCache = cache['entries']
+            except Exception as e:
+                self._earlyDebug(
+                    'Cannot read plugin cache %s: %s' % (cachefile, e)
+                )
+
+    def _writePluginCache(self):
+        cachefile = self.resolveFile(
+            self.environment[constants.BaseEnv.PLUGIN_CACHE]
+        )
+        # keep entries of groups that were not loaded this time,
+        # they are checked when used.
+        cache = dict(self._pluginCache)
+        cache.update(self._newPluginCache)
+        if cachefile is not None and cache != self._pluginCache:
+            fd = -1
+            tmpname = None
+            try:
+                fd, tmpname = tempfile.mkstemp(
+                    suffix='.tmp',
+                    prefix='%s.' % os.path.basename(cachefile),
+                    dir=os.path.dirname(cachefile),
+                )
+                with os.fdopen(fd, 'w') as f:
+                    fd = -1
+                    json.dump(
+                        {
+                            'version': self._PLUGIN_CACHE_VERSION,
+                            'entries': cache,
+                        },
+                        f,
+                    )
+                os.rename(tmpname, cachefile)
+                tmpname = None
+            except Exception as e:
+                self._earlyDebug(
+                    'Cannot write plugin cache %s: %s' % (cachefile, e)
+                )
+            finally:
+                if fd != -1:
+                    os.close(fd)
+                if tmpname is not None and os.path.exists(tmpname):
+                    os.unlink(tmpname)
 
     def methodName(self, methodinfo):
+        if 'lazy' in methodinfo:
+            return '%s.%s.%s' % methodinfo['lazy']
         method = methodinfo['method']
         return "%s.%s.%s" % (
             method.__self__.__class__.__module__,
@@ -119,14 +550,17 @@ class Context(base.Base):
             method.__name__
         )
 
-    def _executeMethod(self, stage, method):
-        if self.environment[constants.BaseEnv.LOG]:
-            self.logger.debug(
-                'Stage %s METHOD %s',
-                plugin.Stages.stage_id(stage),
-                self.methodName(method),
-            )
-        self._callPreEventCallbacks(stage, method)
+    def _runMethod(self, stage, method):
+        """Run method, return exception information if it failed."""
+        if self.environment[constants.BaseEnv.PROFILE]:
+            with self._profiler.event(
+                stage=plugin.Stages.stage_id(stage),
+                method=self.methodName(method),
+            ):
+                return self._invokeMethod(method)
+        return self._invokeMethod(method)
+
+    def _invokeMethod(self, method):
         try:
             if method['condition']():
                 method['method']()
@@ -135,15 +569,40 @@ class Context(base.Base):
                     '%s condition False',
                     self.methodName(method)
                 )
-        except Exception as e:
-            self.environment[constants.BaseEnv.ERROR] = True
-            self.environment[constants.BaseEnv.EXCEPTION_INFO].append(
-                sys.exc_info()
-            )
+        except Exception:
             self.logger.debug(
                 'method exception',
                 exc_info=True
             )
+            return sys.exc_info()
+        return None
+
+    def _executeMethod(self, stage, method, outcome=None):
+        """Execute method.
+
+        outcome -- log records and exception information of a method
+            that already ran, see _executeMethods().
+
+        """
+        if self.environment[constants.BaseEnv.LOG]:
+            self.logger.debug(
+                'Stage %s METHOD %s',
+                plugin.Stages.stage_id(stage),
+                self.methodName(method),
+            )
+        if outcome is None:
+            self._callPreEventCallbacks(stage, method)
+            exc_info = self._runMethod(stage, method)
+        else:
+            records, exc_info = outcome
+            for record in records:
+                logging.getLogger(record.name).handle(record)
+        if exc_info is not None:
+            e = exc_info[1]
+            self.environment[constants.BaseEnv.ERROR] = True
+            self.environment[constants.BaseEnv.EXCEPTION_INFO].append(
+                exc_info
+            )
             if isinstance(e, Abort):
                 self.environment[constants.BaseEnv.ABORTED] = True
                 self.logger.warning(_('Aborted'))
@@ -157,6 +616,64 @@ class Context(base.Base):
             self.notify(event=self.NOTIFY_ERROR)
         self._callPostEventCallbacks(stage, method)
 
+    def _executeMethods(self, stage, methods):
+        """Execute independent methods concurrently.
+
+        The pre event callbacks of all methods are called before they
+        start, in sequence order. Log records of each method are held
+        back and emitted after all methods are done, in sequence order,
+        each followed by its error handling and post event callbacks.
+
+        """
+        for method in methods:
+            self._callPreEventCallbacks(stage, method)
+        logBuffer = _EventLogBuffer()
+        handlers = logging.getLogger(constants.Log.LOGGER_BASE).handlers[:]
+        for handler in handlers:
+            handler.addFilter(logBuffer)
+        try:
+            def _run(method):
+                with logBuffer.capture() as records:
+                    exc_info = self._runMethod(stage, method)
+                return records, exc_info
+
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(
+                    len(methods),
+                    self.environment[constants.BaseEnv.PARALLEL_EVENTS],
+                ),
+            ) as executor:
+                results = list(executor.map(_run, methods))
+        finally:
+            for handler in handlers:
+                handler.removeFilter(logBuffer)
+
+        for method, outcome in zip(methods, results):
+            self._executeMethod(stage, method, outcome=outcome)
+
+    def _methodBatches(self, methods):
+        """Split stage methods into batches to execute.
+
+        Parallel safe methods of the same toposort group do not depend
+        on each other, they are batched at the position of the first.
+
+        """
+        parallel = self.environment[constants.BaseEnv.PARALLEL_EVENTS] > 1
+        groups = {}
+        if parallel:
+            for method in methods:
+                if method.get('parallel_safe'):
+                    groups.setdefault(method['toposort_group'], []).append(
+                        method
+                    )
+        for method in methods:
+            if parallel and method.get('parallel_safe'):
+                batch = groups.pop(method['toposort_group'], None)
+                if batch is not None:
+                    yield batch
+            else:
+                yield [method]
+
     (
         NOTIFY_ERROR,   # error occurred.
         NOTIFY_REEXEC,  # about to re-execute process.
@@ -192,15 +709,25 @@ class Context(base.Base):
         """Current stage."""
         return self._currentStage
 
+    @property
+    def profiler(self):
+        """Event profiler."""
+        return self._profiler
+
     def __init__(self):
         """Constructor."""
         super(Context, self).__init__()
         self._sequence = {}
         self._plugins = []
+        self._lazyPlugins = []
         self._notifications = []
         self._pre_event_callbacks = []
         self._post_event_callbacks = []
-        self._environment = {
+        self._environmentStrings = {}
+        self._pluginCache = {}
+        self._newPluginCache = {}
+        self._profiler = profiler.Profiler()
+        self._environment = _Environment({
             constants.BaseEnv.ERROR: False,
             constants.BaseEnv.ABORTED: False,
             constants.BaseEnv.EXCEPTION_INFO: [],
@@ -215,6 +742,9 @@ class Context(base.Base):
             constants.BaseEnv.LOG: False,
             constants.BaseEnv.PLUGIN_PATH: config.otopiplugindir,
             constants.BaseEnv.PLUGIN_GROUPS: 'otopi',
+            constants.BaseEnv.PLUGIN_CACHE: os.environ.get(
+                constants.SystemEnvironment.PLUGIN_CACHE
+            ),
             constants.BaseEnv.DEBUG: int(
                 os.environ.get(
                     constants.SystemEnvironment.DEBUG,
@@ -222,12 +752,14 @@ class Context(base.Base):
                 )
             ),
             constants.BaseEnv.RANDOMIZE_EVENTS: False,
+            constants.BaseEnv.PARALLEL_EVENTS: 4,
+            constants.BaseEnv.PROFILE: False,
             constants.BaseEnv.FAIL_ON_PRIO_OVERRIDE: not os.environ.get(
                 constants.SystemEnvironment.ALLOW_PRIORITY_OVERRIDE,
                 False
             ),
             constants.BaseEnv.IGNORE_MISSING_BEFORE_AFTER: True,
-        }
+        })
         self.registerDialog(dialog.DialogBase())
         self.registerServices(services.ServicesBase())
         self.registerPackager(packager.PackagerBase())
@@ -355,18 +887,36 @@ class Context(base.Base):
         # Add empty dependences where needed.
         for item in extra_items_in_deps:
             data[item] = set()
-        while True:
-            ordered = set(item for item, dep in data.items() if len(dep) == 0)
-            if not ordered:
-                break
+
+        # Count pending dependencies per item and index the reverse
+        # edges, so that each layer only visits the items that depend
+        # on it instead of rescanning everything that is left.
+        pending = {}
+        dependents = {}
+        for item, dep in data.items():
+            pending[item] = len(dep)
+            for d in dep:
+                dependents.setdefault(d, []).append(item)
+        ordered = set(item for item, count in pending.items() if count == 0)
+        done = set()
+        while ordered:
             yield ordered
-            newdata = {}
-            for item, dep in data.items():
-                if item not in ordered:
-                    newdata[item] = (dep - ordered)
-            data = newdata
-        if len(data) != 0:
-            raise Context.ToposortCycleException(data)
+            done |= ordered
+            nextordered = set()
+            for item in ordered:
+                for dependent in dependents.get(item, ()):
+                    pending[dependent] -= 1
+                    if pending[dependent] == 0:
+                        nextordered.add(dependent)
+            ordered = nextordered
+        if len(done) != len(data):
+            raise Context.ToposortCycleException(
+                dict(
+                    (item, dep - done)
+                    for item, dep in data.items()
+                    if item not in done
+                )
+            )
 
     def _toposortBuildSequence(self):
         # Build the sequence by doing a topological sort over the list of
@@ -379,13 +929,9 @@ class Context(base.Base):
         had_errors = False
         methods = []
         for p in self._plugins:
-            for metadata in util.methodsByAttribute(
-                p.__class__, 'decoration_event'
-            ):
-                metadata = metadata.copy()
-                metadata['method'] = metadata['method'].__get__(p)
-                metadata['condition'] = metadata['condition'].__get__(p)
-                methods.append(metadata)
+            methods.extend(self._pluginEvents(p))
+        for lazyplugin in self._lazyPlugins:
+            methods.extend(lazyplugin.methods)
 
         method_by_name = {}
         self._earlyDebug('methods:')
@@ -409,25 +955,78 @@ class Context(base.Base):
                     had_errors = True
                 method_by_name[method['name']] = method
 
+        #
+        # index methods by name and by the names they have to run
+        # before, so we do not have to scan all methods for each one.
+        # A string (instead of a tuple) before/after is a bug that
+        # checkSequence reports, but until then it is matched as a
+        # substring, so keep such methods aside and scan them.
+        #
+        indices_by_name = {}
+        indices_by_before = {}
+        string_before = []
+        for index, method in enumerate(methods):
+            if method['name'] is not None:
+                indices_by_name.setdefault(method['name'], []).append(index)
+            if isinstance(method['before'], str):
+                string_before.append(index)
+            elif method['before'] is not None:
+                for name in set(method['before']):
+                    indices_by_before.setdefault(name, []).append(index)
+
+        #
+        # group methods of each stage into priority buckets, a method
+        # depends on all methods of the previous bucket only, the rest
+        # is implied by transitivity.
+        #
+        buckets = {}
+        for index, method in enumerate(methods):
+            buckets.setdefault(
+                method['stage'], {}
+            ).setdefault(
+                method['priority'], []
+            ).append(index)
+        lower_bucket = {}
+        lower_priority = {}
+        for stage, stage_buckets in buckets.items():
+            previous = []
+            lower = frozenset()
+            for priority in sorted(stage_buckets.keys()):
+                lower_bucket[(stage, priority)] = previous
+                lower_priority[(stage, priority)] = lower
+                previous = stage_buckets[priority]
+                lower = lower | frozenset(previous)
+
+        def _lower_priority_methods(method):
+            return lower_priority[(method['stage'], method['priority'])]
+
         deps = {}
+        ba_deps = {}
         self._earlyDebug('deps:')
         for index, method in enumerate(methods):
             # list of methods that method depends on, i.e. should be run
             # before it.
-            before_after_method_deps = [
-                i for i, m in enumerate(methods)
-                if (
-                    (
-                        method['name'] is not None and
-                        m['before'] is not None and
-                        method['name'] in m['before']
-                    ) or (
-                        m['name'] is not None and
-                        method['after'] is not None and
-                        m['name'] in method['after']
-                    )
+            before_after_method_deps = set()
+            if method['name'] is not None:
+                before_after_method_deps.update(
+                    indices_by_before.get(method['name'], ())
                 )
-            ]
+                before_after_method_deps.update(
+                    i for i in string_before
+                    if method['name'] in methods[i]['before']
+                )
+            if isinstance(method['after'], str):
+                before_after_method_deps.update(
+                    i for i, m in enumerate(methods)
+                    if m['name'] is not None and m['name'] in method['after']
+                )
+            elif method['after'] is not None:
+                for name in method['after']:
+                    before_after_method_deps.update(
+                        indices_by_name.get(name, ())
+                    )
+            before_after_method_deps = sorted(before_after_method_deps)
+            ba_deps[index] = before_after_method_deps
             if before_after_method_deps:
                 self._earlyDebug(
                     (
@@ -475,32 +1074,29 @@ class Context(base.Base):
                         )
                     )
                     had_errors = True
-            method_deps = [
-                j for j, m in enumerate(methods)
-                if (
-                    (
-                        m['stage'] == method['stage'] and
-                        m['priority'] < method['priority']
-                    ) or
-                    j in before_after_method_deps
-                )
-            ]
-            if set(method_deps) != set(before_after_method_deps):
-                self._earlyDebug(
-                    (
-                        '  deps added due to priority for {index} :'
-                        '{methods}'
-                    ).format(
-                        index=index,
-                        methods=list(
-                            set(method_deps)-set(before_after_method_deps)
-                        ),
+            if self.environment[constants.BaseEnv.DEBUG] > 0:
+                priority_method_deps = _lower_priority_methods(
+                    method
+                ).difference(before_after_method_deps)
+                if priority_method_deps:
+                    self._earlyDebug(
+                        (
+                            '  deps added due to priority for {index} :'
+                            '{methods}'
+                        ).format(
+                            index=index,
+                            methods=sorted(priority_method_deps),
+                        )
                     )
-                )
-            deps[index] = set(method_deps)
+            deps[index] = set(before_after_method_deps)
+            deps[index].update(
+                lower_bucket[(method['stage'], method['priority'])]
+            )
         sortedmethods = []
+        toposort_groups = []
         try:
             for toposort_group_set in self._toposort(deps):
+                toposort_groups.append(toposort_group_set)
                 # toposort yields sets
                 toposort_group = list(toposort_group_set)
                 if self.environment[constants.BaseEnv.RANDOMIZE_EVENTS]:
@@ -518,9 +1114,21 @@ class Context(base.Base):
                             methods[i]['name']
                         )
                     )
+                for i in toposort_group:
+                    methods[i]['toposort_group'] = len(toposort_groups)
                 sortedmethods.extend([methods[i] for i in toposort_group])
         except Context.ToposortCycleException as e:
-            leftovers = e.leftovers
+            # the sort was done over edges between adjacent priority
+            # buckets only, report the complete dependencies of the
+            # leftovers, reduced by the groups that were sorted.
+            leftovers = {}
+            for i in e.leftovers.keys():
+                s = set(_lower_priority_methods(methods[i])).union(ba_deps[i])
+                # self dependencies are ignored, as by toposort
+                s.discard(i)
+                for toposort_group_set in toposort_groups:
+                    s = s - toposort_group_set
+                leftovers[i] = s
             print(
                 (
                     'error: toposort failed due to a cycle: {leftovers}\n'
@@ -594,12 +1202,58 @@ class Context(base.Base):
             self._earlyDebug("_toposortBuildSequence failed: %s" % e)
             raise
 
+    _IMMUTABLE_TYPES = (type(None), bool, int, float, str, bytes)
+
     def _typed_value_str(self, value):
         return '%s:%s' % (
             common.typeName(value),
             common.toStr(value)
         )
 
+    def _valueFingerprint(self, value):
+        """Return fingerprint of value, changed if modified in place.
+
+        Containers are compared by their items, other objects by
+        identity only.
+
+        """
+        if type(value) in self._IMMUTABLE_TYPES:
+            return value
+        if isinstance(value, dict):
+            return (
+                id(value),
+                tuple(
+                    (k, self._valueFingerprint(v))
+                    for k, v in value.items()
+                ),
+            )
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return (
+                id(value),
+                tuple(self._valueFingerprint(v) for v in value),
+            )
+        return id(value)
+
+    def _environmentSnapshot(self):
+        """Return fingerprints of values that may change in place.
+
+        Typed value strings are cached per key, and formatted again only
+        if the fingerprint of the value changed.
+
+        """
+        ret = {}
+        for key, value in self.environment.items():
+            if type(value) not in self._IMMUTABLE_TYPES:
+                fingerprint = self._valueFingerprint(value)
+                cached = self._environmentStrings.get(key)
+                if cached is None or cached[0] != fingerprint:
+                    self._environmentStrings[key] = (
+                        fingerprint,
+                        self._typed_value_str(value),
+                    )
+                ret[key] = fingerprint
+        return ret
+
     def runSequence(self):
         """Run sequence."""
         for self._currentStage in sorted(self._sequence.keys()):
@@ -619,17 +1273,28 @@ class Context(base.Base):
                 self.logger.debug(
                     "STAGE %s" % plugin.Stages.stage_id(self._currentStage)
                 )
-                for methodinfo in self._sequence[self._currentStage]:
+                # An error stops the rest of such stages once the
+                # batch it occurred in is done.
+                for batch in self._methodBatches(
+                    self._sequence[self._currentStage],
+                ):
                     if (
                         not if_no_error or
                         not self.environment[constants.BaseEnv.ERROR]
                     ):
-                        oldEnvironment = dict(
-                            (k, self._typed_value_str(v))
-                            for k, v in self.environment.items()
+                        # Immutable values can only be replaced, the
+                        # modified keys are enough to find them, so
+                        # only the rest needs a snapshot.
+                        oldEnvironment = self._environmentSnapshot()
+                        self.environment.resetModified()
+                        if len(batch) > 1:
+                            self._executeMethods(self._currentStage, batch)
+                        else:
+                            self._executeMethod(self._currentStage, batch[0])
+                        self.dumpEnvironment(
+                            old=oldEnvironment,
+                            modified=self.environment.modified(),
                         )
-                        self._executeMethod(self._currentStage, methodinfo)
-                        self.dumpEnvironment(old=oldEnvironment)
 
         if self.environment[constants.BaseEnv.ERROR]:
             infos = self.environment[
@@ -749,16 +1414,59 @@ class Context(base.Base):
         if not ok:
             raise RuntimeError(_('Found bad "before" or "after" parameters'))
 
-    def dumpEnvironment(self, old=None):
-        """Dump environment."""
+    def dumpEnvironment(self, old=None, modified=None):
+        """Dump environment.
+
+        Keyword arguments:
+        old -- dict of key to typed value string, if set dump only keys
+            that were added or whose value differs.
+        modified -- dict of key to previous value, as returned by
+            _Environment.modified(). If set, old is as returned by
+            _environmentSnapshot(), and only the modified keys and the
+            values whose fingerprint changed are compared.
+
+        """
+        keys = self.environment.keys()
+        if modified is not None:
+            fingerprints = old
+            old = {}
+            for key, value in modified.items():
+                if key in fingerprints:
+                    old[key] = self._environmentStrings[key][1]
+                elif value is not _Environment.MISSING:
+                    old[key] = self._typed_value_str(value)
+            for key, fingerprint in fingerprints.items():
+                if (
+                    key not in modified and
+                    self._valueFingerprint(
+                        self.environment[key]
+                    ) != fingerprint
+                ):
+                    old[key] = self._environmentStrings[key][1]
+            keys = [
+                key for key in set(old) | set(modified)
+                if key in self.environment
+            ]
+
         diff = False
-        for key in sorted(self.environment.keys()):
+        for key in sorted(keys):
             value = self.environment[key]
+            valueStr = None
+            if old is not None:
+                valueStr = self._typed_value_str(value)
+            if modified is not None:
+                if type(value) in self._IMMUTABLE_TYPES:
+                    self._environmentStrings.pop(key, None)
+                else:
+                    self._environmentStrings[key] = (
+                        self._valueFingerprint(value),
+                        valueStr,
+                    )
 
             if (
                 old is None or
                 key not in old or  # Dump if added, even if None
-                self._typed_value_str(value) != old[key]
+                valueStr != old[key]
             ):
                 if not diff:
                     diff = True
@@ -796,11 +1504,13 @@ class Context(base.Base):
         ))
         needgroups.add('otopi')   # always load us
 
+        self._readPluginCache()
         loadedgroups = []
         for plugindir in mysplit(
             self.environment[constants.BaseEnv.PLUGIN_PATH]
         ):
             self._loadPluginGroups(plugindir, needgroups, loadedgroups)
+        self._writePluginCache()
 
         if set(needgroups) != set(loadedgroups):
             raise RuntimeError(
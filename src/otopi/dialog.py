@@ -10,10 +10,13 @@ Dialog is the component responsible of intraction with manager.
 """
 
 
+import contextlib
 import getpass
 import gettext
 import logging
 import os
+import select
+import stat
 import sys
 
 
@@ -142,8 +145,15 @@ class DialogBaseImpl(DialogBase):
 
     def __init__(self):
         self.__input = None
+        self.__inputBuffer = bytearray()
+        self.__inputEOF = False
         self.__output = None
+        self.__outputFsync = False
+        self.__messageDepth = 0
+        self.__messagePending = False
         self.__handler = None
+        self._question_occurrences = {}
+        self._answered = set()
 
     def __setupStdHandles(self):
         self.__flush(sys.stdout)
@@ -163,16 +173,18 @@ class DialogBaseImpl(DialogBase):
             )
 
     def __setupDialogChannel(self, logFormatter=None):
+        # read using the descriptor, see __fillInput().
         self.__input = os.fdopen(
             os.dup(self.__stdhandles[0]),
             'rt',
             1
         )
+        # block buffered, flushed once per message, see _message().
         self.__output = os.fdopen(
             os.dup(self.__stdhandles[1]),
             'wt',
-            1
         )
+        self.__outputFsync = self.__isRegularFile(self.__output)
         self.__handler = logging.StreamHandler(self.__output)
         self.__handler.setLevel(logging.INFO)
         if logFormatter is not None:
@@ -191,13 +203,31 @@ class DialogBaseImpl(DialogBase):
         for i in range(3):
             os.dup2(self.__stdhandles[i], i)
 
-    def __flush(self, stream):
-        stream.flush()
+    def __isRegularFile(self, stream):
         try:
-            # tty [at least] gets errors
-            os.fsync(stream.fileno())
-        except OSError:
-            pass
+            return stat.S_ISREG(os.fstat(stream.fileno()).st_mode)
+        except (OSError, ValueError):
+            return False
+
+    def __flush(self, stream, fsync=None):
+        """Flush stream, fsync only if it is a regular file.
+
+        fsync is pointless for pipes, sockets and terminals.
+
+        """
+        stream.flush()
+        if fsync is None:
+            fsync = self.__isRegularFile(stream)
+        if fsync:
+            try:
+                os.fsync(stream.fileno())
+            except OSError:
+                pass
+
+    def __flushOutput(self):
+        self.__messagePending = False
+        if self.__output is not None:
+            self.__flush(self.__output, fsync=self.__outputFsync)
 
     def __logString(self, name, string):
         for line in string.splitlines():
@@ -224,7 +254,126 @@ class DialogBaseImpl(DialogBase):
     def _output_isatty(self):
         return self.__output.isatty()
 
-    def _readline(self, hidden=False):
+    def __fillInput(self, block=True):
+        """Read available input into buffer.
+
+        Input is read from the descriptor and not from the stream, so
+        that no input is hidden in the stream buffer when polling.
+
+        Returns False if nothing was read.
+
+        """
+        if self.__inputEOF:
+            return False
+        fd = self.__input.fileno()
+        if not block and not select.select([fd], [], [], 0)[0]:
+            return False
+        data = os.read(fd, 4096)
+        if not data:
+            self.__inputEOF = True
+            return False
+        self.__inputBuffer += data
+        return True
+
+    def __decodeLine(self, line):
+        return bytes(line).decode(
+            self.__input.encoding,
+            'replace',
+        ).rstrip('\n').rstrip('\r')
+
+    def __nextLine(self, final=False):
+        """Return next buffered line or None.
+
+        If final, return the last partial line as well.
+
+        """
+        index = self.__inputBuffer.find(b'\n')
+        if index == -1:
+            if not final or not self.__inputBuffer:
+                return None
+            index = len(self.__inputBuffer) - 1
+        line = self.__decodeLine(self.__inputBuffer[:index + 1])
+        del self.__inputBuffer[:index + 1]
+        return line
+
+    def __readInputLine(self):
+        while True:
+            value = self.__nextLine()
+            if value is not None:
+                return value
+            if not self.__fillInput():
+                value = self.__nextLine(final=True)
+                if value is None:
+                    raise IOError(_('End of file'))
+                return value
+
+    def _questionKey(self, name):
+        """Return environment key of the answer to next query of name."""
+        occurrence = self._question_occurrences.get(name, 1)
+        self._question_occurrences[name] = occurrence+1
+        return '{prefix}{occurrence}/{name}'.format(
+            prefix=constants.CoreEnv.QUESTION_PREFIX,
+            occurrence=str(occurrence),
+            name=name,
+        )
+
+    def _storeAnswer(self, key, value):
+        """Store answer received from manager.
+
+        Keys of hidden questions are filtered from the log, as answer
+        file keys are, see core/config.
+
+        """
+        self.environment[key] = value
+        self._answered.add(key)
+        if key.split('/')[-1] in self.environment[
+            constants.CoreEnv.LOG_FILTER_QUESTIONS
+        ]:
+            self.environment[
+                constants.CoreEnv.LOG_FILTER_QUESTIONS_KEYS
+            ].add(key)
+        self.logger.debug('answer received for %s', key)
+
+    def _consumeInput(self, line):
+        """Consume unsolicited input.
+
+        Dialects may accept input that is not a response to a query,
+        for example answers to later queries. Return True if line was
+        consumed, it is then not returned by _readline().
+
+        """
+        return False
+
+    def _pollInput(self):
+        """Consume unsolicited input available without blocking.
+
+        Stops at first line which is not consumed, and leaves it to be
+        returned by _readline().
+
+        """
+        if self.__input is None:
+            return
+        while self.__fillInput(block=False):
+            pass
+        while True:
+            index = self.__inputBuffer.find(b'\n')
+            if index == -1:
+                break
+            line = self.__decodeLine(self.__inputBuffer[:index + 1])
+            if not self._consumeInput(line):
+                break
+            del self.__inputBuffer[:index + 1]
+
+    def _readline(self, hidden=False, unsolicited=True):
+        """Read a line of input.
+
+        Keyword arguments:
+        hidden -- do not echo and do not log.
+        unsolicited -- pass lines to _consumeInput() first.
+
+        """
+        # never wait for input with the prompt still buffered
+        self.__flushOutput()
         getpass_error = True
         if hidden and self.__input.isatty():
             old = os.dup(0)
@@ -233,6 +382,7 @@ class DialogBaseImpl(DialogBase):
                 with open(os.devnull, 'w+') as null:
                     value = getpass.getpass(prompt='', stream=null)
                     self.__output.write('\n')
+                    self.__output.flush()
                     getpass_error = False
             except RuntimeError as e:
                 # probably signal
@@ -243,9 +393,9 @@ class DialogBaseImpl(DialogBase):
                 os.dup2(old, 0)
 
         if not hidden or getpass_error:
-            value = self.__input.readline()
-            if not value:
-                raise IOError(_('End of file'))
+            value = self.__readInputLine()
+            while unsolicited and self._consumeInput(value):
+                value = self.__readInputLine()
 
         value = value.rstrip('\n')
         if not hidden:
@@ -253,7 +403,26 @@ class DialogBaseImpl(DialogBase):
         return value
 
     def _flush(self):
-        self.__flush(stream=self.__output)
+        if self.__messageDepth:
+            self.__messagePending = True
+        else:
+            self.__flushOutput()
+
+    @contextlib.contextmanager
+    def _message(self):
+        """Write output within as a single message.
+
+        Flushes requested within, including by nested messages, are
+        deferred and performed once at the end of the outer message.
+
+        """
+        self.__messageDepth += 1
+        try:
+            yield
+        finally:
+            self.__messageDepth -= 1
+            if not self.__messageDepth and self.__messagePending:
+                self.__flushOutput()
 
     def _write(self, text, flush=True):
         if self.__output is None:
@@ -263,7 +432,7 @@ class DialogBaseImpl(DialogBase):
             self.__logString('SEND', text)
             self.__output.write(text)
             if flush:
-                self.__flush(self.__output)
+                self._flush()
 
     def _output_terminal_width(self):
         res = 80
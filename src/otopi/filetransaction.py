@@ -12,10 +12,10 @@ import grp
 import os
 import pwd
 import shutil
-import subprocess
 import tempfile
 
 
+from . import backupstore
 from . import common
 from . import transaction
 from . import util
@@ -25,6 +25,9 @@ def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
 
+_CHUNK_SIZE = 65536
+
+
 @util.export
 class FileTransaction(transaction.TransactionElement):
     """File transaction element."""
@@ -74,6 +77,7 @@ class FileTransaction(transaction.TransactionElement):
         return ret
 
     _atomicMove = _defaultAtomicMove
+    _backupStore = None
 
     @property
     def name(self):
@@ -94,6 +98,15 @@ class FileTransaction(transaction.TransactionElement):
     def getAtomicMove(clz, function):
         return clz._atomicMove
 
+    @classmethod
+    def registerBackupStore(clz, store):
+        """Register default backup store, None for legacy backups."""
+        clz._backupStore = store
+
+    @classmethod
+    def getBackupStore(clz):
+        return clz._backupStore
+
     def __init__(
         self,
         name,
@@ -108,6 +121,7 @@ class FileTransaction(transaction.TransactionElement):
         enforcePermissions=False,
         visibleButUnsafe=False,
         modifiedList=None,
+        backupStore=None,
     ):
         """Constructor.
 
@@ -120,6 +134,9 @@ class FileTransaction(transaction.TransactionElement):
         Keyword arguments:
         name -- name of file.
         content -- content of file (string or list of lines).
+            May also be an iterator of lines, or of data if binary, or a
+            file object. These are streamed into the new file and never
+            held in memory as a whole.
         binary -- True if the content is binary data. If False, the content is
             encoded to allow comparing with file content or writing to file.
         mode -- mode of file.
@@ -132,23 +149,14 @@ class FileTransaction(transaction.TransactionElement):
             if previous file was exists.
         visibleButUnsafe -- if True during transaction new content is visible.
         modifiedList -- a list to add file name if was changed.
+        backupStore -- backupstore.BackupStore to keep backup in, default
+            is the registered store, if none backup is kept next to file.
 
         """
         super(FileTransaction, self).__init__()
         self._name = name
-
-        if binary:
-            self._content = content
-        else:
-            if isinstance(content, list) or isinstance(content, tuple):
-                self._content = u'\n'.join([common.toUStr(i) for i in content])
-                if content:
-                    self._content += '\n'
-            else:
-                self._content = common.toStr(content)
-                if not self._content.endswith('\n'):
-                    self._content += '\n'
-            self._content = self._content.encode("utf-8")
+        self._content = content
+        self._binary = binary
 
         self._mode = mode
         self._dmode = dmode
@@ -169,50 +177,218 @@ class FileTransaction(transaction.TransactionElement):
             self._dgroup = grp.getgrnam(dgroup)[2]
         self._tmpname = None
         self._backup = None
+        self._backupStore = (
+            backupStore if backupStore is not None
+            else type(self)._backupStore
+        )
+        self._backupEntry = None
         self._originalFileWasMissing = not os.path.exists(self._name)
         self._prepared = False
         self._originalDiffer = True
         self._createdDirectory = None
+        self._deferSync = False
+        self._syncPending = False
+        self._deferRelabel = False
+        self._relabelPending = False
+        self._deferCommitted = False
+        self._committedPending = False
 
     def __str__(self):
         return _("File transaction for '{file}'").format(
             file=self._name
         )
 
-    def prepare(self):
-        if self._originalFileWasMissing:
-            self.logger.debug("file '%s' missing" % self._name)
+    def deferSync(self):
+        self._deferSync = True
+        return True
+
+    def syncPaths(self):
+        return (self._tmpname,) if self._syncPending else ()
+
+    def deferRelabel(self):
+        self._deferRelabel = True
+        return True
+
+    def relabelPaths(self):
+        if not self._relabelPending:
+            return ()
+        return (
+            self._name if self._createdDirectory is None
+            else self._createdDirectory,
+        )
+
+    def deferCommitted(self):
+        self._deferCommitted = True
+        return True
+
+    def committed(self):
+        if self._committedPending:
+            self._committedPending = False
+            if self._modifiedList is not None:
+                self._modifiedList.append(self._name)
+
+    def commitKey(self):
+        return self._name
+
+    def journalEntry(self):
+        if not self._prepared:
+            return None
+        return {
+            'name': self._name,
+            'tmpname': self._tmpname,
+            'backup': self._backup,
+            'backupStore': (
+                None if self._backupEntry is None
+                else self._backupStore.directory
+            ),
+            'backupEntry': self._backupEntry,
+            'originalFileWasMissing': self._originalFileWasMissing,
+            'visibleButUnsafe': self._visibleButUnsafe,
+        }
+
+    @classmethod
+    def recover(clz, entry, commit):
+        name = entry['name']
+        if commit:
+            if (
+                not entry['visibleButUnsafe'] and
+                os.path.exists(entry['tmpname'])
+            ):
+                clz._atomicMove(
+                    source=entry['tmpname'],
+                    destination=name,
+                )
+            transaction.restoreContexts(paths=(name,))
+        elif not entry['visibleButUnsafe']:
+            if os.path.exists(entry['tmpname']):
+                os.unlink(entry['tmpname'])
+        elif entry['originalFileWasMissing']:
+            if os.path.exists(name):
+                os.unlink(name)
+        elif entry['backupEntry'] is not None:
+            backupstore.BackupStore(
+                directory=entry['backupStore'],
+            ).restore(
+                entry=entry['backupEntry'],
+                destination=name,
+            )
+        elif os.path.exists(entry['backup']):
+            clz._atomicMove(
+                source=entry['backup'],
+                destination=name,
+            )
+
+    def _isStream(self):
+        content = self._content
+        if hasattr(content, 'read'):
+            return True
+        if isinstance(content, (str, bytes, bytearray, list, tuple)):
+            return False
+        return hasattr(content, '__iter__')
+
+    def _encodedContent(self):
+        """Return content to write, encoded."""
+        content = self._content
+        if self._binary:
+            return content
+        if isinstance(content, list) or isinstance(content, tuple):
+            content = u'\n'.join([common.toUStr(i) for i in content])
+            if content:
+                content += '\n'
         else:
-            self.logger.debug("file '%s' exists" % self._name)
-            with open(self._name, 'rb') as f:
-                if f.read() == self._content:
-                    self.logger.debug(
-                        "file '%s' already has content" % self._name
-                    )
-                    self._originalDiffer = False
+            content = common.toStr(content)
+            if not content.endswith('\n'):
+                content += '\n'
+        return content.encode("utf-8")
+
+    def _streamedContent(self):
+        """Yield content to write in chunks, encoded."""
+        content = self._content
+        if hasattr(content, 'read'):
+            while True:
+                chunk = content.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if not isinstance(chunk, bytes):
+                    chunk = chunk.encode("utf-8")
+                yield chunk
+        elif self._binary:
+            for chunk in content:
+                yield chunk
+        else:
+            for line in content:
+                yield (u'%s\n' % common.toUStr(line)).encode("utf-8")
 
-        if self._originalDiffer:
-            mydir = os.path.dirname(self._name)
-            if self._originalFileWasMissing:
-                if not os.path.exists(mydir):
-                    self._createdDirectory = self._createDirRecursive(mydir)
-            else:
-                # check we can open file for write
-                with open(self._name, 'a'):
-                    pass
+    @staticmethod
+    def _fileContent(name):
+        with open(name, 'rb') as f:
+            while True:
+                chunk = f.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def _sameContent(name, size, chunks):
+        """Return True if file name has size and the content of chunks.
 
-                currentStat = os.stat(self._name)
-                if not self._enforcePermissions:
-                    self._mode = currentStat.st_mode
-                    self._owner = currentStat.st_uid
-                    self._group = currentStat.st_gid
+        Size is compared first, then content chunk by chunk, so files
+        of a different size are not read at all.
 
-                #
-                # backup the file
-                #
+        """
+        if os.stat(name).st_size != size:
+            return False
+        with open(name, 'rb') as f:
+            for chunk in chunks:
+                view = memoryview(chunk)
+                while view:
+                    data = f.read(min(len(view), _CHUNK_SIZE))
+                    if not data or data != view[:len(data)]:
+                        return False
+                    view = view[len(data):]
+            return not f.read(1)
+
+    def _createTemporary(self, mydir, chunks):
+        """Write chunks into new temporary file, return its descriptor."""
+        fd, self._tmpname = tempfile.mkstemp(
+            suffix=".tmp",
+            prefix="%s." % os.path.basename(self._name),
+            dir=mydir,
+        )
+        with os.fdopen(fd, 'wb', closefd=False) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return fd
+
+    def _prepareTarget(self, mydir):
+        """Create directory, or check and backup existing file."""
+        if self._originalFileWasMissing:
+            if not os.path.exists(mydir):
+                self._createdDirectory = self._createDirRecursive(mydir)
+        else:
+            # check we can open file for write
+            with open(self._name, 'a'):
+                pass
+
+            currentStat = os.stat(self._name)
+            if not self._enforcePermissions:
+                self._mode = currentStat.st_mode
+                self._owner = currentStat.st_uid
+                self._group = currentStat.st_gid
+
+            #
+            # backup the file
+            #
+            timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+            if self._backupStore is not None:
+                self._backupEntry = self._backupStore.backup(
+                    name=self._name,
+                    timestamp=timestamp,
+                )
+            else:
                 self._backup = "%s.%s" % (
                     self._name,
-                    datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+                    timestamp,
                 )
                 self.logger.debug(
                     "backup '%s'->'%s'" % (
@@ -228,13 +404,53 @@ class FileTransaction(transaction.TransactionElement):
                     currentStat.st_gid
                 )
 
-            fd = -1
-            try:
-                fd, self._tmpname = tempfile.mkstemp(
-                    suffix=".tmp",
-                    prefix="%s." % os.path.basename(self._name),
-                    dir=mydir,
-                )
+    def prepare(self):
+        fd = -1
+        content = None if self._isStream() else self._encodedContent()
+        try:
+            if self._originalFileWasMissing:
+                self.logger.debug("file '%s' missing" % self._name)
+            else:
+                self.logger.debug("file '%s' exists" % self._name)
+                if content is None:
+                    # stream into the new file, then compare files
+                    fd = self._createTemporary(
+                        os.path.dirname(self._name),
+                        self._streamedContent(),
+                    )
+                    same = self._sameContent(
+                        self._name,
+                        os.fstat(fd).st_size,
+                        self._fileContent(self._tmpname),
+                    )
+                else:
+                    same = self._sameContent(
+                        self._name,
+                        len(content),
+                        (content,),
+                    )
+                if same:
+                    self.logger.debug(
+                        "file '%s' already has content" % self._name
+                    )
+                    self._originalDiffer = False
+                    if fd != -1:
+                        os.close(fd)
+                        fd = -1
+                        os.unlink(self._tmpname)
+                        self._tmpname = None
+
+            if self._originalDiffer:
+                mydir = os.path.dirname(self._name)
+                self._prepareTarget(mydir)
+                if fd == -1:
+                    fd = self._createTemporary(
+                        mydir,
+                        (
+                            self._streamedContent() if content is None
+                            else (content,)
+                        ),
+                    )
 
                 os.chown(
                     self._tmpname,
@@ -250,8 +466,11 @@ class FileTransaction(transaction.TransactionElement):
                         self._mode
                     )
 
-                os.write(fd, self._content)
-                os.fsync(fd)
+                # a visible file must be synced before it is moved
+                if self._deferSync and not self._visibleButUnsafe:
+                    self._syncPending = True
+                else:
+                    os.fsync(fd)
 
                 if self._visibleButUnsafe:
                     type(self)._atomicMove(
@@ -260,13 +479,13 @@ class FileTransaction(transaction.TransactionElement):
                     )
 
                 self._prepared = True
-            finally:
-                if fd != -1:
-                    try:
-                        os.close(fd)
-                    except OSError:
-                        pass
-                    fd = -1
+        finally:
+            if fd != -1:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+                fd = -1
 
     def abort(self):
         try:
@@ -274,6 +493,11 @@ class FileTransaction(transaction.TransactionElement):
                 if self._originalFileWasMissing:
                     if os.path.exists(self._name):
                         os.unlink(self._name)
+                elif self._backupEntry is not None:
+                    self._backupStore.restore(
+                        entry=self._backupEntry,
+                        destination=self._name,
+                    )
                 elif (
                     self._backup is not None and
                     os.path.exists(self._backup)
@@ -288,9 +512,15 @@ class FileTransaction(transaction.TransactionElement):
                     os.path.exists(self._tmpname)
                 ):
                     os.unlink(self._tmpname)
-        except OSError:
+        except (OSError, RuntimeError) as e:
             self.logger.debug('Exception during abort', exc_info=True)
-            pass
+            self.logger.error(
+                _("Cannot restore '{file}': {error}").format(
+                    file=self._name,
+                    error=e,
+                )
+            )
+            raise
 
     def commit(self):
         if self._prepared:
@@ -299,44 +529,16 @@ class FileTransaction(transaction.TransactionElement):
                     source=self._tmpname,
                     destination=self._name,
                 )
-            if self._modifiedList is not None:
-                self._modifiedList.append(self._name)
-
-            RESTORECON = '/sbin/restorecon'
-            if os.path.exists(RESTORECON):
-                what = (
-                    self._name if self._createdDirectory is None
-                    else self._createdDirectory
-                )
-                try:
-                    self.logger.debug(
-                        'Executing restorecon for %s',
-                        what
-                    )
-                    p = subprocess.Popen(
-                        (RESTORECON, '-r', what),
-                        executable=RESTORECON,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        close_fds=True,
-                    )
-                    stdout, stderr = p.communicate()
-                    self.logger.debug(
-                        'restorecon result rc=%s, stdout=%s, stderr=%s',
-                        p.returncode,
-                        stdout,
-                        stderr,
-                    )
-                    if p.returncode != 0:
-                        self.logger.warning(
-                            _(
-                                "Failed to restore SELinux attributes "
-                                "for '{file}'"
-                            ).format(
-                                file=what,
-                            )
-                        )
-                except Exception:
+            self._committedPending = True
+            if not self._deferCommitted:
+                self.committed()
+
+            self._relabelPending = True
+            if not self._deferRelabel:
+                for what, error in transaction.restoreContexts(
+                    paths=self.relabelPaths(),
+                    logger=self.logger,
+                ).items():
                     self.logger.warning(
                         _(
                             "Failed to restore SELinux attributes "
@@ -345,8 +547,7 @@ class FileTransaction(transaction.TransactionElement):
                             file=what,
                         )
                     )
-                    self.logger.debug('Exception', exc_info=True)
-                    raise
+                    self.logger.debug('restorecon error: %s', error)
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,242 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Transaction journal.
+
+A journal is a file per transaction within a directory, a JSON object
+per line, recording the prepared elements and whether commit began.
+It is removed once the transaction is committed or aborted, so any
+journal left behind belongs to an interrupted transaction. A journal is
+locked while its transaction is running, so that other processes
+sharing the directory do not recover it.
+
+Recovery commits the elements that were not committed if commit began
+and the transaction was not aborted since, else aborts them. A journal
+is kept if aborting any of its elements failed. Recovery of an element
+may be repeated, so recovery itself may be interrupted and executed
+again.
+
+"""
+
+
+import fcntl
+import gettext
+import importlib
+import json
+import os
+import tempfile
+
+
+from . import base
+from . import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+SUFFIX = '.journal'
+
+
+@util.export
+class State(object):
+    PREPARED = 'prepared'
+    COMMIT = 'commit'
+    COMMITTED = 'committed'
+    ABORT = 'abort'
+
+
+@util.export
+class Journal(base.Base):
+    """Write-ahead journal of a transaction.
+
+    The file is created with the first record, so transactions without
+    recoverable elements leave no trace.
+
+    """
+
+    def __init__(self, directory):
+        """Constructor.
+
+        Keyword arguments:
+        directory -- journal directory, created if missing.
+
+        """
+        super(Journal, self).__init__()
+        self._directory = directory
+        self._name = None
+        self._file = None
+        self._created = False
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def active(self):
+        return self._file is not None
+
+    def record(self, state, **kwargs):
+        """Append record, sync() to make it durable."""
+        if self._file is None:
+            os.makedirs(self._directory, mode=0o700, exist_ok=True)
+            # locked before it is visible to recovery by name
+            fd, name = tempfile.mkstemp(
+                suffix='%s.new' % SUFFIX,
+                prefix='transaction-',
+                dir=self._directory,
+            )
+            self._file = os.fdopen(fd, 'w')
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._name = name[:-len('.new')]
+            os.rename(name, self._name)
+            self._created = True
+            self.logger.debug("transaction journal '%s'", self._name)
+        kwargs['state'] = state
+        self._file.write('%s\n' % json.dumps(kwargs, sort_keys=True))
+
+    def sync(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self._created:
+                fd = os.open(self._directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                self._created = False
+
+    def close(self, remove=True):
+        """Close journal.
+
+        Keyword arguments:
+        remove -- remove journal, transaction is done, else keep it for
+            recovery.
+
+        """
+        if self._file is not None:
+            # while locked, see _lock()
+            try:
+                if remove:
+                    os.unlink(self._name)
+            finally:
+                self._file.close()
+                self._file = None
+
+
+def _lock(name):
+    """Open and lock journal, return None if it is in use or gone."""
+    try:
+        f = open(name)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # removed by its owner since opened
+        if os.stat(name).st_ino != os.fstat(f.fileno()).st_ino:
+            raise FileNotFoundError(name)
+    except (BlockingIOError, FileNotFoundError):
+        f.close()
+        return None
+    return f
+
+
+def _records(f):
+    ret = []
+    for line in f:
+        try:
+            ret.append(json.loads(line))
+        except ValueError:
+            # last record may be partial
+            break
+    return ret
+
+
+def _elementClass(name):
+    module, clz = name.rsplit('.', 1)
+    return getattr(importlib.import_module(module), clz)
+
+
+@util.export
+def pending(directory):
+    """Return journals of interrupted transactions within directory."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(SUFFIX)
+    )
+
+
+@util.export
+def recover(directory, logger=None):
+    """Recover interrupted transactions of directory.
+
+    Journals locked by running transactions are skipped. Journals of
+    recovered transactions are removed. Journals of transactions that
+    failed to recover are kept, so recovery can be executed again.
+
+    Returns (recovered, failed), recovered a list of (journal,
+    committed), failed a list of journals.
+
+    """
+    recovered = []
+    failed = []
+    for name in pending(directory):
+        f = _lock(name)
+        if f is None:
+            if logger is not None:
+                logger.debug("transaction journal '%s' in use", name)
+            continue
+        try:
+            records = _records(f)
+            commit = (
+                any(r['state'] == State.COMMIT for r in records) and
+                not any(r['state'] == State.ABORT for r in records)
+            )
+            committed = set(
+                r['id'] for r in records
+                if r['state'] == State.COMMITTED
+            )
+            prepared = [
+                r for r in records
+                if (
+                    r['state'] == State.PREPARED and
+                    r['id'] not in committed
+                )
+            ]
+            if commit:
+                # same order as commit
+                prepared.reverse()
+            for record in prepared:
+                if logger is not None:
+                    logger.debug(
+                        "%s '%s' of '%s'",
+                        'committing' if commit else 'aborting',
+                        record['entry'],
+                        name,
+                    )
+                _elementClass(record['element']).recover(
+                    entry=record['entry'],
+                    commit=commit,
+                )
+            os.unlink(name)
+            recovered.append((name, commit))
+        except Exception:
+            if logger is not None:
+                logger.debug(
+                    "Cannot recover '%s'",
+                    name,
+                    exc_info=True,
+                )
+            failed.append(name)
+        finally:
+            f.close()
+    return recovered, failed
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,139 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""JSON dialog protocol.
+
+Messages of the json dialect, a JSON object per line, each having a
+'type' member. Refer to README.dialog.
+
+This module is also the reference parser for managers, usage:
+
+    for message in jsondialog.Parser(stream):
+        if message['type'] == jsondialog.Message.QUERY_STRING:
+            output.write(jsondialog.response(message['name'], 'value'))
+
+"""
+
+
+import gettext
+import json
+
+
+from . import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+@util.export
+class Message(object):
+    """Message types."""
+    NOTE = 'note'
+    LOG = 'log'
+    TERMINATE = 'terminate'
+
+    QUERY_STRING = 'queryString'
+    QUERY_MULTI_STRING = 'queryMultiString'
+    QUERY_VALUE = 'queryValue'
+    CONFIRM = 'confirm'
+
+    DISPLAY_VALUE = 'displayValue'
+    DISPLAY_MULTI_STRING = 'displayMultiString'
+
+    EVENTS_LIST = 'eventsList'
+    EVENT_START = 'eventStart'
+    EVENT_END = 'eventEnd'
+
+    # manager responses
+    RESPONSE = 'response'
+    ABORT = 'abort'
+
+    # manager answers to queries, sent at any time
+    ANSWERS = 'answers'
+
+
+@util.export
+def encode(message):
+    """Encode message as a single line.
+
+    Values that cannot be represented in JSON are sent as strings.
+
+    """
+    return '%s\n' % json.dumps(
+        message,
+        default=str,
+        separators=(',', ':'),
+        sort_keys=True,
+    )
+
+
+@util.export
+def decode(line):
+    """Decode a single line message, raise ValueError if invalid."""
+    message = json.loads(line)
+    if not isinstance(message, dict) or 'type' not in message:
+        raise ValueError(_('Invalid message {line}').format(line=line))
+    return message
+
+
+@util.export
+def response(name, value):
+    """Encode a response to a query or confirm."""
+    return encode({
+        'type': Message.RESPONSE,
+        'name': name,
+        'value': value,
+    })
+
+
+@util.export
+def abort(name):
+    """Encode abort of a query or confirm."""
+    return encode({
+        'type': Message.ABORT,
+        'name': name,
+    })
+
+
+@util.export
+def answers(values):
+    """Encode answers to later queries.
+
+    Keyword arguments:
+    values -- dict of QUESTION/occurrence/name keys and values.
+
+    """
+    return encode({
+        'type': Message.ANSWERS,
+        'answers': values,
+    })
+
+
+@util.export
+class Parser(object):
+    """Parse messages out of a stream of lines.
+
+    Iteration ends after TERMINATE or at end of stream. Lines that are
+    not messages raise ValueError.
+
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __iter__(self):
+        for line in self._stream:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            message = decode(line)
+            yield message
+            if message['type'] == Message.TERMINATE:
+                break
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -7,12 +7,20 @@
 
 
 from packaging.version import Version
+import concurrent.futures
+import contextlib
 import gettext
+import glob
+import hashlib
+import json
 import logging
 import os
+import re
 import sys
+import threading
 import time
 import traceback
+import weakref
 
 # Users of minidnf should import it inside a try/except clause and handle
 # failures gracefully. otopi deliberately does not require dnf to be installed.
@@ -142,6 +150,11 @@ def _revert_transaction(trans, base, skip_unavailable):
 
 class MiniDNF():
 
+    PREFETCH_MANIFEST = 'otopi-prefetch.json'
+
+    # dnf names cache of repository <id>-<16 hex digits>
+    _REPO_CACHE_FORMAT = r'^{repo}-[0-9a-f]{{16}}$'
+
     class _MyHandler(logging.Handler):
         def __init__(self, sink):
             logging.Handler.__init__(self)
@@ -385,7 +398,7 @@ class MiniDNF():
             info[f] = getattr(po, f)
         return info
 
-    def _createBase(self, offline=False):
+    def _createBase(self):
         base = dnf.Base()
 
         # This avoid DNF trying to remove packages that were not touched by
@@ -404,6 +417,14 @@ class MiniDNF():
             varsdir=base.conf.varsdir,
         )
 
+        # Keep metadata and packages where prefetch() put them
+        if self._cacheDir is not None:
+            base.conf.cachedir = self._cacheDir
+            base.conf.keepcache = True
+
+        if self._downloadWorkers > 0:
+            base.conf.max_parallel_downloads = self._downloadWorkers
+
         # dnf seems to behave differently depending on whether cli is passed
         # or not (defaults to None). With None, filtering out disabled plugins
         # does not work well. Not sure whether that's by design or a bug.
@@ -416,15 +437,170 @@ class MiniDNF():
         base.configure_plugins()
         base.repos.all().set_progress_bar(self._MyDownloadProgress(self._sink))
 
-        # dnf does not keep packages for offline usage
-        # if offline:
-        #     base.repos.all().md_only_cached = True
-
-        base.fill_sack()
+        # dnf does not keep packages for offline usage, unless
+        # they were prefetched into cache directory
+        if self._offline:
+            self._validateCache(base)
+            base.conf.cacheonly = True
+            base.fill_sack_from_repos_in_cache()
+        else:
+            base.fill_sack()
         base.read_comps()
 
         return base
 
+    @staticmethod
+    def _digest(name):
+        digest = hashlib.sha256()
+        with open(name, 'rb') as f:
+            while True:
+                chunk = f.read(65536)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _metadataDigests(self):
+        """Return digests of repomd.xml of repositories in cache dir."""
+        return dict(
+            (
+                os.path.relpath(name, self._cacheDir),
+                self._digest(name),
+            )
+            for name in glob.glob(
+                os.path.join(self._cacheDir, '*', 'repodata', 'repomd.xml')
+            )
+        )
+
+    def _validateCache(self, base):
+        """Verify cache is as prefetched.
+
+        Metadata of enabled repositories must not have changed, and
+        packages must be present.
+
+        """
+        try:
+            with open(
+                os.path.join(self._cacheDir, self.PREFETCH_MANIFEST)
+            ) as f:
+                manifest = json.load(f)
+        except (OSError, TypeError, ValueError):
+            raise RuntimeError(
+                _('No prefetched metadata in {directory}').format(
+                    directory=self._cacheDir,
+                )
+            )
+        digests = self._metadataDigests()
+        for repo in base.repos.iter_enabled():
+            pattern = re.compile(
+                self._REPO_CACHE_FORMAT.format(repo=re.escape(repo.id))
+            )
+            names = [
+                name for name in manifest['metadata']
+                if pattern.match(name.split('/', 1)[0])
+            ]
+            if not names:
+                raise RuntimeError(
+                    _("Repository '{repo}' was not prefetched").format(
+                        repo=repo.id,
+                    )
+                )
+            for name in names:
+                if digests.get(name) != manifest['metadata'][name]:
+                    raise RuntimeError(
+                        _(
+                            "Metadata of repository '{repo}' changed "
+                            "since prefetch"
+                        ).format(
+                            repo=repo.id,
+                        )
+                    )
+        for name in manifest['packages']:
+            if not os.path.exists(os.path.join(self._cacheDir, name)):
+                raise RuntimeError(
+                    _("Package '{package}' was not prefetched").format(
+                        package=os.path.basename(name),
+                    )
+                )
+
+    @staticmethod
+    def _baseFingerprint(base):
+        """Return state of configuration and rpmdb the base was read from.
+
+        If it changes, the base is stale.
+
+        """
+        paths = [base.conf.config_file_path]
+        for reposdir in base.conf.reposdir:
+            paths.extend(sorted(glob.glob(os.path.join(reposdir, '*.repo'))))
+        paths.extend(
+            sorted(
+                glob.glob(
+                    os.path.join(base.conf.installroot, 'var/lib/rpm/*')
+                )
+            )
+        )
+        ret = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                ret.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                ret.append((path, None, None))
+        return tuple(ret)
+
+    def _cachedBase(self):
+        """Return read-only base shared by queries.
+
+        Recreated if stale or older than refresh seconds.
+
+        """
+        if self._baseCache is not None:
+            base, created, fingerprint = self._baseCache
+            if (
+                self._baseCacheRefresh and
+                time.monotonic() - created >= self._baseCacheRefresh
+            ) or self._baseFingerprint(base) != fingerprint:
+                self._sink.verbose(_('Query base is stale'))
+                self._invalidateBases()
+        if self._baseCache is None:
+            self._sink.verbose(_('Creating query base'))
+            base = self._createBase()
+            self._baseCache = (
+                base,
+                time.monotonic(),
+                self._baseFingerprint(base),
+            )
+        return self._baseCache[0]
+
+    def _invalidateBases(self):
+        """Destroy cached query base."""
+        if self._baseCache is not None:
+            base = self._baseCache[0]
+            self._baseCache = None
+            self._destroyBase(base)
+
+    @contextlib.contextmanager
+    def _queryBase(self):
+        """Base to query, of transaction if any.
+
+        The sack of the transaction base is not safe to use while a
+        background download runs on it, so querying it waits for the
+        download.
+
+        """
+        if self._base is not None:
+            self._waitDownload(self._base)
+            yield self._base
+        elif self._baseCacheEnabled:
+            yield self._cachedBase()
+        else:
+            base = self._createBase()
+            try:
+                yield base
+            finally:
+                self._destroyBase(base)
+
     def _destroyBase(self, base):
         if base is not None:
             if hasattr(base, 'unload_plugins'):
@@ -438,6 +614,15 @@ class MiniDNF():
                 base._plugins._unload()
             base.close()
 
+    def _goalChanging(self):
+        """Wait for background download before the goal changes.
+
+        It uses the same base.
+
+        """
+        self._waitDownload()
+        self._resolved = None
+
     def _queuePackages(
         self,
         action,
@@ -446,6 +631,7 @@ class MiniDNF():
         ignoreErrors=False,
     ):
         ret = True
+        self._goalChanging()
 
         for package in packages:
             try:
@@ -478,60 +664,156 @@ class MiniDNF():
 
         return ret
 
-    def _queueGroup(
+    def _compsIndex(self, base):
+        """Return comps index of base, built once per base.
+
+        Returns:
+            {
+                'groups': {id: group},
+                'installed': set of installed group ids, None until
+                    _installedGroups() is called.
+            }
+
+        """
+        index = self._compsIndexes.get(base)
+        if index is None:
+            index = self._compsIndexes[base] = {
+                'groups': dict(
+                    (group.id, group)
+                    for group in base.comps.groups_iter()
+                ),
+                'installed': None,
+            }
+        return index
+
+    def _installedGroups(self, base):
+        index = self._compsIndex(base)
+        if index['installed'] is None:
+            index['installed'] = set(
+                group
+                for group in index['groups']
+                if base.history.group.get(group) is not None
+            )
+        return index['installed']
+
+    def _queueGroups(
         self,
         action,
         call,
-        group,
+        groups,
         ignoreErrors=False,
     ):
+        """Queue groups, report all failures at once."""
+        self._goalChanging()
         try:
-            self._sink.verbose(
-                _('Queue group {group} for {action}').format(
-                    group=group,
-                    action=action,
+            index = self._compsIndex(self._base)['groups']
+        except Exception as e:
+            self._sink.error(e)
+            raise
+        failures = []
+        for group in groups:
+            try:
+                self._sink.verbose(
+                    _('Queue group {group} for {action}').format(
+                        group=group,
+                        action=action,
+                    )
                 )
-            )
-            groups = [g for g in self._base.comps.groups if g.id == group]
-            if not groups:
-                raise dnf.exceptions.Error(
-                    _('Group {group} cannot be resolved').format(
+                if group not in index:
+                    raise dnf.exceptions.Error(
+                        _('Group {group} cannot be resolved').format(
+                            group=group,
+                        )
+                    )
+                call(index[group].id)
+            except dnf.exceptions.Error as e:
+                failures.append((group, e))
+            except Exception as e:
+                self._sink.error(
+                    _("Cannot queue group '{group}': {error}").format(
                         group=group,
+                        error=e,
                     )
                 )
-            call(groups[0].id)
+                raise
+
+        if not failures:
             return True
-        except dnf.exceptions.Error as e:
-            msg = _("Cannot queue group '{group}': {error}").format(
+        msg = '\n'.join(
+            _("Cannot queue group '{group}': {error}").format(
                 group=group,
                 error=e,
             )
-            if ignoreErrors:
-                self._sink.verbose(msg)
-                return False
-            else:
-                self._sink.error(msg)
-                raise
-        except Exception as e:
-            self._sink.error(
-                _("Cannot queue group '{group}': {error}").format(
-                    group=group,
-                    error=e,
-                )
-            )
-            raise
+            for group, e in failures
+        )
+        if ignoreErrors:
+            self._sink.verbose(msg)
+            return False
+        self._sink.error(msg)
+        if len(failures) == 1:
+            raise failures[0][1]
+        raise dnf.exceptions.Error(msg)
+
+    def _queueGroup(
+        self,
+        action,
+        call,
+        group,
+        ignoreErrors=False,
+    ):
+        return self._queueGroups(
+            action=action,
+            call=call,
+            groups=(group,),
+            ignoreErrors=ignoreErrors,
+        )
 
     def __init__(
         self,
         sink=None,
         disabledPlugins=None,
+        baseCache=True,
+        baseCacheRefresh=0,
+        cacheDir=None,
+        offline=False,
+        downloadWorkers=0,
     ):
+        """Constructor.
+
+        Keyword arguments:
+        sink -- MiniDNFSinkBase to report to.
+        disabledPlugins -- dnf plugins not to load.
+        baseCache -- keep a read-only base for queries out of
+            transaction, False to create a base per query.
+        baseCacheRefresh -- seconds after which a cached base is created
+            again, 0 to recreate only when configuration or rpmdb
+            changed.
+        cacheDir -- dnf cache directory, packages are kept there.
+        offline -- use only metadata and packages prefetched into
+            cacheDir, for transactions and rollback.
+        downloadWorkers -- parallel downloads, if set, downloadTransaction()
+            downloads and verifies packages in background, 0 to download
+            only when processing the transaction.
+
+        """
         self._base = None
         self._baseTransaction = None
+        self._baseCache = None
+        self._compsIndexes = weakref.WeakKeyDictionary()
+        self._baseCacheEnabled = baseCache
+        self._baseCacheRefresh = baseCacheRefresh
+        self._cacheDir = cacheDir
+        self._offline = offline
+        self._downloadWorkers = downloadWorkers
+        self._resolved = None
+        self._download = None
 
         if not packager.ok_to_use_dnf():
             raise RuntimeError('minidnf is disabled')
 
+        if offline and cacheDir is None:
+            raise RuntimeError(_('Offline mode requires cache directory'))
+
         if Version(dnf.__version__) < Version('4.7'):
             # Recent changes are incompatible with older dnf 4.
             # See e.g. recent reports on the list about a missing
@@ -544,8 +826,14 @@ class MiniDNF():
         self._handler = self._MyHandler(self._sink)
 
     def __del__(self):
+        self._waitDownload()
         if self._base is not None:
             self.endTransaction(rollback=True)
+        try:
+            self._invalidateBases()
+        except Exception:
+            # may be at interpreter shutdown
+            pass
 
     def selinux_role(self):
         """Setup proper selinux role.
@@ -634,6 +922,7 @@ class MiniDNF():
             if 'expire-cache' in what or 'all' in what:
                 for repo in self._base.repos.iter_enabled():
                     repo.metadata_expire = 0
+                self._invalidateBases()
         except Exception as e:
             self._sink.error(e)
             raise
@@ -642,6 +931,9 @@ class MiniDNF():
         try:
             logging.getLogger('dnf').addHandler(self._handler)
             self._sink.verbose(_('Creating transaction'))
+            self._resolved = None
+            # queries use the transaction base until it ends
+            self._invalidateBases()
             self._base = self._createBase()
             lastTrans = self._base.history.last()
             self._baseTransaction = lastTrans.tid if lastTrans else 0
@@ -663,6 +955,7 @@ class MiniDNF():
                 )
             )
 
+            self._waitDownload()
             currTrans = self._base.history.last(
                 complete_transactions_only=False,
             )
@@ -670,24 +963,25 @@ class MiniDNF():
 
             self._destroyBase(self._base)
             self._base = None
+            if self._baseTransaction < currentTransaction:
+                self._invalidateBases()
 
-            if rollback:
+            if rollback and self._baseTransaction < currentTransaction:
                 self._sink.info(_('Performing DNF transaction rollback'))
-                base = self._createBase(offline=True)
+                base = self._createBase()
                 try:
-                    if self._baseTransaction < currentTransaction:
-                        for id_ in range(
-                            self._baseTransaction + 1,
-                            currentTransaction + 1,
-                        ):
-                            self._sink.verbose(f'Reverting transaction {id_}')
-                            _revert_transaction(
-                                trans=base.history.old([id_])[0],
-                                base=base,
-                                skip_unavailable=True,
-                            )
-                        base.resolve(allow_erasing=True)
-                        self._processTransaction(base=base)
+                    for id_ in range(
+                        self._baseTransaction + 1,
+                        currentTransaction + 1,
+                    ):
+                        self._sink.verbose(f'Reverting transaction {id_}')
+                        _revert_transaction(
+                            trans=base.history.old([id_])[0],
+                            base=base,
+                            skip_unavailable=True,
+                        )
+                    base.resolve(allow_erasing=True)
+                    self._processTransaction(base=base)
                 finally:
                     self._destroyBase(base)
                     base = None
@@ -699,6 +993,8 @@ class MiniDNF():
                 self._destroyBase(self._base)
                 self._base = None
             self._baseTransaction = None
+            self._resolved = None
+            self._download = None
             handlers = logging.getLogger('dnf').handlers
             while self._handler in handlers:
                 handlers.remove(self._handler)
@@ -706,7 +1002,7 @@ class MiniDNF():
     def buildTransaction(self):
         try:
             self._sink.verbose(_('Building transaction'))
-            ret = self._base.resolve(allow_erasing=True)
+            ret = self._resolve()
             self._sink.verbose(_('Transaction built'))
             if not ret:
                 self._sink.verbose(_('Empty transaction'))
@@ -728,14 +1024,94 @@ class MiniDNF():
             self._sink.error(e)
             raise
 
-    def _processTransaction(self, base=None):
+    @staticmethod
+    def _packageKey(po):
+        return (po.reponame, str(po))
+
+    def _resolve(self):
+        """Resolve transaction.
+
+        If downloading in background, only if anything was queued since
+        last resolved, so the download started by downloadTransaction()
+        is kept.
+
+        """
+        if self._resolved is None or self._downloadWorkers <= 0:
+            # resolve replaces the packages being downloaded
+            self._waitDownload()
+            self._resolved = self._base.resolve(allow_erasing=True)
+        return self._resolved
+
+    def _checkSignatures(self, base, pkgs):
+        """Return {key: (result, errmsg)} of package_signature_check()."""
+        if self._downloadWorkers <= 1:
+            results = [base.package_signature_check(po) for po in pkgs]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._downloadWorkers,
+            ) as executor:
+                results = list(
+                    executor.map(base.package_signature_check, pkgs)
+                )
+        return dict(
+            (self._packageKey(po), result)
+            for po, result in zip(pkgs, results)
+        )
+
+    def _backgroundDownload(self, base, pkgs, download):
         try:
             base.download_packages(
-                base.transaction.install_set,
+                pkgs,
                 progress=self._MyDownloadProgress(self._sink),
             )
+            download['signatures'].update(self._checkSignatures(base, pkgs))
+        except Exception as e:
+            download['error'] = e
+
+    def _waitDownload(self, base=None):
+        """Wait for background download.
+
+        Returns download of base, None if there is none. If base is
+        None, returns download of any base.
+
+        """
+        download = self._download
+        if download is None:
+            return None
+        download['thread'].join()
+        if base is not None and download['base'] is not base:
+            return None
+        return download
+
+    def _processTransaction(self, base=None):
+        try:
+            download = self._waitDownload(base)
+            signatures = {}
+            if download is not None:
+                signatures = download['signatures']
+                if download['error'] is not None:
+                    self._sink.verbose(
+                        _('Background download failed: {error}').format(
+                            error=download['error'],
+                        )
+                    )
+            pkgs = [
+                po for po in base.transaction.install_set
+                if self._packageKey(po) not in signatures
+            ]
+            if pkgs or download is None:
+                base.download_packages(
+                    pkgs,
+                    progress=self._MyDownloadProgress(self._sink),
+                )
+                signatures.update(self._checkSignatures(base, pkgs))
+
+            imported = False
             for po in base.transaction.install_set:
-                result, errmsg = base.package_signature_check(po)
+                result, errmsg = signatures[self._packageKey(po)]
+                if result == 1 and imported:
+                    # key may have been imported for previous package
+                    result, errmsg = base.package_signature_check(po)
                 if result == 0:
                     pass
                 elif result == 1:
@@ -745,14 +1121,69 @@ class MiniDNF():
                             d['hexkeyid'],
                         )
                     base.package_import_key(po, fullaskcb=_askGPG)
+                    imported = True
                 else:
                     raise RuntimeError(errmsg)
 
             base.do_transaction(display=self._MyTransactionDisplay(self._sink))
+            self._compsIndexes.pop(base, None)
+            if base is self._base:
+                self._resolved = None
+                self._download = None
         except Exception as e:
             self._sink.error(e)
             raise
 
+    def downloadTransaction(self):
+        """Resolve transaction and download its packages in background.
+
+        Downloaded packages are verified in background as well,
+        processTransaction() waits and handles the rest. Does nothing
+        unless downloadWorkers is set. Failures are left for
+        buildTransaction() and processTransaction() to report.
+
+        Returns True if download started.
+
+        """
+        if self._downloadWorkers <= 0 or self._base is None:
+            return False
+        try:
+            if not self._resolve():
+                return False
+        except Exception as e:
+            self._sink.verbose(
+                _('Cannot resolve transaction for download: {error}').format(
+                    error=e,
+                )
+            )
+            return False
+        previous = self._waitDownload(self._base)
+        download = {
+            'base': self._base,
+            'signatures': dict(previous['signatures']) if previous else {},
+            'error': None,
+        }
+        pkgs = [
+            po for po in self._base.transaction.install_set
+            if self._packageKey(po) not in download['signatures']
+        ]
+        if not pkgs:
+            return False
+        self._sink.verbose(
+            _('Downloading {count} packages in background').format(
+                count=len(pkgs),
+            )
+        )
+        download['thread'] = threading.Thread(
+            target=self._backgroundDownload,
+            name='otopi-dnf-download',
+            args=(self._base, pkgs, download),
+            daemon=True,
+        )
+        self._download = download
+        download['thread'].start()
+        return True
+
     def processTransaction(self):
         self._processTransaction(base=self._base)
 
@@ -772,17 +1203,28 @@ class MiniDNF():
         self._sink.verbose(f'queryTransaction ret: {ret}')
         return ret
 
+    def _groupInstall(self, group):
+        self._base.group_install(
+            group,
+            pkg_types=('mandatory', 'default'),
+        )
+
     def installGroup(self, group, **kwargs):
         return self._queueGroup(
             _('install'),
-            lambda group: self._base.group_install(
-                group,
-                pkg_types=('mandatory', 'default'),
-            ),
+            self._groupInstall,
             group,
             **kwargs
         )
 
+    def installGroups(self, groups, **kwargs):
+        return self._queueGroups(
+            _('install'),
+            self._groupInstall,
+            groups,
+            **kwargs
+        )
+
     def removeGroup(self, group, **kwargs):
         return self._queueGroup(
             _('remove'),
@@ -791,6 +1233,14 @@ class MiniDNF():
             **kwargs
         )
 
+    def removeGroups(self, groups, **kwargs):
+        return self._queueGroups(
+            _('remove'),
+            self._base.group_remove,
+            groups,
+            **kwargs
+        )
+
     def updateGroup(self, group, **kwargs):
         return self._queueGroup(
             _('update'),
@@ -799,6 +1249,14 @@ class MiniDNF():
             **kwargs
         )
 
+    def updateGroups(self, groups, **kwargs):
+        return self._queueGroups(
+            _('update'),
+            self._base.group_upgrade,
+            groups,
+            **kwargs
+        )
+
     def install(self, packages, **kwargs):
         return self._queuePackages(
             _('install'),
@@ -839,7 +1297,17 @@ class MiniDNF():
             **kwargs
         )
 
-    def queryPackages(self, patterns=None, showdups=False):
+    def queryPackages(self, patterns=None, showdups=False, names=None):
+        """Query packages.
+
+        All patterns and names are resolved in a single query.
+
+        Keyword arguments:
+        patterns -- patterns, as accepted by dnf.
+        showdups -- all versions, not only latest.
+        names -- exact package names.
+
+        """
         try:
             ret = []
 
@@ -847,39 +1315,29 @@ class MiniDNF():
             available = []
             reinstall_available = []
 
-            if self._base is None:
-                base = _base = self._createBase()
-            else:
-                base = self._base
-                _base = None
-
-            try:
-                for pattern in patterns:
-                    q = dnf.subject.Subject(pattern).get_best_query(
+            with self._queryBase() as base:
+                q = None
+                if names:
+                    q = base.sack.query().filter(name=list(names))
+                for pattern in (patterns or ()):
+                    pq = dnf.subject.Subject(pattern).get_best_query(
                         base.sack,
                         with_provides=True,
                     )
+                    q = pq if q is None else q.union(pq)
 
+                if q is not None:
                     # more or less copy from dnf
                     dinst = {}
-                    ndinst = {}  # Newest versions by name.arch
                     for po in q.installed():
                         dinst[po.pkgtup] = po
-                        if showdups:
-                            continue
-                        key = (po.name, po.arch)
-                        if key not in ndinst or po > ndinst[key]:
-                            ndinst[key] = po
                     installed = dinst.values()
 
-                    for pkg in (q if showdups else q.latest()):
-                        available.append(pkg)
+                    available = list(q if showdups else q.latest())
 
-                    for pkg in (q.available() if showdups else q.latest()):
-                        reinstall_available.append(pkg)
-            finally:
-                if _base is not None:
-                    self._destroyBase(_base)
+                    reinstall_available = list(
+                        q.available() if showdups else q.latest()
+                    )
 
             for op, l in (
                 ('available', available),
@@ -902,53 +1360,119 @@ class MiniDNF():
             raise
 
     def queryGroups(self):
-        if self._base is None:
-            base = _base = self._createBase()
-        else:
-            base = self._base
-            _base = None
-
         try:
-            return [
-                {
-                    'operation': 'installed'
-                    if base.history.group.get(group.id) is not None
-                    else 'available',
-                    'name': group.id,
-                    'description': group.name,
-                    'uservisible': group.visible
-                }
-                for group in base.comps.groups_iter()
-            ]
+            with self._queryBase() as base:
+                installed = self._installedGroups(base)
+                return [
+                    {
+                        'operation': 'installed'
+                        if group.id in installed
+                        else 'available',
+                        'name': group.id,
+                        'description': group.name,
+                        'uservisible': group.visible
+                    }
+                    for group in self._compsIndex(base)['groups'].values()
+                ]
         except Exception as e:
             self._sink.error(e)
             raise
-        finally:
-            if _base is not None:
-                self._destroyBase(_base)
 
     def getConf(self):
-        we_created_base = False
-        if self._base is None:
-            base = self._createBase()
-            we_created_base = True
-        else:
-            base = self._base
-
         try:
-            return 'DNF Conf dump:\n{conf}\n{repos}'.format(
-                conf=base.conf.dump(),
-                repos=''.join(
-                    f'DNF Repo dump: {repo.repofile}\n{repo.dump()}\n'
-                    for repo in base.repos.values()
+            with self._queryBase() as base:
+                return 'DNF Conf dump:\n{conf}\n{repos}'.format(
+                    conf=base.conf.dump(),
+                    repos=''.join(
+                        f'DNF Repo dump: {repo.repofile}\n{repo.dump()}\n'
+                        for repo in base.repos.values()
+                    )
                 )
-            )
         except Exception as e:
             self._sink.error(e)
             raise
-        finally:
-            if we_created_base and base is not None:
+
+    def prefetch(self, packages):
+        """Prefetch packages for offline usage.
+
+        Downloads metadata, packages to install or update with their
+        dependencies, and the installed versions they replace so they
+        can be rolled back, into the cache directory. Records digests
+        of the metadata and the downloaded packages, which offline mode
+        verifies.
+
+        Keyword arguments:
+        packages -- packages to install or update.
+
+        Returns packages downloaded, as queryTransaction().
+
+        """
+        if self._cacheDir is None or self._offline:
+            raise RuntimeError(
+                _('Prefetch requires cache directory and online mode')
+            )
+        try:
+            self._sink.verbose(_('Prefetching packages'))
+            base = self._createBase()
+            try:
+                for package in packages:
+                    base.install(package)
+                    try:
+                        base.upgrade(package)
+                    except dnf.exceptions.MarkingError:
+                        pass
+                base.resolve(allow_erasing=True)
+                pkgs = list(base.transaction.install_set)
+                for po in base.transaction.remove_set:
+                    pkgs.extend(
+                        base.sack.query().available().filter(
+                            name=po.name,
+                            epoch=po.epoch,
+                            version=po.version,
+                            release=po.release,
+                            arch=po.arch,
+                        )
+                    )
+                base.download_packages(
+                    pkgs,
+                    progress=self._MyDownloadProgress(self._sink),
+                )
+
+                manifest = os.path.join(
+                    self._cacheDir,
+                    self.PREFETCH_MANIFEST,
+                )
+                with open('%s.tmp' % manifest, 'w') as f:
+                    json.dump(
+                        {
+                            'metadata': self._metadataDigests(),
+                            'packages': sorted(
+                                os.path.relpath(
+                                    po.localPkg(),
+                                    self._cacheDir,
+                                )
+                                for po in pkgs
+                            ),
+                        },
+                        f,
+                        indent=4,
+                        sort_keys=True,
+                    )
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.rename('%s.tmp' % manifest, manifest)
+                return [
+                    dict(
+                        self._getPackageInfo(po),
+                        operation='prefetch',
+                    )
+                    for po in pkgs
+                ]
+            finally:
                 self._destroyBase(base)
+        except Exception as e:
+            self._sink.error(e)
+            raise
 
     def checkForSafeUpdate(self, packages):
         missingRollback = []
@@ -961,28 +1485,32 @@ class MiniDNF():
             if self.buildTransaction():
                 upgradeAvailable = True
 
-                for p in self.queryTransaction():
+                packages = self.queryTransaction()
+                for p in packages:
                     plist.append(p.copy())
 
                 # Verify all installed packages available in repos
-                for package in self.queryTransaction():
-                    installed = False
-                    reinstall_available = False
-                    for query in self.queryPackages(
-                        patterns=(package['display_name'],),
-                        showdups=True,
-                    ):
-                        self._sink.verbose(
-                            'dupes: operation [%s] package %s' % (
-                                query['operation'],
-                                query['display_name'],
-                            )
+                installed = set()
+                reinstall_available = set()
+                for query in self.queryPackages(
+                    names=set(p['name'] for p in packages),
+                    showdups=True,
+                ):
+                    self._sink.verbose(
+                        'dupes: operation [%s] package %s' % (
+                            query['operation'],
+                            query['display_name'],
                         )
-                        if query['operation'] == 'installed':
-                            installed = True
-                        if query['operation'] == 'reinstall_available':
-                            reinstall_available = True
-                    if installed and not reinstall_available:
+                    )
+                    if query['operation'] == 'installed':
+                        installed.add(query['display_name'])
+                    if query['operation'] == 'reinstall_available':
+                        reinstall_available.add(query['display_name'])
+                for package in packages:
+                    if (
+                        package['display_name'] in installed and
+                        package['display_name'] not in reinstall_available
+                    ):
                         missingRollback.append(package['display_name'])
         return {
             'upgradeAvailable': upgradeAvailable,
@@ -99,6 +99,63 @@ class PackagerBase(object):
         """
         raise NotImplementedError(_('Packager removeGroup not implemented'))
 
+    def installGroups(self, groups, ignoreErrors=False):
+        """Install groups.
+
+        Keyword arguments:
+        groups -- groups to install.
+        ignoreErrors -- Do not raise exception packaging exception.
+
+        Returns:
+        True -- success.
+
+        """
+        ret = True
+        for group in groups:
+            ret = self.installGroup(
+                group=group,
+                ignoreErrors=ignoreErrors,
+            ) and ret
+        return ret
+
+    def updateGroups(self, groups, ignoreErrors=False):
+        """Update groups.
+
+        Keyword arguments:
+        groups -- groups to update.
+        ignoreErrors -- Do not raise exception packaging exception.
+
+        Returns:
+        True -- success.
+
+        """
+        ret = True
+        for group in groups:
+            ret = self.updateGroup(
+                group=group,
+                ignoreErrors=ignoreErrors,
+            ) and ret
+        return ret
+
+    def removeGroups(self, groups, ignoreErrors=False):
+        """Remove groups.
+
+        Keyword arguments:
+        groups -- groups to remove.
+        ignoreErrors -- Do not raise exception packaging exception.
+
+        Returns:
+        True -- success.
+
+        """
+        ret = True
+        for group in groups:
+            ret = self.removeGroup(
+                group=group,
+                ignoreErrors=ignoreErrors,
+            ) and ret
+        return ret
+
     def install(self, packages, ignoreErrors=False):
         """Install packages.
 
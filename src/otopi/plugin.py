@@ -6,15 +6,15 @@
 """Plugin interface."""
 
 
-import builtins
-import datetime
-import errno
-import fcntl
+import collections
+import concurrent.futures
+import functools
 import gettext
 import os
-import select
+import selectors
 import signal
 import subprocess
+import threading
 import time
 
 
@@ -27,6 +27,53 @@ def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
 
+_CHUNK_SIZE = 65536
+_EXECUTE_MANY_WORKERS = 8
+
+
+# pidfd is available since python-3.9 and linux-5.3.
+_pidfd_open = getattr(os, 'pidfd_open', None)
+
+
+class _CommandTimeout(RuntimeError):
+    def __init__(self):
+        super(_CommandTimeout, self).__init__('Command timeout')
+
+
+class _LineSink(object):
+    """Split output stream into lines as it arrives.
+
+    Complete lines are decoded and passed to callback, only the last
+    tail lines are kept, all if tail is None.
+
+    """
+
+    def __init__(self, callback, tail=None):
+        self._callback = callback
+        self._partial = bytearray()
+        self.lines = collections.deque(maxlen=tail)
+
+    def _emit(self, data):
+        # warning: python-2.6 does not have kwargs for decode
+        for line in data.decode('utf-8', 'replace').splitlines():
+            self.lines.append(line)
+            self._callback(line)
+
+    def write(self, data):
+        self._partial += data
+        index = self._partial.rfind(b'\n')
+        if index != -1:
+            data = bytes(self._partial[:index + 1])
+            del self._partial[:index + 1]
+            self._emit(data)
+
+    def close(self):
+        if self._partial:
+            data = bytes(self._partial)
+            del self._partial[:]
+            self._emit(data)
+
+
 @util.export
 class Stages(object):
     """Stage holder."""
@@ -234,6 +281,7 @@ def event(
     after=(),
     priority=Stages.PRIORITY_DEFAULT,
     condition=None,
+    parallel_safe=False,
 ):
     """Decoration to specify sequence event method.
 
@@ -245,6 +293,8 @@ def event(
     after -- place this event after the events with names EVENTNAMESLIST.
     priority -- priority to place this event in. One of Stages.PRIORITY_*.
     condition -- optional condition function.
+    parallel_safe -- event may run concurrently with independent
+        parallel safe events of the same stage, see README.API.
 
     """
     def decorator(f):
@@ -259,6 +309,7 @@ def event(
                 condition if condition is not None
                 else lambda self: True
             ),
+            'parallel_safe': parallel_safe,
         }
         return f
     return decorator
@@ -323,6 +374,169 @@ class PluginBase(base.Base):
     def resolveFile(self, file):
         return self.context.resolveFile(file)
 
+    def _executeStreams(self, popen, stdindata, pipestdin, pipestdout,
+                        pipestderr, stdoutSink=None, stderrSink=None):
+        """Create streams state of a process for _executeLoop."""
+        return {
+            'stdin': {
+                'pipe': pipestdin,
+                'stream': popen.stdin,
+                'buffer': stdindata,
+                'events': selectors.EVENT_WRITE,
+            },
+            'stdout': {
+                'pipe': pipestdout,
+                'stream': popen.stdout,
+                'buffer': bytearray(),
+                'events': selectors.EVENT_READ,
+                'sink': stdoutSink,
+            },
+            'stderr': {
+                'pipe': pipestderr,
+                'stream': popen.stderr,
+                'buffer': bytearray(),
+                'events': selectors.EVENT_READ,
+                'sink': stderrSink,
+            },
+        }
+
+    def _executePump(self, entry, events):
+        """Move data of a single stream, return True if it should close."""
+        should_close = False
+        try:
+            if (events & selectors.EVENT_WRITE) != 0:
+                view = memoryview(entry['buffer'])
+                while entry['buffer_index'] < len(view):
+                    entry['buffer_index'] += os.write(
+                        entry['fd'],
+                        view[
+                            entry['buffer_index']:
+                            entry['buffer_index'] + _CHUNK_SIZE
+                        ],
+                    )
+                should_close = True
+
+            if (events & selectors.EVENT_READ) != 0:
+                while True:
+                    buf = os.read(entry['fd'], _CHUNK_SIZE)
+                    if not buf:
+                        should_close = True
+                        break
+                    if entry.get('sink') is not None:
+                        entry['sink'].write(buf)
+                    else:
+                        entry['buffer'] += buf
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.logger.debug('OSError', exc_info=True)
+            should_close = True
+        return should_close
+
+    def _executeLoop(
+        self,
+        popens,
+        timeout=None,
+        callback=None,
+        callback_interval=30,
+    ):
+        """Pump streams of processes until all of them exit.
+
+        Pipes are multiplexed using a selector, process termination is
+        detected via pidfd when available so no polling is involved, and
+        output is accumulated into bytearray buffers.
+
+        Keyword arguments:
+        popens - state list, see executePipeRaw.
+        timeout - max timeout in seconds.
+        callback - callable object state argument.
+        callback_interval - interval to call callback.
+        """
+        now = start_time = time.monotonic()
+        end_time = float('inf') if timeout is None else now + timeout
+        next_callback = now + callback_interval
+
+        def _wait():
+            nonlocal next_callback
+
+            now = time.monotonic()
+            if now >= next_callback:
+                next_callback = now + callback_interval
+                if callback:
+                    callback(state=popens)
+            if now > end_time:
+                raise _CommandTimeout()
+            return max(0, min(next_callback, end_time) - now)
+
+        selector = selectors.DefaultSelector()
+        pidfds = []
+        try:
+            for p in popens:
+                for stream in p['streams'].values():
+                    if stream['stream'] is not None and stream['pipe']:
+                        stream['fd'] = stream['stream'].fileno()
+                        stream['buffer_index'] = 0
+                        os.set_blocking(stream['fd'], False)
+                        selector.register(
+                            stream['fd'],
+                            stream['events'],
+                            (stream, None),
+                        )
+                if _pidfd_open is not None:
+                    try:
+                        pidfd = _pidfd_open(p['popen'].pid)
+                    except OSError:
+                        pass
+                    else:
+                        pidfds.append(pidfd)
+                        selector.register(
+                            pidfd,
+                            selectors.EVENT_READ,
+                            (None, p),
+                        )
+
+            while selector.get_map():
+                for key, events in selector.select(_wait()):
+                    stream, p = key.data
+                    if p is not None:
+                        p['popen'].poll()
+                        selector.unregister(key.fd)
+                    elif self._executePump(stream, events):
+                        selector.unregister(key.fd)
+                        stream['stream'].close()
+                        if stream.get('sink') is not None:
+                            stream['sink'].close()
+
+            #
+            # Only when pidfd is not available.
+            #
+            for p in popens:
+                while p['popen'].returncode is None:
+                    try:
+                        p['popen'].wait(timeout=_wait())
+                    except subprocess.TimeoutExpired:
+                        pass
+        finally:
+            selector.close()
+            for pidfd in pidfds:
+                os.close(pidfd)
+            self.context.profiler.process(
+                count=len(popens),
+                elapsed=time.monotonic() - start_time,
+            )
+
+    def _executeCleanup(self, popens):
+        """Kill processes and close streams after a failure."""
+        for popen in popens:
+            if popen['popen'].poll() is None:
+                popen['popen'].kill()
+            for stream in popen['streams'].values():
+                if (
+                    stream['stream'] is not None and
+                    not stream['stream'].closed
+                ):
+                    stream['stream'].close()
+
     def executePipeRaw(
         self,
         popenArgs,
@@ -332,6 +546,9 @@ class PluginBase(base.Base):
         timeout=None,
         callback=None,
         callback_interval=30,
+        onStdoutLine=None,
+        onStderrLine=None,
+        tailLines=None,
     ):
         """Execute a list of processes in a pipeline.
 
@@ -343,12 +560,18 @@ class PluginBase(base.Base):
         timeout - max timeout in seconds
         callback - callable object state argument
         callback_interval - interval to call callback
+        onStdoutLine - stream stdout of last process, called per line
+        onStderrLine - stream stderr, called per line with (n, line)
+        tailLines - lines to keep of streamed output, None for all
 
         Returns a dict d:
-        d['stdout'] - output of last process, blob or file
+        d['stdout'] - output of last process, blob, file or list of lines
         d['result'] - a list of dicts, one per process:
         d['result'][n]['rc'] - return code of process n
-        d['result'][n]['stderr'] - stderr of process n, blob or file
+        d['result'][n]['stderr'] - stderr of process n, blob, file or
+            list of lines
+
+        Streamed output is returned as a list of the last tailLines lines.
 
         For each dict in popenArgs:
         'stdin' and 'stdout' are set as needed.
@@ -362,37 +585,10 @@ class PluginBase(base.Base):
         state[n]['streams']['buffer_index'] - index within buffer.
         """
 
-        CHUNK_SIZE = 4096
-
-        class _Timeout(RuntimeError):
-            def __init__(self):
-                super(_Timeout, self).__init__('Command timeout')
-
-        def _callCallback():
-            now = datetime.datetime.now()
-            if (
-                (
-                    _callCallback.next +
-                    datetime.timedelta(seconds=callback_interval)
-                ) < now
-            ):
-                _callCallback.next = datetime.datetime.now()
-                if callback:
-                    callback(state=popens)
-
         def _isString(s):
             return isinstance(s, str)
 
-        _callCallback.next = datetime.datetime.now()
-
-        end_time = datetime.datetime.now()
-        if timeout is None:
-            end_time += datetime.timedelta(days=3650)
-        else:
-            end_time += datetime.timedelta(seconds=timeout)
-
         popens = []
-        fds = {}
         try:
             stdindata = None
             if (
@@ -402,6 +598,8 @@ class PluginBase(base.Base):
             ):
                 stdindata = stdin
                 stdin = None
+            if isinstance(stdindata, str):
+                stdindata = stdindata.encode('utf-8')
 
             for i, kw in enumerate(popenArgs):
                 kw = kw.copy()
@@ -442,12 +640,21 @@ class PluginBase(base.Base):
                         )
 
                 if 'preexec_fn' not in kw:
+                    if (
+                        threading.current_thread() is
+                        threading.main_thread()
+                    ):
 
-                    def _enableSignals():
-                        signal.signal(signal.SIGHUP, signal.SIG_DFL)
-                        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+                        def _enableSignals():
+                            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+                            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
-                    kw['preexec_fn'] = _enableSignals
+                        kw['preexec_fn'] = _enableSignals
+                    else:
+                        # preexec_fn is not safe in threads, SIGPIPE is
+                        # restored by restore_signals. SIGHUP is left as
+                        # inherited.
+                        kw.setdefault('restore_signals', True)
 
                 if 'close_fds' not in kw:
                     kw['close_fds'] = True
@@ -489,107 +696,34 @@ class PluginBase(base.Base):
                 popens.append({
                     'args': kw,
                     'popen': popen,
-                    'streams': {
-                        'stdin': {
-                            'pipe': pipestdin,
-                            'stream': popen.stdin,
-                            'buffer': stdindata,
-                            'events': select.POLLOUT,
-                        },
-                        'stdout': {
-                            'pipe': pipestdout,
-                            'stream': popen.stdout,
-                            'buffer': b'',
-                            'events': select.POLLIN,
-                        },
-                        'stderr': {
-                            'pipe': pipestderr,
-                            'stream': popen.stderr,
-                            'buffer':  b'',
-                            'events': select.POLLIN,
-                        },
-                    },
+                    'streams': self._executeStreams(
+                        popen=popen,
+                        stdindata=stdindata,
+                        pipestdin=pipestdin,
+                        pipestdout=pipestdout,
+                        pipestderr=pipestderr,
+                        stdoutSink=(
+                            _LineSink(onStdoutLine, tailLines)
+                            if onStdoutLine is not None and pipestdout
+                            else None
+                        ),
+                        stderrSink=(
+                            _LineSink(
+                                functools.partial(onStderrLine, i),
+                                tailLines,
+                            )
+                            if onStderrLine is not None and pipestderr
+                            else None
+                        ),
+                    ),
                 })
 
-            poll = select.poll()
-            for popen in popens:
-                for stream in popen['streams'].values():
-                    if stream is not None and stream['pipe']:
-                        stream['fd'] = stream['stream'].fileno()
-                        stream['buffer_index'] = 0
-                        fcntl.fcntl(
-                            stream['fd'],
-                            fcntl.F_SETFL,
-                            fcntl.fcntl(
-                                stream['fd'],
-                                fcntl.F_GETFL
-                            ) | os.O_NONBLOCK,
-                        )
-                        fds[stream['fd']] = stream
-                        poll.register(stream['fd'], stream['events'])
-
-            while (
-                set(
-                    [fd['stream'].closed for fd in fds.values()]
-                ) != set([True])
-            ):
-                _callCallback()
-                if (datetime.datetime.now() > end_time):
-                    raise _Timeout()
-
-                for fd, events in poll.poll(callback_interval * 1000):
-                    entry = fds[fd]
-                    should_close = False
-
-                    if (events & select.POLLOUT) != 0:
-                        try:
-                            while entry['buffer_index'] < len(entry['buffer']):
-                                entry['buffer_index'] += os.write(
-                                    entry['fd'],
-                                    entry['buffer'][
-                                        entry['buffer_index']:
-                                        entry['buffer_index'] + CHUNK_SIZE
-                                    ],
-                                )
-                            should_close = True
-                        except builtins.BlockingIOError:
-                            pass
-                        except OSError as e:
-                            if e.errno != errno.EWOULDBLOCK:
-                                self.logger.debug('OSError', exc_info=True)
-                                should_close = True
-
-                    if (events & select.POLLIN) != 0:
-                        try:
-                            while True:
-                                buf = os.read(entry['fd'], CHUNK_SIZE)
-                                if len(buf) == 0:
-                                    break
-                                entry['buffer'] += buf
-                            should_close = True
-                        except builtins.BlockingIOError:
-                            pass
-                        except OSError as e:
-                            if e.errno != errno.EWOULDBLOCK:
-                                self.logger.debug('OSError', exc_info=True)
-                                should_close = True
-
-                    if ((events & (select.POLLERR | select.POLLHUP)) != 0):
-                        should_close = True
-
-                    if should_close:
-                        poll.unregister(entry['fd'])
-                        entry['stream'].close()
-
-            while (
-                None in [
-                    p['popen'].poll() for p in popens
-                ]
-            ):
-                _callCallback()
-                if (datetime.datetime.now() > end_time):
-                    raise _Timeout()
-                time.sleep(1)
+            self._executeLoop(
+                popens=popens,
+                timeout=timeout,
+                callback=callback,
+                callback_interval=callback_interval,
+            )
 
             for i, p in enumerate(popens):
                 self.logger.debug(
@@ -599,20 +733,20 @@ class PluginBase(base.Base):
                     p['popen'].returncode,
                 )
 
+            def _output(stream):
+                if stream['sink'] is not None:
+                    return list(stream['sink'].lines)
+                elif stream['pipe']:
+                    return bytes(stream['buffer'])
+                else:
+                    return stream
+
             return {
-                'stdout': (
-                    popens[-1]['streams']['stdout']['buffer']
-                    if popens[-1]['streams']['stdout']['pipe']
-                    else popens[-1]['streams']['stdout']
-                ),
+                'stdout': _output(popens[-1]['streams']['stdout']),
                 'result': [
                     {
                         'rc': p['popen'].returncode,
-                        'stderr': (
-                            p['streams']['stderr']['buffer']
-                            if p['streams']['stderr']['pipe']
-                            else p['streams']['stderr']
-                        ),
+                        'stderr': _output(p['streams']['stderr']),
                     }
                     for p in popens
                 ],
@@ -625,22 +759,13 @@ class PluginBase(base.Base):
                         if 'buffer' in s and s['buffer']:
                             s['buffer'] = 'Deleted'
             self.logger.debug(
-                'executePipeRaw exception: kw:%s\npopens:%s\nfds:%s',
+                'executePipeRaw exception: kw:%s\npopens:%s',
                 popenArgs,
                 popens,
-                fds,
                 exc_info=True
             )
 
-            for popen in popens:
-                if popen['popen'].poll() is None:
-                    popen['popen'].kill()
-                for stream in popen['streams'].values():
-                    if (
-                        stream['stream'] is not None and
-                        not stream['stream'].closed
-                    ):
-                        stream['stream'].close()
+            self._executeCleanup(popens)
 
             raise RuntimeError(
                 _("Command '{command}' failed to execute: {error}").format(
@@ -660,6 +785,8 @@ class PluginBase(base.Base):
         raiseOnError=True,
         logStreams=True,
         stdin=None,
+        onStdoutLine=None,
+        onStderrLine=None,
         **kwargs
     ):
         """Execute a list of system commands in a pipeline.
@@ -670,7 +797,12 @@ class PluginBase(base.Base):
                 commands is not zero.
         logStreams -- log streams' content.
         stdin -- a list of lines.
-        kwargs - extra kwargs to executePipeRaw.
+        onStdoutLine -- stream stdout of last process, called per line,
+                lines are logged as they arrive.
+        onStderrLine -- stream stderr, called per line with (n, line),
+                lines are logged as they arrive.
+        kwargs - extra kwargs to executePipeRaw, tailLines limits the
+                streamed lines returned.
 
         Returns a dict d:
         d['stdout'] - output of last process, list of lines
@@ -700,15 +832,38 @@ class PluginBase(base.Base):
             if isinstance(stdin, str):
                 stdin = stdin.encode('utf-8')
 
+        def _stdoutLine(line):
+            if logStreams:
+                self.logger.debug(
+                    'executePipe-output: %s stdout: %s',
+                    popenArgs[-1]['args'],
+                    line,
+                )
+            onStdoutLine(line)
+
+        def _stderrLine(i, line):
+            if logStreams:
+                self.logger.debug(
+                    'executePipe-output: [%s] %s stderr: %s',
+                    i,
+                    popenArgs[i]['args'],
+                    line,
+                )
+            onStderrLine(i, line)
+
         res = self.executePipeRaw(
             popenArgs=popenArgs,
             stdin=stdin,
+            onStdoutLine=_stdoutLine if onStdoutLine is not None else None,
+            onStderrLine=_stderrLine if onStderrLine is not None else None,
             **kwargs
         )
 
         def _splitStream(s):
             ret = None
-            if s is not None:
+            if isinstance(s, list):
+                ret = s
+            elif s is not None:
                 if (
                     not isinstance(s, bytes) and
                     not isinstance(s, str)
@@ -728,14 +883,16 @@ class PluginBase(base.Base):
             r['stderr'] = _splitStream(r['stderr'])
 
         if logStreams:
-            self.logger.debug(
-                'executePipe-output: %s stdout:\n%s\n',
-                popenArgs[-1]['args'],
-                _listToString(res['stdout']),
-            )
+            if onStdoutLine is None:
+                self.logger.debug(
+                    'executePipe-output: %s stdout:\n%s\n',
+                    popenArgs[-1]['args'],
+                    _listToString(res['stdout']),
+                )
             for i, r, kw in [
                 (i, r, popenArgs[i])
                 for i, r in enumerate(res['result'])
+                if onStderrLine is None
             ]:
                 self.logger.debug(
                     'executePipe-output: [%s] %s stderr:\n%s\n',
@@ -770,6 +927,9 @@ class PluginBase(base.Base):
         env=None,
         preexec_fn=None,
         envAppend=None,
+        onStdoutLine=None,
+        onStderrLine=None,
+        tailLines=None,
     ):
         """Execute a process.
 
@@ -780,11 +940,15 @@ class PluginBase(base.Base):
         cwd -- working directory.
         env -- environment dictionary.
         envAppend -- append environment.
+        onStdoutLine -- stream stdout, called per line.
+        onStderrLine -- stream stderr, called per line.
+        tailLines -- lines to keep of streamed output, None for all.
 
         Returns:
         (rc, stdout, stderr)
 
-        stdout, stderr binary blobs.
+        stdout, stderr binary blobs, streamed output is a list of the
+        last tailLines lines.
         """
 
         def _isString(s):
@@ -847,7 +1011,43 @@ class PluginBase(base.Base):
                 env=env,
                 preexec_fn=preexec_fn,
             )
-            stdout, stderr = p.communicate(input=stdin)
+            popens = [{
+                'args': {'args': args},
+                'popen': p,
+                'streams': self._executeStreams(
+                    popen=p,
+                    stdindata=stdin,
+                    pipestdin=stdin is not None,
+                    pipestdout=True,
+                    pipestderr=True,
+                    stdoutSink=(
+                        _LineSink(onStdoutLine, tailLines)
+                        if onStdoutLine is not None
+                        else None
+                    ),
+                    stderrSink=(
+                        _LineSink(onStderrLine, tailLines)
+                        if onStderrLine is not None
+                        else None
+                    ),
+                ),
+            }]
+            try:
+                self._executeLoop(popens=popens)
+            except Exception:
+                self._executeCleanup(popens)
+                raise
+            stdout, stderr = [
+                (
+                    list(stream['sink'].lines)
+                    if stream['sink'] is not None
+                    else bytes(stream['buffer'])
+                )
+                for stream in (
+                    popens[0]['streams']['stdout'],
+                    popens[0]['streams']['stderr'],
+                )
+            ]
             rc = p.returncode
             self.logger.debug(
                 'execute-result: %s, rc=%s',
@@ -871,6 +1071,8 @@ class PluginBase(base.Base):
         logStreams=True,
         stdin=None,
         *eargs,
+        onStdoutLine=None,
+        onStderrLine=None,
         **kwargs
     ):
         """Execute system command.
@@ -880,14 +1082,31 @@ class PluginBase(base.Base):
         raiseOnError -- raise exception if an error.
         logStreams -- log streams' content.
         stdin -- a list of lines.
+        onStdoutLine -- stream stdout, called per line, lines are logged
+                as they arrive.
+        onStderrLine -- stream stderr, called per line, lines are logged
+                as they arrive.
         eargs -- extra args to subprocess.Popen.
-        kwargs - extra kwargs to subprocess.Popen.
+        kwargs - extra kwargs to subprocess.Popen, tailLines limits the
+                streamed lines returned.
 
         Returns:
         (rc, stdout, stderr)
 
         stdout, stderr are list of lines.
         """
+        def _streamLine(name, callback):
+            def _line(line):
+                if logStreams:
+                    self.logger.debug(
+                        'execute-output: %s %s: %s',
+                        args,
+                        name,
+                        line,
+                    )
+                callback(line)
+            return _line if callback is not None else None
+
         if logStreams and stdin is not None:
             self.logger.debug(
                 'execute-input: %s stdin:\n%s\n',
@@ -900,23 +1119,28 @@ class PluginBase(base.Base):
                 '\n'.join(stdin).encode('utf-8')
                 if stdin is not None else None
             ),
+            onStdoutLine=_streamLine('stdout', onStdoutLine),
+            onStderrLine=_streamLine('stderr', onStderrLine),
             *eargs,
             **kwargs
         )
         # warning: python-2.6 does not have kwargs for decode
-        stdout = stdout.decode('utf-8', 'replace').splitlines()
-        stderr = stderr.decode('utf-8', 'replace').splitlines()
-        if logStreams:
-            self.logger.debug(
-                'execute-output: %s stdout:\n%s\n',
-                args,
-                '\n'.join(stdout)
-            )
-            self.logger.debug(
-                'execute-output: %s stderr:\n%s\n',
-                args,
-                '\n'.join(stderr)
-            )
+        if onStdoutLine is None:
+            stdout = stdout.decode('utf-8', 'replace').splitlines()
+            if logStreams:
+                self.logger.debug(
+                    'execute-output: %s stdout:\n%s\n',
+                    args,
+                    '\n'.join(stdout)
+                )
+        if onStderrLine is None:
+            stderr = stderr.decode('utf-8', 'replace').splitlines()
+            if logStreams:
+                self.logger.debug(
+                    'execute-output: %s stderr:\n%s\n',
+                    args,
+                    '\n'.join(stderr)
+                )
         if rc != 0 and raiseOnError:
             raise RuntimeError(
                 _("Command '{command}' failed to execute").format(
@@ -925,5 +1149,65 @@ class PluginBase(base.Base):
             )
         return (rc, stdout, stderr)
 
+    def executeMany(
+        self,
+        argsList,
+        max_workers=None,
+        raiseOnError=True,
+        **kwargs
+    ):
+        """Execute independent system commands concurrently.
+
+        Keyword arguments:
+        argsList -- a list of command arguments lists.
+        max_workers -- maximum commands to run at the same time,
+            None for default.
+        raiseOnError -- raise exception if an error, commands that
+            did not start yet are not executed.
+        kwargs - extra kwargs to execute.
+
+        Returns:
+        list of (rc, stdout, stderr), in argsList order.
+
+        stdout, stderr are list of lines.
+        """
+        argsList = list(argsList)
+        if not argsList:
+            return []
+
+        profiler = self.context.profiler
+        record = profiler.current()
+
+        def _execute(args):
+            with profiler.attach(record):
+                return self.execute(
+                    args=args,
+                    raiseOnError=raiseOnError,
+                    **kwargs
+                )
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(
+                len(argsList),
+                max_workers or _EXECUTE_MANY_WORKERS,
+            ),
+        ) as executor:
+            futures = [
+                executor.submit(_execute, args)
+                for args in argsList
+            ]
+            if raiseOnError:
+                concurrent.futures.wait(
+                    futures,
+                    return_when=concurrent.futures.FIRST_EXCEPTION,
+                )
+                for f in futures:
+                    f.cancel()
+
+        for f in futures:
+            if not f.cancelled() and f.exception() is not None:
+                raise f.exception()
+        return [f.result() for f in futures]
+
 
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,155 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Event profiler."""
+
+
+import contextlib
+import contextvars
+import threading
+import time
+
+
+from . import util
+
+
+# thread_time is available since python-3.7.
+_thread_time = getattr(time, 'thread_time', time.process_time)
+
+
+@util.export
+class Profiler(object):
+    """Event profiler.
+
+    Records wall and cpu time of events, and the processes each event
+    executed. The record of the current event is a context variable, so
+    events that are executed concurrently are accounted separately.
+
+    Work an event hands to other threads is accounted to it if the
+    thread runs within attach() of its record, or within a copy of the
+    context of the event, see contextvars.copy_context(). Only the
+    former accounts the cpu time of the thread.
+
+    """
+
+    _COUNTERS = ('wall', 'cpu', 'processes', 'processesTime')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._record = contextvars.ContextVar(
+            'otopi.profiler.record.%x' % id(self),
+            default=None,
+        )
+        self._events = []
+
+    @contextlib.contextmanager
+    def event(self, stage, method):
+        """Measure an event.
+
+        Keyword arguments:
+        stage -- stage id.
+        method -- method name, module.class.method.
+
+        """
+        record = {
+            'stage': stage,
+            'plugin': method.rsplit('.', 1)[0],
+            'method': method,
+            'wall': 0.0,
+            'cpu': 0.0,
+            'processes': 0,
+            'processesTime': 0.0,
+        }
+        with self._lock:
+            self._events.append(record)
+        token = self._record.set(record)
+        wall = time.monotonic()
+        cpu = _thread_time()
+        try:
+            yield record
+        finally:
+            record['wall'] = time.monotonic() - wall
+            elapsed = _thread_time() - cpu
+            with self._lock:
+                record['cpu'] += elapsed
+            self._record.reset(token)
+
+    def current(self):
+        """Return record of the current event, if any."""
+        return self._record.get()
+
+    @contextlib.contextmanager
+    def attach(self, record):
+        """Account work of the current thread to record.
+
+        For worker threads an event starts, record is as returned by
+        current() within the event, None accounts nothing.
+
+        """
+        token = self._record.set(record)
+        cpu = _thread_time()
+        try:
+            yield
+        finally:
+            if record is not None:
+                elapsed = _thread_time() - cpu
+                with self._lock:
+                    record['cpu'] += elapsed
+            self._record.reset(token)
+
+    def process(self, count, elapsed):
+        """Account processes executed by the current event, if any.
+
+        Keyword arguments:
+        count -- number of processes.
+        elapsed -- seconds until all exited.
+
+        """
+        record = self._record.get()
+        if record is not None:
+            with self._lock:
+                record['processes'] += count
+                record['processesTime'] += elapsed
+
+    def _totals(self, events, key):
+        totals = {}
+        for record in events:
+            total = totals.setdefault(
+                record[key],
+                dict.fromkeys(self._COUNTERS, 0),
+            )
+            total['events'] = total.get('events', 0) + 1
+            for counter in self._COUNTERS:
+                total[counter] += record[counter]
+        return totals
+
+    def report(self):
+        """Return report, a dict of events, stages, plugins and total."""
+        with self._lock:
+            events = [dict(record) for record in self._events]
+        total = dict.fromkeys(self._COUNTERS, 0)
+        total['events'] = len(events)
+        for record in events:
+            for counter in self._COUNTERS:
+                total[counter] += record[counter]
+        return {
+            'events': events,
+            'stages': self._totals(events, 'stage'),
+            'plugins': self._totals(events, 'plugin'),
+            'total': total,
+        }
+
+    def top(self, count):
+        """Return the count slowest events, slowest first."""
+        with self._lock:
+            events = [dict(record) for record in self._events]
+        return sorted(
+            events,
+            key=lambda record: record['wall'],
+            reverse=True,
+        )[:count]
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
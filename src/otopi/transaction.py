@@ -6,10 +6,17 @@
 """Transaction handling."""
 
 
+import concurrent.futures
+import contextvars
+import ctypes
+import errno
 import gettext
+import os
+import subprocess
 
 
 from . import base
+from . import journal
 from . import util
 
 
@@ -17,6 +24,114 @@ def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
 
+try:
+    _syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+except (OSError, AttributeError):
+    _syncfs = None
+
+
+try:
+    import selinux
+except ImportError:
+    selinux = None
+
+
+RESTORECON = '/sbin/restorecon'
+
+
+def _syncPaths(paths):
+    """Sync the files of paths, all on the same filesystem."""
+    if _syncfs is not None:
+        fd = os.open(paths[0], os.O_RDONLY)
+        try:
+            if _syncfs(fd) == 0:
+                return
+            error = ctypes.get_errno()
+            if error != errno.ENOSYS:
+                raise OSError(error, os.strerror(error), paths[0])
+        finally:
+            os.close(fd)
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _uniquePaths(paths):
+    """Return paths not within another of paths, sorted."""
+    ret = []
+    for path in sorted(set(os.path.abspath(p) for p in paths)):
+        if not ret or not (
+            path == ret[-1] or
+            path.startswith(ret[-1].rstrip('/') + '/')
+        ):
+            ret.append(path)
+    return ret
+
+
+def _restorecon(paths):
+    """Execute restorecon, return (rc, stdout, stderr)."""
+    p = subprocess.Popen(
+        (RESTORECON, '-r') + tuple(paths),
+        executable=RESTORECON,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        close_fds=True,
+    )
+    stdout, stderr = p.communicate()
+    return p.returncode, stdout, stderr
+
+
+@util.export
+def restoreContexts(paths, logger=None):
+    """Restore SELinux contexts of paths, recursively.
+
+    Paths within other paths are relabeled once. The selinux bindings
+    are used if available, else a single restorecon execution for all
+    paths; only if it fails each path is retried on its own to find
+    which failed.
+
+    Returns a dict of failed paths and their errors.
+
+    """
+    paths = _uniquePaths(paths)
+    failures = {}
+    if not paths:
+        pass
+    elif selinux is not None:
+        if selinux.is_selinux_enabled():
+            for path in paths:
+                if logger is not None:
+                    logger.debug('Restoring SELinux context of %s', path)
+                try:
+                    selinux.restorecon(path, recursive=True)
+                except Exception as e:
+                    failures[path] = e
+    elif os.path.exists(RESTORECON):
+        if logger is not None:
+            logger.debug('Executing restorecon for %s', paths)
+        try:
+            rc, stdout, stderr = _restorecon(paths)
+            if logger is not None:
+                logger.debug(
+                    'restorecon result rc=%s, stdout=%s, stderr=%s',
+                    rc,
+                    stdout,
+                    stderr,
+                )
+            if rc != 0:
+                for path in paths:
+                    rc, stdout, stderr = _restorecon((path,))
+                    if rc != 0:
+                        failures[path] = stderr
+        except Exception as e:
+            for path in paths:
+                failures.setdefault(path, e)
+    return failures
+
+
 @util.export
 class TransactionElement(base.Base):
     """Base for transaction element."""
@@ -50,16 +165,121 @@ class TransactionElement(base.Base):
         """Commit transaction element."""
         pass
 
+    def deferSync(self):
+        """Request next prepare not to sync its files to disk.
+
+        The transaction then syncs the filesystems of syncPaths()
+        once all of its elements are prepared.
+
+        Returns True if supported.
+
+        """
+        return False
+
+    def syncPaths(self):
+        """Files written by prepare that were not synced."""
+        return ()
+
+    def deferRelabel(self):
+        """Request next commit not to restore SELinux contexts.
+
+        The transaction then restores the contexts of relabelPaths()
+        of all of its elements at once after they are committed.
+
+        Returns True if supported.
+
+        """
+        return False
+
+    def relabelPaths(self):
+        """Paths written by commit that were not relabeled."""
+        return ()
+
+    def deferCommitted(self):
+        """Request next commit not to record what it committed.
+
+        The transaction then calls committed() of its elements in
+        commit order, once those committed concurrently are all done.
+
+        Returns True if supported.
+
+        """
+        return False
+
+    def committed(self):
+        """Record what commit did, if deferred."""
+        pass
+
+    def commitKey(self):
+        """Resource committed by element.
+
+        Elements having a key are independent of elements having other
+        keys, so adjacent elements having keys may be committed
+        concurrently, elements of the same key in order.
+
+        Returns None if element must be committed on its own.
+
+        """
+        return None
+
+    def journalEntry(self):
+        """Describe prepared element for the transaction journal.
+
+        Returns a JSON serializable object to pass to recover(), or
+        None if the element cannot be recovered.
+
+        """
+        return None
+
+    @classmethod
+    def recover(clz, entry, commit):
+        """Recover element of an interrupted transaction.
+
+        Must be safe to repeat, as recovery may be interrupted as well.
+        Default does nothing, elements are journaled only if their
+        journalEntry() is not None.
+
+        Keyword arguments:
+        entry -- journalEntry() of the prepared element.
+        commit -- True to commit, False to abort.
+
+        """
+        pass
+
 
 @util.export
 class Transaction(base.Base):
 
-    def _prepare(self, element):
+    def _prepare(self, element, batch=False):
         if not self._failed:
             try:
                 self._prepared.append(element)
                 self.logger.debug("preparing '%s'", element)
+                if batch:
+                    element.deferSync()
                 element.prepare()
+                self._journalPrepared(element)
+            except Exception:
+                self.logger.debug(
+                    'exception during prepare phase',
+                    exc_info=True
+                )
+                self._failed = True
+                raise
+
+    def _sync(self, elements):
+        if not self._failed:
+            try:
+                devices = {}
+                for element in elements:
+                    for path in element.syncPaths():
+                        devices.setdefault(
+                            os.stat(path).st_dev,
+                            [],
+                        ).append(path)
+                for paths in devices.values():
+                    self.logger.debug('syncing %s', paths)
+                    _syncPaths(paths)
             except Exception:
                 self.logger.debug(
                     'exception during prepare phase',
@@ -68,16 +288,162 @@ class Transaction(base.Base):
                 self._failed = True
                 raise
 
-    def __init__(self, elements=()):
+    def _journalPrepared(self, element):
+        if self._journal is not None:
+            entry = element.journalEntry()
+            if entry is not None:
+                self._journalIds[id(element)] = len(self._journalIds)
+                self._journal.record(
+                    state=journal.State.PREPARED,
+                    id=self._journalIds[id(element)],
+                    element='%s.%s' % (
+                        type(element).__module__,
+                        type(element).__name__,
+                    ),
+                    entry=entry,
+                )
+                if self._postPrepare:
+                    self._journal.sync()
+
+    def _journalCommitted(self, element):
+        if id(element) in self._journalIds:
+            self._journal.record(
+                state=journal.State.COMMITTED,
+                id=self._journalIds.pop(id(element)),
+            )
+
+    def _journalClose(self, remove=True):
+        if self._journal is not None:
+            try:
+                self._journal.close(remove=remove)
+            except OSError:
+                self.logger.debug(
+                    'Cannot remove transaction journal',
+                    exc_info=True,
+                )
+            self._journalIds = {}
+
+    def _commitBatch(self):
+        """Pop next elements to commit, in commit order."""
+        batch = [self._prepared.pop()]
+        if self._commitWorkers > 1 and batch[0].commitKey() is not None:
+            while (
+                self._prepared and
+                self._prepared[-1].commitKey() is not None
+            ):
+                batch.append(self._prepared.pop())
+        return batch
+
+    def _commitConcurrently(self, batch):
+        """Commit elements of each key in order, keys concurrently.
+
+        If any element fails, the elements of its key that follow it
+        are left prepared, and the failed elements are aborted.
+
+        """
+        chains = {}
+        for element in batch:
+            element.deferCommitted()
+            chains.setdefault(element.commitKey(), []).append(element)
+
+        def _commit(chain):
+            for element in chain:
+                try:
+                    element.commit()
+                except Exception as e:
+                    self.logger.debug(
+                        "exception during commit of '%s'",
+                        element,
+                        exc_info=True,
+                    )
+                    return element, e
+            return None, None
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(chains), self._commitWorkers),
+        ) as executor:
+            # within the context of the caller, so that its profiler
+            # record accounts processes of the commits
+            futures = [
+                executor.submit(contextvars.copy_context().run, _commit, chain)
+                for chain in chains.values()
+            ]
+            results = [f.result() for f in futures]
+
+        failures = []
+        done = set()
+        for chain, (failed, error) in zip(chains.values(), results):
+            if failed is None:
+                done.update(id(element) for element in chain)
+            else:
+                done.update(
+                    id(element)
+                    for element in chain[:chain.index(failed)]
+                )
+                failures.append((failed, error))
+                # back to prepared, so abort() reverts them
+                self._prepared.extend(
+                    reversed(chain[chain.index(failed) + 1:])
+                )
+        for element in batch:
+            if id(element) in done:
+                self._journalCommitted(element)
+                element.committed()
+
+        if failures:
+            for element, error in failures:
+                self.logger.debug("aborting failed '%s'", element)
+                try:
+                    element.abort()
+                except Exception:
+                    self.logger.debug(
+                        "Unexpected exception from abort() of '%s'",
+                        element,
+                        exc_info=True
+                    )
+            raise RuntimeError(
+                _('Commit failed: {failures}').format(
+                    failures='; '.join(
+                        '%s: %s' % (element, error)
+                        for element, error in failures
+                    ),
+                )
+            )
+
+    def _relabel(self, elements):
+        paths = []
+        for element in elements:
+            paths.extend(element.relabelPaths())
+        for path, error in sorted(restoreContexts(
+            paths=paths,
+            logger=self.logger,
+        ).items()):
+            self.logger.warning(
+                _(
+                    "Failed to restore SELinux attributes for '{file}'"
+                ).format(
+                    file=path,
+                )
+            )
+            self.logger.debug('restorecon error: %s', error)
+
+    def __init__(self, elements=(), journal=None, commitWorkers=1):
         """Constructor.
 
         Keyword arguments:
         elements -- transaction elements.
+        journal -- journal.Journal to record prepared elements in, so
+            an interrupted transaction can be recovered.
+        commitWorkers -- max elements of different commitKey() to commit
+            concurrently.
 
         """
         super(Transaction, self).__init__()
         self._failed = False
         self._postPrepare = False
+        self._journal = journal
+        self._commitWorkers = commitWorkers
+        self._journalIds = {}
         self._elements = []
         self._prepared = []
         for element in elements:
@@ -85,7 +451,11 @@ class Transaction(base.Base):
 
     def __del__(self):
         """Destructor."""
-        self.abort()
+        try:
+            self.abort()
+        except RuntimeError:
+            # elements log their own failures
+            pass
 
     def __str__(self):
         return '[{elements}]'.format(
@@ -111,28 +481,66 @@ class Transaction(base.Base):
             self._prepare(element=element)
 
     def prepare(self):
-        """Prepare transaction elements."""
+        """Prepare transaction elements.
+
+        Elements supporting it do not sync their files, instead each
+        filesystem is synced once after all are prepared.
+
+        """
         self._postPrepare = True
         for element in self._elements:
-            self._prepare(element=element)
+            self._prepare(element=element, batch=True)
+        self._sync(self._elements)
+        if self._journal is not None and not self._failed:
+            self._journal.sync()
 
     def abort(self):
-        """Abort transaction."""
+        """Abort transaction.
+
+        All elements are aborted, if any fails RuntimeError lists them,
+        and the journal is kept for recovery.
+
+        """
         self._failed = True
+        if self._journal is not None and self._journal.active:
+            # recovery must abort, even if commit began
+            self._journal.record(state=journal.State.ABORT)
+            self._journal.sync()
+        failures = []
         for element in self._prepared:
             try:
                 self.logger.debug("aborting '%s'", element)
                 element.abort()
-            except Exception:
+            except Exception as e:
                 self.logger.debug(
                     "Unexpected exception from abort() of '%s'",
                     element,
                     exc_info=True
                 )
+                failures.append((element, e))
         self._prepared = []
+        self._journalClose(remove=not failures)
+        if failures:
+            raise RuntimeError(
+                _('Abort failed: {failures}').format(
+                    failures='; '.join(
+                        '%s: %s' % (element, error)
+                        for element, error in failures
+                    ),
+                )
+            )
 
     def commit(self):
-        """Commit transaction."""
+        """Commit transaction.
+
+        SELinux contexts of the files of elements supporting it are
+        restored once all are committed.
+
+        Adjacent elements having a commitKey() are committed
+        concurrently if commitWorkers allows, and if any fails, the
+        failed elements are aborted and RuntimeError lists them.
+
+        """
         if not self._postPrepare:
             raise RuntimeError(
                 _('Cannot commit transaction as transaction not prepared')
@@ -144,13 +552,29 @@ class Transaction(base.Base):
                 _('Cannot commit transaction as one of the elements failed')
             )
 
+        if self._journal is not None and self._journal.active:
+            self._journal.record(state=journal.State.COMMIT)
+            self._journal.sync()
+
         # remove elements from list
         # so that if we fail we won't
         # abort committed
-        while self._prepared:
-            element = self._prepared.pop()
-            self.logger.debug("committing '%s'", element)
-            element.commit()
+        committed = []
+        try:
+            while self._prepared:
+                batch = self._commitBatch()
+                for element in batch:
+                    self.logger.debug("committing '%s'", element)
+                    if element.deferRelabel():
+                        committed.append(element)
+                if len(batch) == 1:
+                    batch[0].commit()
+                    self._journalCommitted(batch[0])
+                else:
+                    self._commitConcurrently(batch)
+        finally:
+            self._relabel(committed)
+        self._journalClose()
 
     def __enter__(self):
         self.prepare()
@@ -12,6 +12,7 @@ from otopi import util
 from . import config
 from . import log
 from . import misc
+from . import profile
 from . import transaction
 
 
@@ -20,6 +21,7 @@ def createPlugins(context):
     config.Plugin(context=context)
     log.Plugin(context=context)
     misc.Plugin(context=context)
+    profile.Plugin(context=context)
     transaction.Plugin(context=context)
 
 
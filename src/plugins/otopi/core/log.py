@@ -7,13 +7,17 @@
 
 
 from datetime import datetime
+import collections
+import functools
 import gettext
 import logging
 import os
 import random
 import re
+import signal
 import string
 import tempfile
+import threading
 import time
 
 
@@ -62,6 +66,7 @@ class Plugin(plugin.PluginBase):
         CoreEnv.LOG_FILE_NAME -- file name.
         CoreEnv.LOG_FILTER -- list of strings to flter out.
         CoreEnv.LOG_REMOVE_AT_EXIT -- True if to remove log.
+        CoreEnv.LOG_ASYNC -- True to write log from background thread.
 
     OS Environment:
         SystemEnvironment.LOG_FILE -- log file name, default self genmerate.
@@ -73,9 +78,11 @@ class Plugin(plugin.PluginBase):
 
         def __init__(self):
             self._list = []
+            self.version = 0
 
         def append(self, string):
             self._list.append(string)
+            self.version += 1
 
         def __str__(self):
             return 'filter'
@@ -105,14 +112,16 @@ class Plugin(plugin.PluginBase):
 
             tofilter = []
 
-            for token in tokens:
-                if token not in (None, ''):
-                    index = -1
-                    while True:
-                        index = content.find(token, index+1)
-                        if index == -1:
-                            break
-                        tofilter.append((index, index + len(token)))
+            # membership test is much cheaper than find() per token,
+            # and most records contain none of the tokens, which are
+            # neither None nor empty, see _compiledFilter().
+            for token in [token for token in tokens if token in content]:
+                index = -1
+                while True:
+                    index = content.find(token, index+1)
+                    if index == -1:
+                        break
+                    tofilter.append((index, index + len(token)))
 
             for reobj in regexps:
                 if reobj is not None:
@@ -149,6 +158,45 @@ class Plugin(plugin.PluginBase):
         ):
             logging.Formatter.__init__(self, fmt=fmt, datefmt=datefmt)
             self._environment = environment
+            self._filterVersion = None
+            self._filterCompiled = None
+
+        def _compiledFilter(self):
+            """Return tokens and regexps to filter.
+
+            Built once per change of the environment, which counts its
+            modifications in generation, or of the filter lists, which
+            are only appended to in place. Without generation it is
+            built on each record.
+
+            """
+            environment = self.environment
+            generation = getattr(environment, 'generation', None)
+            logFilter = environment[constants.CoreEnv.LOG_FILTER]
+            keys = environment[constants.CoreEnv.LOG_FILTER_KEYS]
+            questionsKeys = environment[
+                constants.CoreEnv.LOG_FILTER_QUESTIONS_KEYS
+            ]
+            regexps = environment[constants.CoreEnv.LOG_FILTER_RE]
+            version = (
+                generation,
+                id(logFilter), logFilter.version,
+                id(keys), len(keys),
+                id(questionsKeys), len(questionsKeys),
+                id(regexps), len(regexps),
+            )
+            if generation is None or version != self._filterVersion:
+                tokens = set(logFilter._list)
+                tokens.update(environment.get(k, None) for k in keys)
+                tokens.update(environment.get(k, None) for k in questionsKeys)
+                tokens.discard(None)
+                tokens.discard('')
+                self._filterCompiled = (
+                    tuple(sorted(tokens)),
+                    tuple(r for r in regexps if r is not None),
+                )
+                self._filterVersion = version
+            return self._filterCompiled
 
         def converter(self, timestamp):
             return datetime.fromtimestamp(
@@ -186,24 +234,123 @@ class Plugin(plugin.PluginBase):
             formatTime = _formatTimeOS
 
         def format(self, record):
+            tokens, regexps = self._compiledFilter()
             return self._filter(
                 content=logging.Formatter.format(self, record),
-                tokens=(
-                    self.environment[constants.CoreEnv.LOG_FILTER]._list +
-                    [
-                        self.environment.get(k, None) for k in
-                        self.environment[constants.CoreEnv.LOG_FILTER_KEYS] +
-                        list(self.environment[
-                            constants.CoreEnv.LOG_FILTER_QUESTIONS_KEYS
-                        ])
-                    ]
-                ),
-                regexps=self.environment[constants.CoreEnv.LOG_FILTER_RE],
+                tokens=tokens,
+                regexps=regexps,
             )
 
+    class _QueuedHandler(logging.StreamHandler):
+        """Write records in batches from a background thread.
+
+        Records are formatted, and so filtered, by the logging thread and
+        queued. The writer thread wakes up when a batch is full or every
+        interval, and writes all pending records with a single write.
+
+        flush() writes pending records from the calling thread.
+        requestFlush() only sets a flag for the writer thread, so it can
+        be called from a signal handler, which must not write to the
+        stream the interrupted thread may be writing to.
+
+        """
+
+        BATCH = 256
+        INTERVAL = 0.2
+        POLL = 0.01
+
+        def __init__(self, stream):
+            logging.StreamHandler.__init__(self, stream)
+            self._pending = collections.deque()
+            self._wakeup = threading.Event()
+            self._writeLock = threading.Lock()
+            self._stopping = False
+            self._flushRequested = False
+            self._thread = threading.Thread(
+                target=self._run,
+                name='otopi-log-writer',
+            )
+            self._thread.daemon = True
+            self._thread.start()
+
+        def _write(self):
+            with self._writeLock:
+                while self._pending:
+                    lines = []
+                    try:
+                        while len(lines) < self.BATCH:
+                            lines.append(self._pending.popleft())
+                    except IndexError:
+                        pass
+                    try:
+                        self.stream.write(''.join(lines))
+                    except Exception:
+                        # back in order for the next write, emit() only
+                        # appends at the other end.
+                        self._pending.extendleft(reversed(lines))
+                        raise
+                self.stream.flush()
+
+        def _run(self):
+            while not self._stopping:
+                self._wakeup.wait(self.INTERVAL)
+                self._wakeup.clear()
+                requested = self._flushRequested
+                try:
+                    self._write()
+                except Exception:
+                    # nowhere to report, keep records for flush()
+                    pass
+                if requested:
+                    self._flushRequested = False
+
+        def emit(self, record):
+            try:
+                self._pending.append(self.format(record) + self.terminator)
+                if len(self._pending) >= self.BATCH:
+                    self._wakeup.set()
+            except Exception:
+                self.handleError(record)
+
+        def flush(self):
+            if self.stream is not None and not self.stream.closed:
+                self._write()
+
+        def requestFlush(self, timeout):
+            """Have the writer thread write pending records.
+
+            Takes no lock, waits up to timeout seconds for the write.
+
+            """
+            self._flushRequested = True
+            deadline = time.monotonic() + timeout
+            while (
+                self._flushRequested and
+                self._thread.is_alive() and
+                time.monotonic() < deadline
+            ):
+                time.sleep(self.POLL)
+
+        def close(self):
+            self._stopping = True
+            self._wakeup.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self.flush()
+            logging.StreamHandler.close(self)
+
+    _FATAL_SIGNALS = (
+        'SIGABRT',
+        'SIGHUP',
+        'SIGINT',
+        'SIGQUIT',
+        'SIGTERM',
+    )
+
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
         self._handler = None
+        self._signals = {}
         self._logerror = None
         self.environment[constants.CoreEnv.LOG_FILTER_KEYS] = []
         self.environment[constants.CoreEnv.LOG_FILTER_RE] = []
@@ -308,9 +455,18 @@ class Plugin(plugin.PluginBase):
                 buffering=1,
             )
 
-        self._handler = logging.StreamHandler(
-            self.environment[constants.CoreEnv.LOG_FILE_HANDLE]
-        )
+        if self.environment.setdefault(
+            constants.CoreEnv.LOG_ASYNC,
+            False
+        ):
+            self._handler = self._QueuedHandler(
+                self.environment[constants.CoreEnv.LOG_FILE_HANDLE]
+            )
+            self._hookSignals()
+        else:
+            self._handler = logging.StreamHandler(
+                self.environment[constants.CoreEnv.LOG_FILE_HANDLE]
+            )
         self._handler.setLevel(logging.DEBUG)
         self._handler.setFormatter(
             self._MyFormatter(
@@ -328,7 +484,47 @@ class Plugin(plugin.PluginBase):
             constants.CoreEnv.LOG_FILTER_KEYS
         ][:]
 
+    def _fatalSignal(self, previous, signum, frame):
+        handler = self._handler
+        if isinstance(handler, self._QueuedHandler):
+            handler.requestFlush(timeout=2 * handler.INTERVAL)
+        previous(signum, frame)
+
+    def _hookSignals(self):
+        """Flush queued records before the fatal signal handlers."""
+        for name in self._FATAL_SIGNALS:
+            signum = getattr(signal, name, None)
+            if signum is None:
+                continue
+            previous = signal.getsignal(signum)
+            if callable(previous):
+                try:
+                    signal.signal(
+                        signum,
+                        functools.partial(self._fatalSignal, previous),
+                    )
+                    self._signals[signum] = previous
+                except ValueError:
+                    # not main thread
+                    pass
+
+    def _unhookSignals(self):
+        for signum, previous in self._signals.items():
+            try:
+                signal.signal(signum, previous)
+            except ValueError:
+                pass
+        self._signals = {}
+
+    def _flushLogging(self):
+        if self._handler is not None:
+            try:
+                self._handler.flush()
+            except Exception:
+                pass
+
     def _closeLogging(self):
+        self._unhookSignals()
         if self._handler is not None:
             logger = logging.getLogger("otopi")
             logger.removeHandler(self._handler)
@@ -360,7 +556,9 @@ class Plugin(plugin.PluginBase):
                 pass
 
     def _notification(self, event):
-        if event == self.context.NOTIFY_REEXEC:
+        if event == self.context.NOTIFY_ERROR:
+            self._flushLogging()
+        elif event == self.context.NOTIFY_REEXEC:
             self._closeLogging()
 
     @plugin.event(
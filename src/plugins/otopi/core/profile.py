@@ -0,0 +1,110 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""Profile plugin."""
+
+
+import gettext
+import json
+import os
+
+
+from otopi import constants
+from otopi import plugin
+from otopi import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+@util.export
+class Plugin(plugin.PluginBase):
+    """Profile plugin.
+
+    Environment:
+        BaseEnv.PROFILE -- profile events.
+        CoreEnv.PROFILE_FILE_NAME -- JSON report file name.
+        CoreEnv.PROFILE_TOP -- slowest events to report.
+
+    """
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+
+    def _writeReport(self, report):
+        fileName = self.environment[constants.CoreEnv.PROFILE_FILE_NAME]
+        if fileName is None and self.environment.get(
+            constants.CoreEnv.LOG_FILE_NAME
+        ) is not None:
+            fileName = '%s-profile.json' % os.path.splitext(
+                self.environment[constants.CoreEnv.LOG_FILE_NAME]
+            )[0]
+        if fileName is not None:
+            try:
+                with open(fileName, 'w') as f:
+                    json.dump(report, f, indent=4, sort_keys=True)
+                self.logger.debug('Profile report: %s', fileName)
+            except OSError as e:
+                self.logger.warning(
+                    _(
+                        "Cannot write profile report '{fileName}': {error}"
+                    ).format(
+                        fileName=fileName,
+                        error=e,
+                    )
+                )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_INIT,
+    )
+    def _init(self):
+        self.environment.setdefault(
+            constants.CoreEnv.PROFILE_FILE_NAME,
+            None
+        )
+        self.environment.setdefault(
+            constants.CoreEnv.PROFILE_TOP,
+            10
+        )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_TERMINATE,
+        priority=plugin.Stages.PRIORITY_LAST,
+        condition=lambda self: self.environment[
+            constants.BaseEnv.PROFILE
+        ],
+    )
+    def _terminate(self):
+        self._writeReport(self.context.profiler.report())
+
+        top = [
+            '%8.3f %8.3f %4d %8.3f %s %s' % (
+                record['wall'],
+                record['cpu'],
+                record['processes'],
+                record['processesTime'],
+                record['stage'],
+                record['method'],
+            )
+            for record in self.context.profiler.top(
+                self.environment[constants.CoreEnv.PROFILE_TOP]
+            )
+        ]
+        self.logger.debug(
+            'Slowest events (wall, cpu, processes, processes time):\n%s',
+            '\n'.join(top),
+        )
+        if self.environment[constants.DialogEnv.DIALECT] in (
+            constants.Const.DIALOG_DIALECT_MACHINE,
+            constants.Const.DIALOG_DIALECT_JSON,
+        ):
+            self.dialog.displayMultiString(
+                name='PROFILE',
+                value=top,
+            )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -6,12 +6,22 @@
 """Transaction plugin."""
 
 
+import gettext
+
+
+from otopi import backupstore
 from otopi import constants
+from otopi import filetransaction
+from otopi import journal
 from otopi import plugin
 from otopi import transaction
 from otopi import util
 
 
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
 @util.export
 class Plugin(plugin.PluginBase):
     """Transaction provider.
@@ -25,6 +35,11 @@ class Plugin(plugin.PluginBase):
     Environment:
         CoreEnv.INTERNAL_PACKAGES_TRANSACTION -- transaction object.
         CoreEnv.MAIN_TRANSACTION -- transaction object.
+        CoreEnv.FILE_BACKUP_DIR -- file backup store directory.
+        CoreEnv.FILE_BACKUP_HARDLINK -- link backups if cannot reflink.
+        CoreEnv.FILE_BACKUP_NAMES -- also keep backups next to files.
+        CoreEnv.TRANSACTION_JOURNAL_DIR -- transaction journal directory.
+        CoreEnv.TRANSACTION_COMMIT_WORKERS -- max concurrent commits.
 
     Users of this module can acquire transaction object
     out of the environment at CoreEnv.MAIN_TRANSACTION.
@@ -33,13 +48,24 @@ class Plugin(plugin.PluginBase):
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
 
+    def _abort(self, transaction):
+        # already failing, report and go on aborting
+        try:
+            transaction.abort()
+        except RuntimeError as e:
+            self.logger.error(
+                _('Transaction abort failed: {error}').format(
+                    error=e,
+                )
+            )
+
     def _notify(self, event):
         if event == self.context.NOTIFY_ERROR:
             if self._internalPackageTransaction is not None:
-                self._internalPackageTransaction.abort()
+                self._abort(self._internalPackageTransaction)
                 self._internalPackageTransaction = None
             if self._mainTransaction is not None:
-                self._mainTransaction.abort()
+                self._abort(self._mainTransaction)
                 self._mainTransaction = None
 
     @plugin.event(
@@ -47,8 +73,51 @@ class Plugin(plugin.PluginBase):
         name=constants.Stages.TRANSACTIONS_INIT,
     )
     def _init(self):
-        self._internalPackageTransaction = transaction.Transaction()
-        self._mainTransaction = transaction.Transaction()
+        self.environment.setdefault(
+            constants.CoreEnv.TRANSACTION_JOURNAL_DIR,
+            None
+        )
+        self.environment.setdefault(
+            constants.CoreEnv.TRANSACTION_COMMIT_WORKERS,
+            1
+        )
+        journalDir = self.environment[
+            constants.CoreEnv.TRANSACTION_JOURNAL_DIR
+        ]
+        if journalDir:
+            recovered, failed = journal.recover(
+                directory=journalDir,
+                logger=self.logger,
+            )
+            for name, committed in recovered:
+                self.logger.warning(
+                    _(
+                        "Interrupted transaction '{journal}' was {action}"
+                    ).format(
+                        journal=name,
+                        action=_('committed') if committed else _('aborted'),
+                    )
+                )
+            for name in failed:
+                self.logger.warning(
+                    _(
+                        "Cannot recover interrupted transaction "
+                        "'{journal}', please check its files"
+                    ).format(
+                        journal=name,
+                    )
+                )
+        commitWorkers = self.environment[
+            constants.CoreEnv.TRANSACTION_COMMIT_WORKERS
+        ]
+        self._internalPackageTransaction = transaction.Transaction(
+            journal=journal.Journal(journalDir) if journalDir else None,
+            commitWorkers=commitWorkers,
+        )
+        self._mainTransaction = transaction.Transaction(
+            journal=journal.Journal(journalDir) if journalDir else None,
+            commitWorkers=commitWorkers,
+        )
         self.environment[
             constants.CoreEnv.INTERNAL_PACKAGES_TRANSACTION
         ] = self._internalPackageTransaction
@@ -58,6 +127,32 @@ class Plugin(plugin.PluginBase):
         self.environment[
             constants.CoreEnv.MODIFIED_FILES
         ] = []
+        self.environment.setdefault(
+            constants.CoreEnv.FILE_BACKUP_DIR,
+            None
+        )
+        self.environment.setdefault(
+            constants.CoreEnv.FILE_BACKUP_HARDLINK,
+            False
+        )
+        self.environment.setdefault(
+            constants.CoreEnv.FILE_BACKUP_NAMES,
+            False
+        )
+        if self.environment[constants.CoreEnv.FILE_BACKUP_DIR]:
+            filetransaction.FileTransaction.registerBackupStore(
+                backupstore.BackupStore(
+                    directory=self.environment[
+                        constants.CoreEnv.FILE_BACKUP_DIR
+                    ],
+                    hardlink=self.environment[
+                        constants.CoreEnv.FILE_BACKUP_HARDLINK
+                    ],
+                    names=self.environment[
+                        constants.CoreEnv.FILE_BACKUP_NAMES
+                    ],
+                )
+            )
         self.context.registerNotification(self._notify)
 
     @plugin.event(
@@ -110,6 +110,21 @@ class Plugin(plugin.PluginBase):
                 )
                 res = getattr(self.packager, action)(p)
                 self.dialog.note('Result is: %s' % pprint.pformat(res))
+        elif action in (
+            'installGroups',
+            'updateGroups',
+            'removeGroups',
+        ):
+            # A single param that is a list of all groups
+            groups = self.environment[constants.DebugEnv.PACKAGES].split(',')
+            self.dialog.note(
+                '\nCalling {action} on {groups}:'.format(
+                    action=action,
+                    groups=groups,
+                )
+            )
+            res = getattr(self.packager, action)(groups)
+            self.dialog.note('Result is: %s' % pprint.pformat(res))
         elif action in (
             'install',
             'update',
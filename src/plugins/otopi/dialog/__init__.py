@@ -12,6 +12,7 @@ from otopi import util
 from . import answer_file
 from . import cli
 from . import human
+from . import json_lines
 from . import machine
 from . import misc
 
@@ -21,6 +22,7 @@ def createPlugins(context):
     answer_file.Plugin(context=context)
     cli.Plugin(context=context)
     human.Plugin(context=context)
+    json_lines.Plugin(context=context)
     machine.Plugin(context=context)
     misc.Plugin(context=context)
 
@@ -64,5 +64,8 @@ class DialogMachineConst(object):
 
     TERMINATE = 'TERMINATE'
 
+    # Unsolicited answers to queries, sent by manager at any time
+    ANSWER = 'ANSWER'
+
 
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -132,8 +132,9 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             )
 
         if isinstance(text, list) or isinstance(text, tuple):
-            for i in text:
-                self.note(text=i)
+            with self._message():
+                for i in text:
+                    self.note(text=i)
             return
 
         if text is None:
@@ -210,14 +211,15 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         self._question_occurrences[name] = occurrence+1
         if envkey in self.environment:
             answer = self.environment[envkey]
-            self.dialog.note(text=note, prompt=False)
-            self.dialog.note(
-                _(
-                    'provided answer: {answer}'
-                ).format(
-                    answer=_('(hidden)') if hidden else answer,
+            with self._message():
+                self.dialog.note(text=note, prompt=False)
+                self.dialog.note(
+                    _(
+                        'provided answer: {answer}'
+                    ).format(
+                        answer=_('(hidden)') if hidden else answer,
+                    )
                 )
-            )
             value = answer
             accepted = True
 
@@ -246,12 +248,13 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             note = _("\nPlease specify multiple strings for '{name}':").format(
                 name=name
             )
-        self.dialog.note(text=note)
-        self.dialog.note(
-            text=_("type '{boundary}' in own line to mark end.").format(
-                boundary=self.BOUNDARY,
+        with self._message():
+            self.dialog.note(text=note)
+            self.dialog.note(
+                text=_("type '{boundary}' in own line to mark end.").format(
+                    boundary=self.BOUNDARY,
+                )
             )
-        )
         value = []
         while True:
             v = self._readline()
@@ -266,37 +269,38 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             note = _("\nPlease specify value for '{name}':").format(
                 name=name
             )
-        self.dialog.note(text=note)
-        self.dialog.note(text=_("Format is type:value."))
+        with self._message():
+            self.dialog.note(text=note)
+            self.dialog.note(text=_("Format is type:value."))
         value = common.parseTypedValue(self._readline())
         return value
 
     def displayValue(self, name, value, note=None):
         self.logger.debug('display %s', name)
-        if note is not None:
-            self.note(text=note)
-
-        self._write(
-            text='D:VALUE %s=%s:%s\n' % (
-                name,
-                common.typeName(value),
-                value,
+        with self._message():
+            if note is not None:
+                self.note(text=note)
+            self._write(
+                text='D:VALUE %s=%s:%s\n' % (
+                    name,
+                    common.typeName(value),
+                    value,
+                )
             )
-        )
 
     def displayMultiString(self, name, value, note=None):
         self.logger.debug('display %s', name)
-        if note is not None:
-            self.note(text=note)
-
-        self._write(
-            text='D:MULTI-STRING %s %s\n%s\n%s\n' % (
-                name,
-                self.BOUNDARY,
-                '\n'.join(value),
-                self.BOUNDARY,
+        with self._message():
+            if note is not None:
+                self.note(text=note)
+            self._write(
+                text='D:MULTI-STRING %s %s\n%s\n%s\n' % (
+                    name,
+                    self.BOUNDARY,
+                    '\n'.join(value),
+                    self.BOUNDARY,
+                )
             )
-        )
 
     def confirm(
         self,
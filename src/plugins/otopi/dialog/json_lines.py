@@ -0,0 +1,389 @@
+#
+# otopi -- plugable installer
+#
+
+
+"""JSON dialog provider
+
+Refer to README.dialog.
+
+"""
+
+
+import gettext
+import logging
+
+
+from otopi import common
+from otopi import constants
+from otopi import context
+from otopi import dialog
+from otopi import jsondialog
+from otopi import plugin
+from otopi import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+@util.export
+class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
+    """JSON dialog protocol provider.
+
+    Same messages as the machine dialect, each a JSON object in its
+    own line, see otopi.jsondialog.
+
+    Environment:
+        DialogEnv.DIALECT -- if json activate.
+        DialogEnv.BOUNDARY -- set bundary to use.
+
+    """
+    BOUNDARY = '--=451b80dc-996f-432e-9e4f-2b29ef6d1141=--'
+
+    class _MyFormatter(logging.Formatter):
+        """Log record as message formatter."""
+        def __init__(self, parent):
+            logging.Formatter.__init__(self, fmt='%(message)s')
+            self._parent = parent
+
+        def format(self, record):
+            return jsondialog.encode({
+                'type': jsondialog.Message.LOG,
+                'level': record.levelname,
+                'message': logging.Formatter.format(self, record),
+            }).rstrip('\n')
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+        dialog.DialogBaseImpl.__init__(self)    # python super is no good
+        self._enabled = False
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_BOOT,
+        after=(
+            constants.Stages.DIALOG_MISC_BOOT,
+        ),
+        before=(
+            constants.Stages.DIALOG_BOOT_DONE,
+        ),
+        condition=(
+            lambda self: self.environment[
+                constants.DialogEnv.DIALECT
+            ] == constants.Const.DIALOG_DIALECT_JSON
+        ),
+    )
+    def _init(self):
+        self.environment[constants.DialogEnv.BOUNDARY] = self.BOUNDARY
+        self._open(logFormatter=self._MyFormatter(parent=self))
+        self._enabled = True
+        self.context.registerDialog(self)
+
+    def _send(self, message, **kwargs):
+        kwargs['type'] = message
+        self._write(text=jsondialog.encode(kwargs))
+
+    def _event(self, message, stage, method):
+        self._send(
+            message=message,
+            stage=plugin.Stages.stage_id(stage),
+            method=self.context.methodName(method),
+            name=method['name'],
+        )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_INIT,
+        condition=lambda self: self._enabled,
+    )
+    def _init_events(self):
+        def _pre(stage, method):
+            self._event(
+                message=jsondialog.Message.EVENT_START,
+                stage=stage,
+                method=method,
+            )
+        self.context.registerPreEventCallback(_pre)
+
+        def _post(stage, method):
+            self._event(
+                message=jsondialog.Message.EVENT_END,
+                stage=stage,
+                method=method,
+            )
+        self.context.registerPostEventCallback(_post)
+
+        self._send(
+            message=jsondialog.Message.EVENTS_LIST,
+            events=[
+                {
+                    'stage': plugin.Stages.stage_id(stage),
+                    'method': name,
+                    'name': givenname,
+                }
+                for stage, name, givenname in self.context.getSequence()
+            ],
+        )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_TERMINATE,
+        priority=plugin.Stages.PRIORITY_LAST + 10,
+        condition=lambda self: self._enabled,
+    )
+    def _terminate(self):
+        self.dialog.terminate()
+        self._close()
+
+    def _consumeInput(self, line):
+        """Accept answers sent ahead of queries."""
+        try:
+            message = jsondialog.decode(line)
+        except ValueError:
+            return False
+        if message['type'] != jsondialog.Message.ANSWERS:
+            return False
+
+        answers = message.get('answers')
+        if not isinstance(answers, dict) or not all(
+            key.startswith(constants.CoreEnv.QUESTION_PREFIX)
+            for key in answers
+        ):
+            raise RuntimeError(_('Invalid answers'))
+        for key, value in answers.items():
+            self._storeAnswer(key, value)
+        return True
+
+    def _lines(self, text):
+        if isinstance(text, list) or isinstance(text, tuple):
+            lines = []
+            for i in text:
+                lines.extend(self._lines(i))
+            return lines
+
+        if text is None:
+            text = '\n'
+        return common.toStr(text).splitlines()
+
+    def _receive(self, name, hidden=False):
+        """Read response for name, return its value."""
+        line = self._readline(hidden=hidden)
+        try:
+            message = jsondialog.decode(line)
+        except ValueError:
+            raise RuntimeError(
+                _("Invalid response for {name}").format(
+                    name=name,
+                )
+            )
+
+        if message.get('name') != name:
+            raise RuntimeError(
+                _(
+                    "Expected response for {name}, "
+                    "received '{received}'"
+                ).format(
+                    name=name,
+                    received=message.get('name'),
+                )
+            )
+
+        if message['type'] == jsondialog.Message.ABORT:
+            raise context.Abort(_('Aborted by dialog'))
+        elif message['type'] != jsondialog.Message.RESPONSE:
+            raise RuntimeError(
+                _("Invalid response type '{type}'").format(
+                    type=message['type'],
+                )
+            )
+        elif 'value' not in message:
+            raise RuntimeError(_('Value not provided'))
+        return message['value']
+
+    #
+    # DialogBase
+    #
+
+    def note(self, text=None, prompt=False):
+        self._send(
+            message=jsondialog.Message.NOTE,
+            text=self._lines(text),
+        )
+
+    def queryString(
+        self,
+        name,
+        note=None,
+        validValues=None,
+        caseSensitive=True,
+        hidden=False,
+        prompt=False,
+        default=None,
+    ):
+        if default is not None:
+            default = common.toStr(default)
+        if validValues is not None:
+            validValues = [common.toStr(v) for v in validValues]
+        note = self._queryStringNote(
+            name=name,
+            note=note,
+            validValues=validValues,
+            default=default,
+        )
+
+        envkey = self._questionKey(name)
+        self._pollInput()
+        if envkey in self.environment:
+            answer = self.environment[envkey]
+            self.dialog.note(
+                text=self._lines(note) + [
+                    _(
+                        'provided answer: {answer}'
+                    ).format(
+                        answer=_('(hidden)') if hidden else answer,
+                    )
+                ],
+            )
+            value = answer
+        else:
+            self._send(
+                message=jsondialog.Message.QUERY_STRING,
+                name=name,
+                note=self._lines(note),
+                default=default,
+                validValues=validValues,
+                hidden=hidden,
+            )
+            value = self._receive(name=name, hidden=hidden)
+            if not isinstance(value, str):
+                raise RuntimeError(
+                    _("Invalid value provided to '{name}'").format(
+                        name=name
+                    )
+                )
+            if not caseSensitive and validValues is not None:
+                validValues = [v.lower() for v in validValues]
+            if not value and default is not None:
+                value = default
+            if not caseSensitive:
+                value = value.lower()
+            if (
+                (validValues is not None and value not in validValues) or
+                (not value and value != default)
+            ):
+                raise RuntimeError(
+                    _("Invalid value provided to '{name}'").format(
+                        name=name
+                    )
+                )
+            self.environment[envkey] = value
+
+        if hidden:
+            self.environment[constants.CoreEnv.LOG_FILTER].append(value)
+        return value
+
+    def queryMultiString(self, name, note=None):
+        if note is None:
+            note = _("\nPlease specify multiple strings for '{name}':").format(
+                name=name
+            )
+        self._send(
+            message=jsondialog.Message.QUERY_MULTI_STRING,
+            name=name,
+            note=self._lines(note),
+        )
+        value = self._receive(name=name)
+        if (
+            not isinstance(value, list) or
+            not all(isinstance(v, str) for v in value)
+        ):
+            raise RuntimeError(
+                _("Invalid value provided to '{name}'").format(
+                    name=name
+                )
+            )
+        return value
+
+    def queryValue(self, name, note=None):
+        if note is None:
+            note = _("\nPlease specify value for '{name}':").format(
+                name=name
+            )
+
+        # only answers sent by manager, as confirm()
+        envkey = self._questionKey(name)
+        self._pollInput()
+        if envkey in self._answered:
+            answer = self.environment[envkey]
+            self.dialog.note(
+                text=self._lines(note) + [
+                    _('provided answer: {answer}').format(answer=answer),
+                ],
+            )
+            return answer
+
+        self._send(
+            message=jsondialog.Message.QUERY_VALUE,
+            name=name,
+            note=self._lines(note),
+        )
+        return self._receive(name=name)
+
+    def displayValue(self, name, value, note=None):
+        self._send(
+            message=jsondialog.Message.DISPLAY_VALUE,
+            name=name,
+            note=None if note is None else self._lines(note),
+            valueType=common.typeName(value),
+            value=value,
+        )
+
+    def displayMultiString(self, name, value, note=None):
+        self._send(
+            message=jsondialog.Message.DISPLAY_MULTI_STRING,
+            name=name,
+            note=None if note is None else self._lines(note),
+            value=list(value),
+        )
+
+    def confirm(
+        self,
+        name,
+        description,
+        note=None,
+        prompt=False,
+    ):
+        if note is None:
+            note = _(
+                "\nPlease confirm '{name}' {description}\n"
+            ).format(
+                name=name,
+                description=description,
+            )
+
+        # same key as the human dialect, which confirms using a query.
+        # only answers sent by manager, answer files never answered
+        # confirm in this dialect.
+        envkey = self._questionKey('DIALOG_CONFIRM/%s' % name)
+        self._pollInput()
+        if envkey in self._answered:
+            answer = self.environment[envkey]
+            self.dialog.note(
+                text=self._lines(note) + [
+                    _('provided answer: {answer}').format(answer=answer),
+                ],
+            )
+            return answer is True or answer in ('yes', 'YES', 'y', 'Y')
+
+        self._send(
+            message=jsondialog.Message.CONFIRM,
+            name=name,
+            description=description,
+            note=self._lines(note),
+        )
+        value = self._receive(name=name)
+        return value is True or value in ('yes', 'YES', 'y', 'Y')
+
+    def terminate(self):
+        self._send(message=jsondialog.Message.TERMINATE)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -65,7 +65,6 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         super(Plugin, self).__init__(context=context)
         dialog.DialogBaseImpl.__init__(self)    # python super is no good
         self._enabled = False
-        self._question_occurrences = {}
 
     @plugin.event(
         stage=plugin.Stages.STAGE_BOOT,
@@ -118,21 +117,30 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             )
         self.context.registerPostEventCallback(_post)
 
-        self._write(
-            text='%s\n' % _qep(dialogcons.DialogMachineConst.EVENTS_LIST_START)
-        )
-        for stage, name, givenname in self.context.getSequence():
+        with self._message():
             self._write(
-                text='{p} STAGE {stage} METHOD {name} ({givenname})\n'.format(
-                    p=_qep(dialogcons.DialogMachineConst.EVENTS_LIST_ENTRY),
-                    stage=plugin.Stages.stage_id(stage),
-                    name=name,
-                    givenname=givenname,
+                text='%s\n' % _qep(
+                    dialogcons.DialogMachineConst.EVENTS_LIST_START
+                )
+            )
+            for stage, name, givenname in self.context.getSequence():
+                self._write(
+                    text=(
+                        '{p} STAGE {stage} METHOD {name} ({givenname})\n'
+                    ).format(
+                        p=_qep(
+                            dialogcons.DialogMachineConst.EVENTS_LIST_ENTRY
+                        ),
+                        stage=plugin.Stages.stage_id(stage),
+                        name=name,
+                        givenname=givenname,
+                    )
+                )
+            self._write(
+                text='%s\n' % _qep(
+                    dialogcons.DialogMachineConst.EVENTS_LIST_END
                 )
             )
-        self._write(
-            text='%s\n' % _qep(dialogcons.DialogMachineConst.EVENTS_LIST_END)
-        )
 
     @plugin.event(
         stage=plugin.Stages.STAGE_TERMINATE,
@@ -154,23 +162,50 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         )
 
         if isinstance(text, list) or isinstance(text, tuple):
-            for i in text:
-                self.note(text=i)
+            with self._message():
+                for i in text:
+                    self.note(text=i)
             return
 
         if text is None:
             text = '\n'
         text = common.toStr(text)
 
-        for line in text.splitlines():
-            self._write(
-                text='%s%s\n' % (
+        self._write(
+            text=''.join(
+                '%s%s\n' % (
                     PREFIX,
                     ' ' + line if line else ''
-                ),
-                flush=False,
+                )
+                for line in text.splitlines()
+            ),
+        )
+
+    def _consumeInput(self, line):
+        """Accept answers sent ahead of queries.
+
+        ANSWER QUESTION/1/NAME=type:value
+
+        """
+        opcode = '%s ' % dialogcons.DialogMachineConst.ANSWER
+        if not line.startswith(opcode):
+            return False
+
+        variable = line[len(opcode):].split('=', 1)
+        if (
+            len(variable) != 2 or
+            not variable[0].startswith(constants.CoreEnv.QUESTION_PREFIX)
+        ):
+            raise RuntimeError(
+                _("Invalid answer '{key}'").format(
+                    key=variable[0],
+                )
             )
-        self._flush()
+        self._storeAnswer(
+            variable[0],
+            common.parseTypedValue(variable[1]),
+        )
+        return True
 
     def _writeQueryStart(self, name):
         self._write(
@@ -188,52 +223,16 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             )
         )
 
-    def queryString(
+    def _writeQueryString(
         self,
         name,
-        note=None,
-        validValues=None,
-        caseSensitive=True,
-        hidden=False,
-        prompt=False,
-        default=None,
+        note,
+        validValues,
+        hidden,
+        prompt,
+        default,
     ):
-        if default is not None:
-            default = common.toStr(default)
-        if validValues is not None:
-            validValues = [common.toStr(v) for v in validValues]
-        note = self._queryStringNote(
-            name=name,
-            note=note,
-            validValues=validValues,
-            default=default,
-        )
-
-        occurrence = self._question_occurrences.get(name, 1)
-        envkey = '{prefix}{occurrence}/{name}'.format(
-            prefix=constants.CoreEnv.QUESTION_PREFIX,
-            occurrence=str(occurrence),
-            name=name,
-        )
-        self._question_occurrences[name] = occurrence+1
-        if envkey in self.environment:
-            # Answer provided in answerfile. No need to prompt or
-            # anything. TODO Consider formalizing this in the machine
-            # dialog protocol so that the client knows that we were
-            # supposed to ask something but already got an answer.
-            # For now just output this as a note, just like the
-            # human dialect.
-            answer = self.environment[envkey]
-            self.dialog.note(text=note, prompt=False)
-            self.dialog.note(
-                _(
-                    'provided answer: {answer}'
-                ).format(
-                    answer=_('(hidden)') if hidden else answer,
-                )
-            )
-            value = answer
-        else:
+        with self._message():
             self._writeQueryStart(name)
             self.dialog.note(text=note, prompt=prompt)
             if default:
@@ -276,6 +275,57 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
                 )
             )
             self._writeQueryEnd(name)
+
+    def queryString(
+        self,
+        name,
+        note=None,
+        validValues=None,
+        caseSensitive=True,
+        hidden=False,
+        prompt=False,
+        default=None,
+    ):
+        if default is not None:
+            default = common.toStr(default)
+        if validValues is not None:
+            validValues = [common.toStr(v) for v in validValues]
+        note = self._queryStringNote(
+            name=name,
+            note=note,
+            validValues=validValues,
+            default=default,
+        )
+
+        envkey = self._questionKey(name)
+        self._pollInput()
+        if envkey in self.environment:
+            # Answer provided in answerfile. No need to prompt or
+            # anything. TODO Consider formalizing this in the machine
+            # dialog protocol so that the client knows that we were
+            # supposed to ask something but already got an answer.
+            # For now just output this as a note, just like the
+            # human dialect.
+            answer = self.environment[envkey]
+            with self._message():
+                self.dialog.note(text=note, prompt=False)
+                self.dialog.note(
+                    _(
+                        'provided answer: {answer}'
+                    ).format(
+                        answer=_('(hidden)') if hidden else answer,
+                    )
+                )
+            value = answer
+        else:
+            self._writeQueryString(
+                name=name,
+                note=note,
+                validValues=validValues,
+                hidden=hidden,
+                prompt=prompt,
+                default=default,
+            )
             if not caseSensitive and validValues is not None:
                 validValues = [v.lower() for v in validValues]
             value = self._readline(hidden)
@@ -303,30 +353,31 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             note = _("\nPlease specify multiple strings for '{name}':").format(
                 name=name
             )
-        self._writeQueryStart(name)
-        self.dialog.note(text=note)
-        self.dialog.note(
-            text=_(
-                "type '{boundary}' in own line to mark end, "
-                "'{abortboundary}' aborts"
-            ).format(
-                boundary=self.BOUNDARY,
-                abortboundary=self.ABORT_BOUNDARY,
+        with self._message():
+            self._writeQueryStart(name)
+            self.dialog.note(text=note)
+            self.dialog.note(
+                text=_(
+                    "type '{boundary}' in own line to mark end, "
+                    "'{abortboundary}' aborts"
+                ).format(
+                    boundary=self.BOUNDARY,
+                    abortboundary=self.ABORT_BOUNDARY,
+                )
             )
-        )
-        self._write(
-            text='%s%s %s %s %s\n' % (
-                dialogcons.DialogMachineConst.REQUEST_PREFIX,
-                dialogcons.DialogMachineConst.QUERY_MULTI_STRING,
-                name,
-                self.BOUNDARY,
-                self.ABORT_BOUNDARY,
+            self._write(
+                text='%s%s %s %s %s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.QUERY_MULTI_STRING,
+                    name,
+                    self.BOUNDARY,
+                    self.ABORT_BOUNDARY,
+                )
             )
-        )
-        self._writeQueryEnd(name)
+            self._writeQueryEnd(name)
         value = []
         while True:
-            v = self._readline()
+            v = self._readline(unsolicited=False)
             if v == self.BOUNDARY:
                 break
             elif v == self.ABORT_BOUNDARY:
@@ -341,24 +392,37 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
                 name=name
             )
 
-        self._writeQueryStart(name)
-        self.dialog.note(text=note)
-        self.dialog.note(
-            text=_(
-                "Response is VALUE {name}=type:value or "
-                "ABORT {name}"
-            ).format(
-                name=name,
-            ),
-        )
-        self._write(
-            text='%s%s %s\n' % (
-                dialogcons.DialogMachineConst.REQUEST_PREFIX,
-                dialogcons.DialogMachineConst.QUERY_VALUE,
-                name,
+        # only answers sent by manager, as confirm()
+        envkey = self._questionKey(name)
+        self._pollInput()
+        if envkey in self._answered:
+            answer = self.environment[envkey]
+            with self._message():
+                self.dialog.note(text=note, prompt=False)
+                self.dialog.note(
+                    _('provided answer: {answer}').format(answer=answer)
+                )
+            return answer
+
+        with self._message():
+            self._writeQueryStart(name)
+            self.dialog.note(text=note)
+            self.dialog.note(
+                text=_(
+                    "Response is VALUE {name}=type:value or "
+                    "ABORT {name}"
+                ).format(
+                    name=name,
+                ),
             )
-        )
-        self._writeQueryEnd(name)
+            self._write(
+                text='%s%s %s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.QUERY_VALUE,
+                    name,
+                )
+            )
+            self._writeQueryEnd(name)
 
         opcode, variable = self._readline().split(' ', 1)
         variable = variable.split('=', 1)
@@ -389,34 +453,34 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             )
 
     def displayValue(self, name, value, note=None):
-        if note is not None:
-            self.note(text=note)
-
-        self._write(
-            text='%s%s %s=%s:%s\n' % (
-                dialogcons.DialogMachineConst.REQUEST_PREFIX,
-                dialogcons.DialogMachineConst.DISPLAY_VALUE,
-                name,
-                common.typeName(value),
-                value,
+        with self._message():
+            if note is not None:
+                self.note(text=note)
+            self._write(
+                text='%s%s %s=%s:%s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.DISPLAY_VALUE,
+                    name,
+                    common.typeName(value),
+                    value,
+                )
             )
-        )
 
     def displayMultiString(self, name, value, note=None):
-        if note is not None:
-            self.note(text=note)
-
-        self._write(
-            text='%s%s %s %s\n%s%s%s\n' % (
-                dialogcons.DialogMachineConst.REQUEST_PREFIX,
-                dialogcons.DialogMachineConst.DISPLAY_MULTI_STRING,
-                name,
-                self.BOUNDARY,
-                '\n'.join(value),
-                '\n' if value else '',
-                self.BOUNDARY,
+        with self._message():
+            if note is not None:
+                self.note(text=note)
+            self._write(
+                text='%s%s %s %s\n%s%s%s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.DISPLAY_MULTI_STRING,
+                    name,
+                    self.BOUNDARY,
+                    '\n'.join(value),
+                    '\n' if value else '',
+                    self.BOUNDARY,
+                )
             )
-        )
 
     def confirm(
         self,
@@ -432,26 +496,43 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
                 name=name,
                 description=description,
             )
-        self._write(
-            text='%s%s %s %s\n' % (
-                dialogcons.DialogMachineConst.REQUEST_PREFIX,
-                dialogcons.DialogMachineConst.CONFIRM,
-                name,
-                description
+
+        # same key as the human dialect, which confirms using a query.
+        # only answers sent by manager, answer files never answered
+        # confirm in this dialect.
+        envkey = self._questionKey('DIALOG_CONFIRM/%s' % name)
+        self._pollInput()
+        if envkey in self._answered:
+            answer = self.environment[envkey]
+            self.dialog.note(
+                text=[
+                    note,
+                    _('provided answer: {answer}').format(answer=answer),
+                ],
+            )
+            return answer is True or answer in ('yes', 'YES', 'y', 'Y')
+
+        with self._message():
+            self._write(
+                text='%s%s %s %s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.CONFIRM,
+                    name,
+                    description
+                )
+            )
+            self.dialog.note(
+                text=note,
+                prompt=prompt,
+            )
+            self.dialog.note(
+                text=_(
+                    "Response is CONFIRM {name}=yes|no or "
+                    "ABORT {name}"
+                ).format(
+                    name=name,
+                ),
             )
-        )
-        self.dialog.note(
-            text=note,
-            prompt=prompt,
-        )
-        self.dialog.note(
-            text=_(
-                "Response is CONFIRM {name}=yes|no or "
-                "ABORT {name}"
-            ).format(
-                name=name,
-            ),
-        )
 
         opcode, variable = self._readline().split(' ', 1)
         variable = variable.split('=', 1)
@@ -333,16 +333,20 @@ class Plugin(plugin.PluginBase):
                 '--reload'
             )
         )
-        for zone in self._get_active_zones():
-            for service in self._enabled_services:
-                self.execute(
-                    (
-                        self.command.get('firewall-cmd'),
-                        '--zone', zone,
-                        '--permanent',
-                        '--add-service', service,
-                    ),
-                )
+        #
+        # Permanent changes of a zone are written to the same file,
+        # add all services of a zone at once.
+        #
+        if self._enabled_services:
+            for zone in self._get_active_zones():
+                args = [
+                    self.command.get('firewall-cmd'),
+                    '--zone', zone,
+                    '--permanent',
+                ]
+                for service in self._enabled_services:
+                    args.extend(('--add-service', service))
+                self.execute(args)
         self.execute(
             (
                 self.command.get('firewall-cmd'),
@@ -56,6 +56,11 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
     def _getMiniDNF(
         self,
         disabledPlugins=(),
+        baseCache=True,
+        baseCacheRefresh=0,
+        cacheDir=None,
+        offline=False,
+        downloadWorkers=0,
     ):
         from otopi import minidnf
 
@@ -110,6 +115,11 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
         return minidnf.MiniDNF(
             sink=_MyMiniDNFSink(parent=self),
             disabledPlugins=disabledPlugins,
+            baseCache=baseCache,
+            baseCacheRefresh=baseCacheRefresh,
+            cacheDir=cacheDir,
+            offline=offline,
+            downloadWorkers=downloadWorkers,
         )
 
     def __init__(self, context):
@@ -149,6 +159,30 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             constants.PackEnv.DNF_ROLLBACK,
             True
         )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_BASE_CACHE,
+            True
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_BASE_CACHE_REFRESH,
+            0
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_CACHE_DIR,
+            None
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_OFFLINE,
+            False
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_PREFETCH,
+            []
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_DOWNLOAD_WORKERS,
+            0
+        )
 
         try:
             if self.environment[constants.PackEnv.DNFPACKAGER_ENABLED]:
@@ -156,6 +190,21 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
                     disabledPlugins=self.environment[
                         constants.PackEnv.DNF_DISABLED_PLUGINS
                     ],
+                    baseCache=self.environment[
+                        constants.PackEnv.DNF_BASE_CACHE
+                    ],
+                    baseCacheRefresh=self.environment[
+                        constants.PackEnv.DNF_BASE_CACHE_REFRESH
+                    ],
+                    cacheDir=self.environment[
+                        constants.PackEnv.DNF_CACHE_DIR
+                    ],
+                    offline=self.environment[
+                        constants.PackEnv.DNF_OFFLINE
+                    ],
+                    downloadWorkers=self.environment[
+                        constants.PackEnv.DNF_DOWNLOAD_WORKERS
+                    ],
                 )
 
                 # the following will trigger the NOTIFY_REEXEC
@@ -201,7 +250,10 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
         condition=lambda self: self._enabled,
     )
     def _setup(self):
-        if self.environment[constants.PackEnv.DNFPACKAGER_EXPIRE_CACHE]:
+        if (
+            self.environment[constants.PackEnv.DNFPACKAGER_EXPIRE_CACHE] and
+            not self.environment[constants.PackEnv.DNF_OFFLINE]
+        ):
             with self._minidnf.transaction():
                 self._minidnf.clean(['expire-cache'])
         self.environment[constants.CoreEnv.MAIN_TRANSACTION].append(
@@ -218,6 +270,31 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             )
         )
 
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+        condition=lambda self: (
+            self._enabled and
+            self.environment[constants.PackEnv.DNF_PREFETCH]
+        ),
+    )
+    def _setup_prefetch(self):
+        self.logger.info(_('Prefetching packages'))
+        for p in self._minidnf.prefetch(
+            packages=self.environment[constants.PackEnv.DNF_PREFETCH],
+        ):
+            self.logger.debug('    prefetched %s', p['display_name'])
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_INTERNAL_PACKAGES,
+        priority=plugin.Stages.PRIORITY_POST,
+        condition=lambda self: (
+            self._enabled and
+            self.environment[constants.PackEnv.DNF_DOWNLOAD_WORKERS] > 0
+        ),
+    )
+    def _internal_packages_download(self):
+        self._minidnf.downloadTransaction()
+
     @plugin.event(
         stage=plugin.Stages.STAGE_INTERNAL_PACKAGES,
         priority=plugin.Stages.PRIORITY_LAST,
@@ -226,6 +303,17 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
     def _internal_packages_end(self):
         self.processTransaction()
 
+    @plugin.event(
+        stage=plugin.Stages.STAGE_PACKAGES,
+        priority=plugin.Stages.PRIORITY_POST,
+        condition=lambda self: (
+            self._enabled and
+            self.environment[constants.PackEnv.DNF_DOWNLOAD_WORKERS] > 0
+        ),
+    )
+    def _packages_download(self):
+        self._minidnf.downloadTransaction()
+
     @plugin.event(
         stage=plugin.Stages.STAGE_PACKAGES,
         priority=plugin.Stages.PRIORITY_LAST,
@@ -272,6 +360,24 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             ignoreErrors=ignoreErrors,
         )
 
+    def installGroups(self, groups, ignoreErrors=False):
+        return self._minidnf.installGroups(
+            groups=groups,
+            ignoreErrors=ignoreErrors,
+        )
+
+    def updateGroups(self, groups, ignoreErrors=False):
+        return self._minidnf.updateGroups(
+            groups=groups,
+            ignoreErrors=ignoreErrors,
+        )
+
+    def removeGroups(self, groups, ignoreErrors=False):
+        return self._minidnf.removeGroups(
+            groups=groups,
+            ignoreErrors=ignoreErrors,
+        )
+
     def install(self, packages, ignoreErrors=False):
         return self._minidnf.install(
             packages=packages,